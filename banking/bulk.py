@@ -0,0 +1,194 @@
+"""Streaming NDJSON and CSV codecs for bulk account import and export.
+
+Everything here works one line at a time, so a file of any size is read or
+written in bounded memory. One record per line: CSV fields may be quoted
+but must not contain line breaks.
+
+    python -m banking.bulk import accounts.csv --url http://localhost:8000
+    python -m banking.bulk export --format csv -o accounts.csv
+    python -m banking.bulk export-ledger -o ledger.ndjson
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from banking.money import format_minor, to_major, to_minor
+
+FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+ACCOUNT_FIELDS = ("name", "balance")
+LEDGER_FIELDS = ("offset", "timestamp", "kind", "account", "amount", "counterparty", "balance")
+# Accounts created per Bank.create_accounts call during an import
+CHUNK_SIZE = 1000
+MAX_LINE = 64 * 1024
+
+
+class AccountParser:
+    """Turns import lines into ``(name, balance in minor units)`` rows."""
+
+    def __init__(self, format: str = "ndjson"):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format '{format}'")
+        self.format = format
+        self.line_number = 0
+        self._columns: Optional[Tuple[int, int]] = None
+
+    def parse_line(self, line: str) -> Optional[Tuple[str, int]]:
+        """Return the line's row, or None for a blank or header line."""
+        self.line_number += 1
+        if not line.strip():
+            return None
+        try:
+            if self.format == "ndjson":
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+                name, balance = record.get("name"), record.get("balance")
+            else:
+                fields = next(csv.reader([line]))
+                if self._columns is None:
+                    self._columns = _columns(fields)
+                    return None
+                name, balance = (fields[i] if i < len(fields) else None for i in self._columns)
+            return _account_row(name, balance)
+        except ValueError as e:
+            raise ValueError(f"Line {self.line_number}: {e}") from None
+
+
+def _columns(header: List[str]) -> Tuple[int, int]:
+    header = [field.strip().lower() for field in header]
+    missing = [field for field in ACCOUNT_FIELDS if field not in header]
+    if missing:
+        raise ValueError(f"CSV header must name the columns {', '.join(ACCOUNT_FIELDS)}")
+    return header.index("name"), header.index("balance")
+
+
+def _account_row(name, balance) -> Tuple[str, int]:
+    if not isinstance(name, str) or not name:
+        raise ValueError("'name' must be a non-empty string")
+    if balance is None or balance == "":
+        raise ValueError("'balance' is required")
+    minor = to_minor(balance)
+    if minor < 0:
+        raise ValueError(f"Initial balance of '{name}' cannot be negative")
+    return name, minor
+
+
+def parse_accounts(lines: Iterable[str], format: str = "ndjson") -> Iterator[Tuple[str, int]]:
+    parser = AccountParser(format)
+    for line in lines:
+        row = parser.parse_line(line)
+        if row is not None:
+            yield row
+
+
+def chunked(rows: Iterable, size: int = CHUNK_SIZE) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into decoded lines, holding at most one partial line."""
+    pending = b""
+    async for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        if len(pending) > MAX_LINE:
+            raise ValueError(f"Line longer than {MAX_LINE} bytes")
+        for line in lines:
+            yield line.decode().rstrip("\r")
+    if pending:
+        yield pending.decode().rstrip("\r")
+
+
+def _csv_lines(rows: Iterable[Sequence]) -> str:
+    out = io.StringIO()
+    csv.writer(out, lineterminator="\n").writerows(rows)
+    return out.getvalue()
+
+
+def header(fields: Sequence[str], format: str) -> str:
+    return _csv_lines([fields]) if format == "csv" else ""
+
+
+def format_accounts(rows: Iterable[Tuple[str, int]], format: str) -> str:
+    """Format a page of ``(name, balance)`` rows."""
+    if format == "csv":
+        return _csv_lines((name, format_minor(balance)) for name, balance in rows)
+    return "".join(
+        json.dumps({"name": name, "balance": to_major(balance)}) + "\n" for name, balance in rows
+    )
+
+
+def format_ledger(rows: Iterable[Sequence], format: str) -> str:
+    """Format a page of ``(offset, timestamp, kind, account, amount, counterparty, balance)`` rows."""
+    if format == "csv":
+        return _csv_lines(
+            (offset, repr(timestamp), kind, account, format_minor(amount), counterparty or "", format_minor(balance))
+            for offset, timestamp, kind, account, amount, counterparty, balance in rows
+        )
+    return "".join(
+        json.dumps(dict(zip(LEDGER_FIELDS, (
+            offset, timestamp, kind, account, to_major(amount), counterparty, to_major(balance)
+        )))) + "\n"
+        for offset, timestamp, kind, account, amount, counterparty, balance in rows
+    )
+
+
+# ---------- CLI ----------
+def _read_file(path: str, size: int = 64 * 1024) -> Iterator[bytes]:
+    with (sys.stdin.buffer if path == "-" else open(path, "rb")) as f:
+        while True:
+            block = f.read(size)
+            if not block:
+                return
+            yield block
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import httpx
+
+    parser = argparse.ArgumentParser(description="Bulk account import and export over the HTTP API.")
+    parser.add_argument("command", choices=("import", "export", "export-ledger"))
+    parser.add_argument("file", nargs="?", default="-", help="file to import ('-' for stdin)")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="default: csv for .csv files, otherwise ndjson")
+    parser.add_argument("-o", "--output", default="-", help="export destination ('-' for stdout)")
+    args = parser.parse_args(argv)
+    format = args.format or ("csv" if args.file.endswith(".csv") or args.output.endswith(".csv") else "ndjson")
+
+    with httpx.Client(base_url=args.url, timeout=None) as client:
+        if args.command == "import":
+            response = client.post("/accounts/import", params={"format": format},
+                                   content=_read_file(args.file),
+                                   headers={"Content-Type": MEDIA_TYPES[format]})
+            print(response.text)
+            return 0 if response.is_success else 1
+        path = "/accounts/export" if args.command == "export" else "/ledger/export"
+        with client.stream("GET", path, params={"format": format}) as response:
+            if not response.is_success:
+                response.read()
+                print(response.text, file=sys.stderr)
+                return 1
+            out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+            try:
+                for block in response.iter_bytes():
+                    out.write(block)
+            finally:
+                if out is not sys.stdout.buffer:
+                    out.close()
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
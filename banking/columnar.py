@@ -0,0 +1,171 @@
+from array import array
+from typing import List, Optional, Sequence
+
+from banking.errors import BalanceLimitError, NegativeAmountError
+from banking.ledger import Ledger, TransactionKind
+from banking.money import MAX_BALANCE
+from banking.models import Account, Bank
+from banking.snapshot import Snapshot
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+# apply_interest pays at most 100% at once
+MAX_RATE_BPS = 10_000
+
+
+def _exact_sum(values: 'np.ndarray') -> int:
+    """The sum of int64 ``values`` as a Python int, which may be past int64."""
+    # each half sums without overflow for up to 2**31 values
+    return (int((values >> 32).sum()) << 32) + int((values & 0xFFFFFFFF).sum())
+
+
+def _column(values: 'np.ndarray') -> array:
+    column = array('q')
+    column.frombytes(np.ascontiguousarray(values, dtype=np.int64).tobytes())
+    return column
+
+
+class BalanceColumn:
+    """Growable, contiguous int64 column of balances with a running total."""
+
+    def __init__(self, capacity: int = 1024):
+        if np is None:
+            raise RuntimeError("The columnar backend requires numpy (pip install numpy)")
+        self._values = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+        self.total = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, slot: int) -> int:
+        return int(self._values[slot])
+
+    def __setitem__(self, slot: int, balance: int):
+        self.total += balance - int(self._values[slot])
+        self._values[slot] = balance
+
+    @property
+    def values(self) -> 'np.ndarray':
+        """A writable view of the live balances, indexed by slot."""
+        return self._values[:self._size]
+
+    def append(self, balance: int) -> int:
+        if self._size == len(self._values):
+            self._values = np.concatenate((self._values, np.zeros(len(self._values), dtype=np.int64)))
+        slot = self._size
+        self._values[slot] = balance
+        self._size += 1
+        self.total += balance
+        return slot
+
+
+class ColumnarAccount(Account):
+    """An Account whose balance lives in a shared BalanceColumn slot."""
+
+    __slots__ = ("_column", "_slot")
+
+    def __init__(self, name: str, initial_balance: int, column: BalanceColumn,
+                 ledger: Optional[Ledger] = None, created_at: Optional[float] = None,
+                 opening_kind: TransactionKind = TransactionKind.CREATED):
+        self._column = column
+        self._slot = column.append(0)
+        super().__init__(name, initial_balance, ledger, created_at, opening_kind)
+
+    @property
+    def balance(self) -> int:
+        return self._column[self._slot]
+
+    @balance.setter
+    def balance(self, value: int):
+        self._column[self._slot] = value
+
+
+class ColumnarBank(Bank):
+    """A Bank that keeps balances in one NumPy column, indexed by account slot.
+
+    Single-account operations behave exactly as in ``Bank``. On top of that
+    the balance arithmetic of whole-book jobs is vectorized, and the total is
+    kept up to date on every change instead of being summed on demand.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.balances = BalanceColumn()
+        self._by_slot: List[ColumnarAccount] = []
+        self._ledger_ids = array('q')
+
+    def _new_account(self, name: str, balance: int, created_at: Optional[float] = None,
+                     kind: TransactionKind = TransactionKind.CREATED) -> Account:
+        account = ColumnarAccount(name, balance, self.balances, self.ledger, created_at, kind)
+        self._by_slot.append(account)
+        self._ledger_ids.append(account._ledger_id)
+        return account
+
+    def total_balance(self) -> int:
+        return self.balances.total
+
+    def capture_snapshot(self) -> Snapshot:
+        snapshot = super().capture_snapshot()
+        # accounts are never removed, so dict order and slot order agree
+        return snapshot._replace(balances=_column(self.balances.values))
+
+    def bulk_deposit(self, names: Sequence[str], amounts: Sequence[int]) -> int:
+        """Credit ``amounts[i]`` to ``names[i]``; every amount is checked first."""
+        if len(names) != len(amounts):
+            raise ValueError("names and amounts must have the same length")
+        slots = np.fromiter((self.get_account(name)._slot for name in names), dtype=np.intp, count=len(names))
+        credits = np.asarray(amounts, dtype=np.int64)
+        if (credits <= 0).any():
+            raise NegativeAmountError("Amount must be positive")
+        if len(np.unique(slots)) != len(slots):
+            raise ValueError("Each account may appear only once per bulk deposit")
+        if (credits > MAX_BALANCE - self.balances.values[slots]).any():
+            raise BalanceLimitError("A deposit would take a balance past the maximum")
+        self._apply(slots, credits, TransactionKind.DEPOSIT)
+        return len(slots)
+
+    def apply_interest(self, rate_bps: int) -> int:
+        """Credit every account ``rate_bps`` basis points of its balance, rounded down.
+
+        Every credit is checked against ``MAX_BALANCE`` before any is paid.
+        Returns the total interest paid.
+        """
+        if rate_bps < 0:
+            raise ValueError("Interest rate cannot be negative")
+        if rate_bps > MAX_RATE_BPS:
+            raise ValueError(f"Interest rate cannot exceed {MAX_RATE_BPS} basis points")
+        values = self.balances.values
+        # balance * rate would overflow int64; split it around the divisor instead
+        interest = values // 10_000 * rate_bps + values % 10_000 * rate_bps // 10_000
+        if (interest > MAX_BALANCE - values).any():
+            raise BalanceLimitError("Interest would take a balance past the maximum")
+        slots = np.flatnonzero(interest)
+        credits = interest[slots]
+        self._apply(slots, credits, TransactionKind.DEPOSIT)
+        return _exact_sum(credits)
+
+    def apply_fee(self, fee: int) -> int:
+        """Debit ``fee`` from every account that can cover it; returns how many paid."""
+        if fee <= 0:
+            raise NegativeAmountError("Amount must be positive")
+        slots = np.flatnonzero(self.balances.values >= fee)
+        self._apply(slots, np.full(len(slots), -fee, dtype=np.int64), TransactionKind.WITHDRAWAL)
+        return len(slots)
+
+    def _apply(self, slots: 'np.ndarray', deltas: 'np.ndarray', kind: TransactionKind):
+        if not len(slots):
+            return
+        values = self.balances.values
+        values[slots] += deltas
+        self.balances.total += _exact_sum(deltas)
+        ledger_ids = np.frombuffer(self._ledger_ids, dtype=np.int64)[slots]
+        first = self.ledger.extend(
+            _column(ledger_ids), kind, _column(np.abs(deltas)), _column(values[slots])
+        )
+        by_slot = self._by_slot
+        for offset, slot in enumerate(slots.tolist(), first):
+            by_slot[slot]._add_entry(offset)
@@ -0,0 +1,240 @@
+"""Engine process: one process owns the Bank, HTTP workers forward to it.
+
+Workers talk to the engine over a Unix socket. Every message is a frame of
+``<length, request id>`` followed by a JSON body, and a worker may have any
+number of requests in flight on its one connection (pipelining), and the
+worker matches answers to callers by id.
+
+The engine runs each operation to completion before reading the next one,
+so operations are atomic without any locking, however many workers there
+are. Answers go out in order, except that with a group-committed log an
+answer is held back until the entries its operation logged are on disk,
+while the engine goes on with the next requests.
+
+    python -m banking.engine --socket /tmp/bank.sock --workers 4
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import struct
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('<II')  # body length, request id
+# Wait for the peer to drain once this much output is buffered
+_WRITE_HIGH_WATER = 256 * 1024
+
+Dispatch = Callable[[str, list], Any]
+
+
+class RemoteError(Exception):
+    """An operation failed in the engine with an HTTP status and detail."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def encode_frame(request_id: int, message: Any) -> bytes:
+    body = json.dumps(message, separators=(',', ':')).encode()
+    return _HEADER.pack(len(body), request_id) + body
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    """Return ``(request_id, message)``, or None at a clean end of stream."""
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise
+        return None
+    length, request_id = _HEADER.unpack(header)
+    return request_id, json.loads(await reader.readexactly(length))
+
+
+def _outcome(dispatch: Dispatch, operation: str, args: list) -> Dict[str, Any]:
+    try:
+        return {"result": dispatch(operation, args)}
+    except Exception as e:
+        status_code = getattr(e, "status_code", None)
+        if status_code is None:
+            logger.exception("Engine operation %s failed", operation)
+            return {"error": [500, "Internal engine error"]}
+        return {"error": [status_code, getattr(e, "detail", str(e))]}
+
+
+async def serve(path: str, dispatch: Dispatch, wal=None) -> asyncio.AbstractServer:
+    """Listen on the Unix socket ``path`` and answer requests with ``dispatch``.
+
+    ``wal``, the bank's ``WriteAheadLog`` if it has one, decides when an
+    answer may be sent (see ``WriteAheadLog.commit``).
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                request_id, (operation, args) = frame
+                logged = wal.size if wal is not None else 0
+                answer = encode_frame(request_id, _outcome(dispatch, operation, args))
+                commit = wal.commit(logged) if wal is not None else None
+                if commit is not None:
+                    commit.add_done_callback(lambda _, answer=answer: _send(writer, answer))
+                    continue
+                writer.write(answer)
+                if writer.transport.get_write_buffer_size() > _WRITE_HIGH_WATER:
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    if os.path.exists(path):
+        os.unlink(path)
+    return await asyncio.start_unix_server(handle, path)
+
+
+def _send(writer: asyncio.StreamWriter, answer: bytes):
+    if not writer.is_closing():
+        writer.write(answer)
+
+
+class EngineClient:
+    """A worker's pipelined connection to the engine, opened on first use."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connecting: Optional[asyncio.Future] = None
+        self._reading: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+
+    async def call(self, operation: str, *args: Any) -> Any:
+        if self._writer is None:
+            await self.connect()
+        request_id = next(self._ids) & 0xFFFFFFFF
+        answer = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = answer
+        self._writer.write(encode_frame(request_id, [operation, list(args)]))
+        if self._writer.transport.get_write_buffer_size() > _WRITE_HIGH_WATER:
+            await self._writer.drain()
+        outcome = await answer
+        if "error" in outcome:
+            raise RemoteError(*outcome["error"])
+        return outcome["result"]
+
+    async def connect(self):
+        if self._connecting is None:
+            self._connecting = asyncio.ensure_future(self._open())
+        try:
+            await self._connecting
+        except BaseException:
+            self._connecting = None
+            raise
+
+    async def _open(self):
+        reader, self._writer = await asyncio.open_unix_connection(self.path)
+        self._reading = asyncio.create_task(self._read_answers(reader))
+
+    async def _read_answers(self, reader: asyncio.StreamReader):
+        error: BaseException = ConnectionError("Engine connection closed")
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                request_id, outcome = frame
+                answer = self._pending.pop(request_id, None)
+                if answer is not None and not answer.done():
+                    answer.set_result(outcome)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            error = ConnectionError(f"Engine connection lost: {e}")
+        finally:
+            # Fail whatever is still in flight; the next call reconnects
+            self._writer, self._connecting = None, None
+            pending, self._pending = self._pending, {}
+            for answer in pending.values():
+                if not answer.done():
+                    answer.set_exception(error)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._reading is not None:
+            await self._reading
+            self._reading = None
+
+
+async def _run_engine(path: str):
+    import banking.main as main
+
+    server = await serve(path, main.dispatch, main.bank.wal)
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+    logger.info("Engine listening on %s", path)
+    async with main.lifespan(main.app):
+        async with server:
+            await stopped.wait()
+    os.unlink(path)
+
+
+def run_engine(path: str):
+    # banking.main forwards to an engine when this is set; here it must own the bank
+    os.environ.pop("BANK_ENGINE_SOCKET", None)
+    asyncio.run(_run_engine(path))
+
+
+def _wait_for_socket(path: str, engine: multiprocessing.Process, timeout: float = 300.0):
+    # The engine replays its log before listening, which can take a while
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if not engine.is_alive():
+            raise SystemExit(f"Engine exited with code {engine.exitcode}")
+        if time.monotonic() > deadline:
+            raise SystemExit(f"Engine did not listen on {path} within {timeout:.0f}s")
+        time.sleep(0.05)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the bank engine, optionally with HTTP workers.")
+    parser.add_argument("--socket", default=os.getenv("BANK_ENGINE_SOCKET", "/tmp/bank-engine.sock"))
+    parser.add_argument("--workers", type=int, default=0,
+                        help="also serve HTTP with this many uvicorn workers forwarding to the engine")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.workers <= 0:
+        run_engine(args.socket)
+        return 0
+
+    import uvicorn
+    engine = multiprocessing.Process(target=run_engine, args=(args.socket,), name="bank-engine")
+    engine.start()
+    try:
+        _wait_for_socket(args.socket, engine)
+        os.environ["BANK_ENGINE_SOCKET"] = args.socket
+        uvicorn.run("banking.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        engine.terminate()
+        engine.join()
+    return engine.exitcode or 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
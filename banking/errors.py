@@ -7,4 +7,8 @@ class AccountNotFoundError(Exception):
 
 
 class NegativeAmountError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class BalanceLimitError(Exception):
+    """A credit would take a balance past what the ledger can hold."""
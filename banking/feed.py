@@ -0,0 +1,86 @@
+"""Change feed: one event per account creation or successful money movement.
+
+Events go into a fixed-size ring buffer and are numbered by a global,
+gap-free offset. Publishing never waits for anyone: a subscriber that falls
+more than ``capacity`` events behind finds its offset overwritten and has
+to resync (re-read current state, then follow from the feed's end).
+"""
+import asyncio
+from typing import List, NamedTuple, Optional
+
+from banking.money import to_major
+
+
+class ChangeEvent(NamedTuple):
+    offset: int
+    timestamp: float
+    # "account_created" | "deposit" | "withdrawal" | "transfer"
+    type: str
+    account: str
+    amount: int
+    # the account's balance right after the event
+    balance: int
+    # transfers only: the recipient, and its balance right after the event
+    counterparty: Optional[str] = None
+    counterparty_balance: Optional[int] = None
+
+    def to_dict(self) -> dict:
+        event = {
+            "offset": self.offset,
+            "timestamp": self.timestamp,
+            "type": self.type,
+            "account": self.account,
+            "amount": to_major(self.amount),
+            "balance": to_major(self.balance),
+        }
+        if self.counterparty is not None:
+            event["counterparty"] = self.counterparty
+            event["counterparty_balance"] = to_major(self.counterparty_balance)
+        return event
+
+
+class ChangeFeed:
+    """The last ``capacity`` events, readable from any offset still held."""
+
+    def __init__(self, capacity: int = 65536):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.next_offset = 0
+        self._ring: List[Optional[ChangeEvent]] = [None] * capacity
+        # set, and replaced, when an event arrives while someone is waiting
+        self._arrived: Optional[asyncio.Event] = None
+
+    @property
+    def oldest_offset(self) -> int:
+        return max(0, self.next_offset - self.capacity)
+
+    def publish(self, timestamp: float, type: str, account: str, amount: int, balance: int,
+                counterparty: Optional[str] = None, counterparty_balance: Optional[int] = None):
+        offset = self.next_offset
+        self._ring[offset % self.capacity] = ChangeEvent(
+            offset, timestamp, type, account, amount, balance, counterparty, counterparty_balance
+        )
+        self.next_offset = offset + 1
+        if self._arrived is not None:
+            self._arrived.set()
+            self._arrived = None
+
+    def read(self, offset: int, limit: int = 1000) -> List[ChangeEvent]:
+        """Events from ``offset`` on, at most ``limit``; ``offset`` must not be older than ``oldest_offset``."""
+        if offset < self.oldest_offset:
+            raise ValueError(f"Offset {offset} is no longer in the feed (oldest is {self.oldest_offset})")
+        end = min(self.next_offset, offset + limit)
+        return [self._ring[i % self.capacity] for i in range(offset, end)]
+
+    async def wait(self, offset: int, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for the event at ``offset``; True once it exists."""
+        if offset < self.next_offset:
+            return True
+        if self._arrived is None:
+            self._arrived = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._arrived.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return offset < self.next_offset
@@ -0,0 +1,50 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+
+class CachedOutcome(NamedTuple):
+    expires_at: float
+    fingerprint: Hashable
+    outcome: Any
+
+
+class IdempotencyCache:
+    """Outcomes of recent requests by idempotency key, bounded in size and age.
+
+    Entries live in insertion order and every entry has the same time to live,
+    so the oldest entry is always the first to expire: eviction only ever pops
+    from the front, and ``get`` and ``put`` are O(1).
+    """
+
+    def __init__(self, max_keys: int = 100_000, ttl: float = 24 * 3600,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_keys < 1:
+            raise ValueError("max_keys must be at least 1")
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: 'OrderedDict[str, CachedOutcome]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedOutcome]:
+        self._expire(self._clock())
+        return self._entries.get(key)
+
+    def put(self, key: str, fingerprint: Hashable, outcome: Any):
+        now = self._clock()
+        self._expire(now)
+        self._entries.pop(key, None)
+        self._entries[key] = CachedOutcome(now + self.ttl, fingerprint, outcome)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+    def _expire(self, now: float):
+        entries = self._entries
+        while entries:
+            oldest = next(iter(entries.values()))
+            if oldest.expires_at > now:
+                break
+            entries.popitem(last=False)
@@ -0,0 +1,57 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Iterable, Iterator, List
+
+
+class SortedNameIndex:
+    """Sorted set of account names kept as a list of bounded sorted chunks.
+
+    Inserting costs a binary search plus a shift inside one chunk of at most
+    ``2 * chunk_size`` names, rather than a shift of the whole index, and a
+    range scan starts with two binary searches wherever it begins.
+    """
+
+    def __init__(self, names: Iterable[str] = (), chunk_size: int = 1000):
+        self._chunk_size = chunk_size
+        ordered = sorted(names)
+        self._chunks: List[List[str]] = [
+            ordered[i:i + chunk_size] for i in range(0, len(ordered), chunk_size)
+        ]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._length = len(ordered)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[str]:
+        for chunk in self._chunks:
+            yield from chunk
+
+    def add(self, name: str):
+        if not self._chunks:
+            self._chunks.append([name])
+            self._maxes.append(name)
+        else:
+            i = bisect_left(self._maxes, name)
+            if i == len(self._maxes):
+                i -= 1
+                self._chunks[i].append(name)
+                self._maxes[i] = name
+            else:
+                insort(self._chunks[i], name)
+            chunk = self._chunks[i]
+            if len(chunk) > 2 * self._chunk_size:
+                half = self._chunk_size
+                self._chunks[i:i + 1] = [chunk[:half], chunk[half:]]
+                self._maxes[i:i + 1] = [chunk[half - 1], chunk[-1]]
+        self._length += 1
+
+    def iter_from(self, lower: str, inclusive: bool = True) -> Iterator[str]:
+        """Yield the names >= ``lower`` (> ``lower`` when not inclusive) in order."""
+        i = bisect_left(self._maxes, lower)
+        if i == len(self._chunks):
+            return
+        chunk = self._chunks[i]
+        start = bisect_left(chunk, lower) if inclusive else bisect_right(chunk, lower)
+        yield from chunk[start:]
+        for j in range(i + 1, len(self._chunks)):
+            yield from self._chunks[j]
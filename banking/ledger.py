@@ -0,0 +1,305 @@
+import math
+import time
+from array import array
+from contextlib import contextmanager
+from itertools import accumulate
+from enum import IntEnum
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from banking.money import format_minor
+
+
+class TransactionKind(IntEnum):
+    CREATED = 0
+    DEPOSIT = 1
+    WITHDRAWAL = 2
+    TRANSFER_OUT = 3
+    TRANSFER_IN = 4
+    OPENING = 5
+
+
+_LABELS = {
+    TransactionKind.CREATED: 'Account created with balance',
+    TransactionKind.DEPOSIT: 'Deposited',
+    TransactionKind.WITHDRAWAL: 'Withdrawn',
+    TransactionKind.TRANSFER_OUT: 'Transferred to',
+    TransactionKind.TRANSFER_IN: 'Received from',
+    TransactionKind.OPENING: 'Opening balance from snapshot',
+}
+
+NO_COUNTERPARTY = -1
+# Entries a filtered page may scan per requested entry
+SCAN_FACTOR = 10
+
+
+class LedgerEntry(NamedTuple):
+    offset: int
+    timestamp: float
+    kind: TransactionKind
+    account: str
+    amount: int
+    counterparty: Optional[str]
+    balance: int
+
+    def __str__(self) -> str:
+        text = f'{_LABELS[self.kind]}: {format_minor(self.amount)}'
+        if self.counterparty:
+            text += f' {self.counterparty}'
+        return text
+
+
+class Ledger:
+    """Append-only transaction log stored column-wise in typed arrays.
+
+    Account names are stored once and referenced by integer id, so a record
+    costs a fixed handful of bytes and nothing is formatted until an entry
+    is read back.
+    """
+
+    def __init__(self):
+        self._timestamps = array('d')
+        self._kinds = array('B')
+        self._accounts = array('q')
+        self._amounts = array('q')
+        self._counterparties = array('q')
+        self._balances = array('q')
+        self._names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._listeners: List[Callable[[LedgerEntry], None]] = []
+        self._batch_listeners: List[Callable[[List[LedgerEntry]], None]] = []
+        # a BookStats (banking/stats.py) fed every entry, if tracking is on
+        self._stats = None
+        # newest timestamp written: entries never go back in time, even if the clock does
+        self._last_ts = 0.0
+        # inside ``atomic()``: listeners hear about new entries when the block ends
+        self._holding = False
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    def __getitem__(self, offset: int) -> LedgerEntry:
+        counterparty = self._counterparties[offset]
+        return LedgerEntry(
+            offset,
+            self._timestamps[offset],
+            TransactionKind(self._kinds[offset]),
+            self._names[self._accounts[offset]],
+            self._amounts[offset],
+            None if counterparty == NO_COUNTERPARTY else self._names[counterparty],
+            self._balances[offset],
+        )
+
+    def register(self, name: str) -> int:
+        account_id = self._ids.get(name)
+        if account_id is None:
+            account_id = self._ids[name] = len(self._names)
+            self._names.append(name)
+        return account_id
+
+    def subscribe(self, listener: Callable[[LedgerEntry], None],
+                  batch_listener: Optional[Callable[[List[LedgerEntry]], None]] = None):
+        """Call ``listener`` with every entry appended from now on.
+
+        Entries appended together by ``extend`` or ``extend_account`` go to
+        ``batch_listener`` in one call instead, when it is given.
+        """
+        self._listeners.append(listener)
+        self._batch_listeners.append(batch_listener or _one_by_one(listener))
+
+    def track(self, stats):
+        """Feed every entry appended from now on into ``stats``."""
+        self._stats = stats
+
+    def append(self, account_id: int, kind: TransactionKind, amount: int,
+               balance: int, counterparty_id: int = NO_COUNTERPARTY,
+               timestamp: Optional[float] = None) -> int:
+        offset = len(self._kinds)
+        timestamp = self._stamp(timestamp)
+        try:
+            self._timestamps.append(timestamp)
+            self._kinds.append(kind)
+            self._accounts.append(account_id)
+            self._amounts.append(amount)
+            self._counterparties.append(counterparty_id)
+            self._balances.append(balance)
+        except Exception:
+            self._truncate(offset)
+            raise
+        if self._stats is not None:
+            self._stats.record(kind, amount, balance)
+        if self._listeners and not self._holding:
+            entry = self[offset]
+            for listener in self._listeners:
+                listener(entry)
+        return offset
+
+    def extend(self, account_ids: array, kind: TransactionKind, amounts: array,
+               balances: array, timestamp: Optional[float] = None) -> int:
+        """Append one ``kind`` entry per account in a single pass over each column.
+
+        The three arrays are int64 (``'q'``) columns of equal length. Returns
+        the offset of the first new entry.
+        """
+        first = len(self._kinds)
+        count = len(account_ids)
+        timestamp = self._stamp(timestamp)
+        try:
+            self._timestamps.extend(array('d', [timestamp]) * count)
+            self._kinds.extend(array('B', [kind]) * count)
+            self._accounts.extend(account_ids)
+            self._amounts.extend(amounts)
+            self._counterparties.extend(array('q', [NO_COUNTERPARTY]) * count)
+            self._balances.extend(balances)
+        except Exception:
+            self._truncate(first)
+            raise
+        self._notify(first, count)
+        return first
+
+    def extend_account(self, account_id: int, kinds: array, amounts: array, balances: array,
+                       counterparty_ids: array, timestamps: array, after: float = 0.0) -> int:
+        """Append a run of entries for one account, one column at a time.
+
+        ``kinds`` is a ``'B'`` array, ``timestamps`` a ``'d'`` array and the
+        rest are ``'q'`` arrays, all of equal length. A timestamp earlier
+        than the one before it, or than ``after`` (the account's latest
+        entry), is moved up to it; entries of other accounts do not matter.
+        Returns the offset of the first new entry.
+        """
+        first = len(self._kinds)
+        count = len(kinds)
+        timestamps = array('d', accumulate(timestamps, max, initial=after))[1:]
+        try:
+            self._timestamps.extend(timestamps)
+            self._kinds.extend(kinds)
+            self._accounts.extend(array('q', [account_id]) * count)
+            self._amounts.extend(amounts)
+            self._counterparties.extend(counterparty_ids)
+            self._balances.extend(balances)
+        except Exception:
+            self._truncate(first)
+            raise
+        if count and timestamps[-1] > self._last_ts:
+            self._last_ts = timestamps[-1]
+        self._notify(first, count)
+        return first
+
+    def _stamp(self, timestamp: Optional[float]) -> float:
+        """``timestamp``, or now, but never earlier than the newest one written.
+
+        Given timestamps (replayed or restored entries) are kept as they are.
+        """
+        if timestamp is None:
+            timestamp = max(time.time(), self._last_ts)
+        elif timestamp < self._last_ts:
+            return timestamp
+        self._last_ts = timestamp
+        return timestamp
+
+    def _truncate(self, length: int):
+        """Cut every column back to ``length`` entries, undoing a partly written row or run."""
+        for column in (self._timestamps, self._kinds, self._accounts,
+                       self._amounts, self._counterparties, self._balances):
+            del column[length:]
+
+    @contextmanager
+    def atomic(self) -> Iterator[None]:
+        """Hand every entry appended inside the block to the batch listeners at once.
+
+        A write-ahead log writes one batch as one record, so after a crash
+        either all of the block's entries are replayed or none are.
+        """
+        if self._holding:
+            yield
+            return
+        first = len(self._kinds)
+        self._holding = True
+        try:
+            yield
+        finally:
+            self._holding = False
+            self._publish(first, len(self._kinds) - first)
+
+    def _notify(self, first: int, count: int):
+        if self._stats is not None:
+            end = first + count
+            self._stats.record_many(self._kinds[first:end], self._amounts[first:end], self._balances[first:end])
+        if not self._holding:
+            self._publish(first, count)
+
+    def _publish(self, first: int, count: int):
+        if self._batch_listeners and count:
+            entries = [self[offset] for offset in range(first, first + count)]
+            for listener in self._batch_listeners:
+                listener(entries)
+
+    def render(self, offset: int) -> str:
+        return str(self[offset])
+
+    def page(self, offsets: array, cursor: int = 0, limit: int = 100,
+             since: Optional[float] = None, until: Optional[float] = None,
+             kind: Optional[TransactionKind] = None,
+             counterparty: Optional[str] = None) -> Tuple[List[LedgerEntry], Optional[int]]:
+        """Read one page of the entries whose ledger offsets are in ``offsets``.
+
+        ``cursor`` is a position in ``offsets``; the returned cursor resumes
+        after the last entry of the page, or is None when nothing is left.
+        The ``since``/``until`` window is found by binary search, so an
+        unfiltered page costs O(limit) however long the history is. The
+        kind and counterparty filters skip non-matching entries in place,
+        scanning at most ``limit * SCAN_FACTOR`` of them, so a filtered page
+        may come back short or empty with a cursor to continue from.
+        """
+        start = cursor
+        if since is not None:
+            start = max(start, self._bisect_time(offsets, since))
+        last = len(offsets) if until is None else self._bisect_time(offsets, until)
+
+        counterparty_id = None
+        if counterparty is not None:
+            counterparty_id = self._ids.get(counterparty)
+            if counterparty_id is None:
+                return [], None
+
+        entries: List[LedgerEntry] = []
+        end = min(last, start + limit * SCAN_FACTOR)
+        for position in range(start, end):
+            offset = offsets[position]
+            if kind is not None and self._kinds[offset] != kind:
+                continue
+            if counterparty_id is not None and self._counterparties[offset] != counterparty_id:
+                continue
+            entries.append(self[offset])
+            if len(entries) == limit:
+                end = position + 1
+                break
+        return entries, (end if end < last else None)
+
+    def balance_at(self, offsets: array, timestamp: float) -> Optional[int]:
+        """The balance after the last of ``offsets`` recorded at or before ``timestamp``.
+
+        Every entry stores the balance it left behind, so this is one binary
+        search over the account's entries. None if the first entry is later.
+        """
+        position = self._bisect_time(offsets, math.nextafter(timestamp, math.inf))
+        if not position:
+            return None
+        return self._balances[offsets[position - 1]]
+
+    def _bisect_time(self, offsets: array, timestamp: float) -> int:
+        """Return the first position in ``offsets`` recorded at or after ``timestamp``."""
+        low, high = 0, len(offsets)
+        while low < high:
+            mid = (low + high) // 2
+            if self._timestamps[offsets[mid]] < timestamp:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+
+def _one_by_one(listener: Callable[[LedgerEntry], None]) -> Callable[[List[LedgerEntry]], None]:
+    def notify(entries: List[LedgerEntry]):
+        for entry in entries:
+            listener(entry)
+    return notify
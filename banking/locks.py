@@ -0,0 +1,54 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+
+class AccountLocks:
+    """Per-account asyncio locks, created on demand and dropped once idle.
+
+    ``hold`` acquires the locks of several accounts in sorted name order, so
+    operations over overlapping accounts can never wait on each other in a
+    cycle, while operations over disjoint accounts proceed concurrently.
+    """
+
+    def __init__(self):
+        # name -> [lock, number of tasks holding or waiting for it]
+        self._locks: Dict[str, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, *names: str) -> AsyncIterator[None]:
+        held: List[str] = []
+        try:
+            for name in sorted(set(names)):
+                lock = self._checkout(name)
+                try:
+                    await lock.acquire()
+                except BaseException:
+                    self._checkin(name)
+                    raise
+                held.append(name)
+            yield
+        finally:
+            for name in reversed(held):
+                self._locks[name][0].release()
+                self._checkin(name)
+
+    def locked(self, name: str) -> bool:
+        entry = self._locks.get(name)
+        return entry is not None and entry[0].locked()
+
+    def _checkout(self, name: str) -> asyncio.Lock:
+        entry = self._locks.get(name)
+        if entry is None:
+            entry = self._locks[name] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _checkin(self, name: str):
+        entry = self._locks[name]
+        entry[1] -= 1
+        if not entry[1]:
+            del self._locks[name]
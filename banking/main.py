@@ -1,93 +1,763 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import collections
+from contextlib import asynccontextmanager
+from datetime import datetime
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import hashlib
+import json
 import os
-from pydantic import BaseModel
-from banking.errors import AccountNotFoundError, InsufficientFundsError, NegativeAmountError
+import threading
+import time
+from typing import Annotated, Any, AsyncIterator, Callable, Dict, Iterable, List, Literal, Optional
+from pydantic import BaseModel, BeforeValidator
+from banking import bulk
+from banking.errors import AccountNotFoundError, BalanceLimitError, InsufficientFundsError, NegativeAmountError
+from banking.columnar import ColumnarBank
+from banking.engine import EngineClient, RemoteError
+from banking.feed import ChangeFeed
+from banking.idempotency import IdempotencyCache
+from banking.ledger import TransactionKind
+from banking.metrics import METRICS_ENABLED, REGISTRY, MetricsMiddleware
+from banking.money import format_minor, to_major, to_minor
+from banking.profiling import PROFILING_ENABLED, SamplingProfiler, TraceMiddleware, traced
+from banking.ratelimit import FairQueue, RateLimiter, RateLimitMiddleware, retry_after
+from banking.responses import FastJSONResponse, dumps, no_content, wants_minimal
+from banking.traffic import BalanceDigest, RecordingMiddleware, TrafficRecorder
 from banking.models import (
     Bank
 )
+from banking.wal import WriteAheadLog
 
-app = FastAPI(title="Simple Banking API")
-bank = Bank()
+
+def create_bank() -> Bank:
+    bank_class = ColumnarBank if os.getenv("BANK_STORAGE") == "columnar" else Bank
+    # Hot accounts coalesce incoming credits; the columnar store does not support them
+    hot_accounts = [name for name in os.getenv("BANK_HOT_ACCOUNTS", "").split(",") if name]
+    if bank_class is ColumnarBank:
+        hot_accounts = []
+    wal_path = os.getenv("BANK_WAL_PATH")
+    if not wal_path:
+        bank = bank_class()
+        bank.hot_accounts = frozenset(hot_accounts)
+        return bank
+    wal = WriteAheadLog(
+        wal_path,
+        fsync=os.getenv("BANK_WAL_FSYNC", "group"),
+        group_size=int(os.getenv("BANK_WAL_GROUP_SIZE", 256)),
+        group_interval=float(os.getenv("BANK_WAL_GROUP_MS", 2)) / 1000,
+    )
+    return bank_class.open(wal, os.getenv("BANK_SNAPSHOT_PATH", wal_path + ".snapshot"), hot_accounts)
+
+
+async def snapshot_periodically(interval: float):
+    saved_at = None
+    while True:
+        await asyncio.sleep(interval)
+        current = bank
+        if current.wal is None or current.wal.size == saved_at:
+            continue
+        snapshot = current.capture_snapshot()
+        await asyncio.to_thread(current.save_snapshot, snapshot)
+        saved_at = snapshot.wal_offset
+
+
+async def settle_periodically(interval: float):
+    # bounds how long a hot account's credits stay out of the ledger (and the log)
+    while True:
+        await asyncio.sleep(interval)
+        bank.settle()
+
+
+async def start_recording():
+    recorder.start()
+    async for rows in _account_pages():
+        recorder.opening_balances(rows)
+
+
+async def finish_recording():
+    digest = BalanceDigest()
+    async for rows in _account_pages():
+        digest.update(rows)
+    recorder.finish(digest)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if recorder is not None:
+        await start_recording()
+    if engine is not None:
+        yield
+        if recorder is not None:
+            await finish_recording()
+        await engine.close()
+        return
+    interval = float(os.getenv("BANK_SNAPSHOT_INTERVAL", 300))
+    snapshots = None
+    if bank.snapshot_path is not None and interval > 0:
+        snapshots = asyncio.create_task(snapshot_periodically(interval))
+    settling = None
+    if bank.hot_accounts:
+        settling = asyncio.create_task(settle_periodically(float(os.getenv("BANK_HOT_FOLD_MS", 50)) / 1000))
+    yield
+    for task in (snapshots, settling):
+        if task is not None:
+            task.cancel()
+    if recorder is not None:
+        await finish_recording()
+    if bank.snapshot_path is not None:
+        bank.save_snapshot()
+    bank.close()
+
+
+app = FastAPI(title="Simple Banking API", lifespan=lifespan)
+# With BANK_ENGINE_SOCKET set this process is a stateless HTTP worker: the
+# bank lives in the engine process (banking/engine.py) and every operation
+# is forwarded to it.
+engine_socket = os.getenv("BANK_ENGINE_SOCKET")
+engine = EngineClient(engine_socket) if engine_socket else None
+bank = create_bank() if engine is None else None
+# In engine mode the feed lives in the engine, next to the bank
+feed = ChangeFeed(int(os.getenv("BANK_FEED_SIZE", 65536)))
+idempotency = IdempotencyCache(
+    max_keys=int(os.getenv("BANK_IDEMPOTENCY_MAX_KEYS", 100_000)),
+    ttl=float(os.getenv("BANK_IDEMPOTENCY_TTL", 24 * 3600)),
+)
+
+
+def _rate_limiter(variable: str) -> Optional[RateLimiter]:
+    rate = float(os.getenv(variable, 0))
+    return RateLimiter(rate) if rate > 0 else None
+
+
+# Rate limits are per process: with several workers each enforces its own
+account_limiter = _rate_limiter("BANK_RATE_LIMIT_ACCOUNT")
+client_limiter = _rate_limiter("BANK_RATE_LIMIT_CLIENT")
+max_concurrent = int(os.getenv("BANK_MAX_CONCURRENT", 0))
+if client_limiter is not None or max_concurrent > 0:
+    app.add_middleware(
+        RateLimitMiddleware,
+        clients=client_limiter,
+        queue=FairQueue(max_concurrent, int(os.getenv("BANK_MAX_QUEUED_PER_CLIENT", 100))) if max_concurrent > 0 else None,
+    )
+# Added last so it is outermost and also counts the 429s
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+if PROFILING_ENABLED:
+    app.add_middleware(TraceMiddleware)
+# BANK_RECORD=<file> records the request stream for banking.traffic to replay
+recorder = TrafficRecorder(os.environ["BANK_RECORD"]) if os.getenv("BANK_RECORD") else None
+if recorder is not None:
+    # outermost of all: replays must see rejected requests too
+    app.add_middleware(RecordingMiddleware, recorder=recorder)
+if METRICS_ENABLED and engine is None:
+    REGISTRY.gauge("bank_accounts", "Open accounts.", lambda: len(bank.accounts))
+    REGISTRY.gauge("bank_ledger_entries", "Entries in the ledger.", lambda: len(bank.ledger))
+    REGISTRY.gauge("bank_startup_seconds", "Time spent restoring state at startup.", lambda: bank.startup_seconds)
+
+
+# Accepts major units in JSON (12.34) and holds exact integer minor units (1234)
+Money = Annotated[int, BeforeValidator(to_minor)]
 
 
 class AccountCreate(BaseModel):
     name: str
-    initial_balance: float
+    initial_balance: Money
 
 
 class TransactionAmount(BaseModel):
-    amount: float
+    amount: Money
 
 
 class Transfer(BaseModel):
     sender: str
     recipient: str
-    amount: float
+    amount: Money
 
 
-@app.get("/")
-async def root():
-    return {"message": "Welcome to the Simple Banking API"}
+class TransferBatch(BaseModel):
+    transfers: List[Transfer]
 
 
-@app.get("/accounts")
-@app.get("/accounts/")
-async def list_accounts():
+IdempotencyKey = Annotated[Optional[str], Header()]
+PreferHeader = Annotated[Optional[str], Header()]
+
+
+def fingerprint(request: tuple) -> bytes:
+    """A fixed-size digest of a request's operation and arguments, however many there are."""
+    return hashlib.sha256(json.dumps(request, separators=(",", ":")).encode()).digest()
+
+
+def run_once(key: Optional[str], request: tuple, operation: Callable[[], Any]) -> Any:
+    """Run ``operation`` at most once per idempotency key.
+
+    Retries with the same key get the first outcome back, success or
+    HTTPException, without touching the bank again. A retry must describe
+    the same ``request``; only its fingerprint is kept, so a cached batch
+    costs the same as a cached deposit. Callers hold the locks of the
+    accounts involved (or run in the engine, one operation at a time), so
+    concurrent retries are serialized.
+    """
+    if key is None:
+        return operation()
+    digest = fingerprint(request)
+    cached = idempotency.get(key)
+    if cached is None:
+        try:
+            outcome = operation()
+        except HTTPException as e:
+            outcome = e
+        idempotency.put(key, digest, outcome)
+    elif cached.fingerprint != digest:
+        raise HTTPException(422, "Idempotency-Key was already used for a different request")
+    else:
+        outcome = cached.outcome
+    if isinstance(outcome, HTTPException):
+        raise HTTPException(outcome.status_code, outcome.detail)
+    return outcome
+
+
+# ---------- Operations ----------
+# Each operation is a plain function of JSON-serializable arguments that reads
+# or changes ``bank`` and returns the response body, so it can run either in
+# this process or, by name, in the engine process.
+OPERATIONS: Dict[str, Callable[..., dict]] = {}
+
+
+def operation(func: Callable[..., dict]) -> Callable[..., dict]:
+    OPERATIONS[func.__name__] = func
+    return func
+
+
+def dispatch(name: str, args: list) -> dict:
+    """Run the operation ``name``; the engine process serves requests with this."""
+    return OPERATIONS[name](*args)
+
+
+def limit_accounts(costs: Dict[str, int]):
+    """Raise 429 unless every account in ``costs`` can make that many more transactions now."""
+    if account_limiter is None:
+        return
+    wait = account_limiter.acquire(costs)
+    if wait:
+        names = ", ".join(f"'{name}'" for name in costs)
+        raise HTTPException(429, f"Rate limit exceeded for account {names}",
+                            headers={"Retry-After": retry_after(wait)})
+
+
+def credit_locks(name: str) -> tuple:
+    """The locks a credit to ``name`` needs: none for a hot account, which only buffers it."""
+    if bank is not None and name in bank.hot_accounts:
+        return ()
+    return (name,)
+
+
+async def execute(func: Callable[..., dict], *args, locks: Iterable[str] = ()) -> dict:
+    """Run ``func`` here under the locks of the ``locks`` accounts, or in the engine.
+
+    With a group-committed log, returns once the entries ``func`` logged
+    are on disk. The locks are released first, so other requests can join
+    the same fsync.
+    """
+    if engine is not None:
+        try:
+            return await engine.call(func.__name__, *args)
+        except RemoteError as e:
+            raise HTTPException(e.status_code, e.detail)
+    wal = bank.wal
+    async with bank.locks.hold(*locks):
+        logged = wal.size if wal is not None else 0
+        result = func(*args)
+    commit = wal.commit(logged) if wal is not None else None
+    if commit is not None:
+        await commit
+    return result
+
+
+if PROFILING_ENABLED:
+    # times lock waits and bank operations for requests sent with X-Trace
+    execute = traced(execute)
+
+
+@operation
+def apply_health() -> dict:
+    return {"status": "ready", "startup_seconds": bank.startup_seconds}
+
+
+@operation
+def apply_render_metrics() -> str:
+    return REGISTRY.render(prefix="bank_")
+
+
+@operation
+def apply_stats() -> dict:
+    return bank.snapshot_stats().to_dict()
+
+
+@operation
+def apply_list_accounts(cursor: Optional[str], limit: int, prefix: str,
+                        min_balance: Optional[int], max_balance: Optional[int]) -> dict:
+    accounts, next_cursor = bank.list_accounts(cursor, limit, prefix, min_balance, max_balance)
     return {
         "accounts": [
-            {"name": name, "balance": account.balance}
-            for name, account in sorted(bank.accounts.items())
-        ]
+            {"name": account.name, "balance": to_major(account.balance)}
+            for account in accounts
+        ],
+        "next_cursor": next_cursor,
     }
 
 
-@app.post("/accounts/")
-async def create_account(data: AccountCreate):
+@operation
+def apply_create_account(name: str, initial_balance: int) -> dict:
     try:
-        account = bank.create_account(data.name, data.initial_balance)
-        return {"message": f"Account '{account.name}' created."}
-    except ValueError as e:
+        account = bank.create_account(name, initial_balance)
+    except (BalanceLimitError, ValueError) as e:
         raise HTTPException(400, str(e))
+    feed.publish(time.time(), "account_created", name, initial_balance, initial_balance)
+    return {"message": f"Account '{account.name}' created."}
 
 
-@app.get("/accounts/{name}")
-async def get_balance(name: str):
+@operation
+def apply_create_accounts(rows: List[list]) -> dict:
+    try:
+        imported = bank.create_accounts((name, balance) for name, balance in rows)
+    except (BalanceLimitError, ValueError) as e:
+        raise HTTPException(400, str(e))
+    now = time.time()
+    for name, balance in rows:
+        feed.publish(now, "account_created", name, balance, balance)
+    return {"imported": imported}
+
+
+@operation
+def apply_export_accounts(after: Optional[str], limit: int) -> dict:
+    accounts, next_cursor = bank.list_accounts(after, limit)
+    return {"rows": [[account.name, account.balance] for account in accounts], "next_cursor": next_cursor}
+
+
+@operation
+def apply_export_ledger(offset: int, limit: int) -> dict:
+    if offset == 0:
+        bank.settle()
+    end = min(offset + limit, len(bank.ledger))
+    rows = []
+    for i in range(offset, end):
+        entry = bank.ledger[i]
+        rows.append([entry.offset, entry.timestamp, entry.kind.name.lower(), entry.account,
+                     entry.amount, entry.counterparty, entry.balance])
+    return {"rows": rows, "next_offset": end if end < len(bank.ledger) else None}
+
+
+@operation
+def apply_read_feed(offset: Optional[int], limit: int) -> dict:
+    """A page of change events from ``offset`` (None: the feed's end)."""
+    if offset is None:
+        offset = feed.next_offset
+    if offset < feed.oldest_offset:
+        return {"resync": True, "oldest_offset": feed.oldest_offset, "next_offset": feed.next_offset}
+    events = feed.read(offset, limit)
+    return {"events": [event.to_dict() for event in events], "next_offset": offset + len(events)}
+
+
+@operation
+def apply_get_balance(name: str) -> dict:
     try:
         account = bank.get_account(name)
-        return {"name": account.name, "balance": account.balance}
     except AccountNotFoundError as e:
         raise HTTPException(404, str(e))
+    return {"name": account.name, "balance": to_major(account.balance)}
 
 
-@app.post("/accounts/{name}/deposits")
-async def deposit(name: str, data: TransactionAmount):
+@operation
+def apply_get_balance_at(name: str, as_of: float) -> dict:
     try:
-        account = bank.get_account(name)
-        account.deposit(data.amount)
-        return {"message": f"{data.amount:.2f} deposited to {name}"}
-    except (AccountNotFoundError, NegativeAmountError) as e:
-        raise HTTPException(400, str(e))
+        balance = bank.get_account(name).balance_at(as_of)
+    except AccountNotFoundError as e:
+        raise HTTPException(404, str(e))
+    if balance is None and bank.history_starts_at is not None and as_of < bank.history_starts_at:
+        # older than the snapshot the bank was restored from: look it up in the log before it
+        balance = bank.archived_balance_at(name, as_of)
+    if balance is None:
+        raise HTTPException(404, f"Account '{name}' has no history at or before the requested time")
+    return {"name": name, "balance": to_major(balance)}
 
 
-@app.post("/accounts/{name}/withdrawals")
-async def withdraw(name: str, data: TransactionAmount):
+@operation
+def apply_list_transactions(name: str, cursor: int, limit: int, since: Optional[float],
+                            until: Optional[float], kind: Optional[str],
+                            counterparty: Optional[str]) -> dict:
     try:
         account = bank.get_account(name)
-        account.withdraw(data.amount)
-        return {"message": f"{data.amount:.2f} withdrawn from {name}"}
-    except (AccountNotFoundError, NegativeAmountError, InsufficientFundsError) as e:
-        raise HTTPException(400, str(e))
+    except AccountNotFoundError as e:
+        raise HTTPException(404, str(e))
+    try:
+        kind_filter = TransactionKind[kind.upper()] if kind is not None else None
+    except KeyError:
+        raise HTTPException(400, f"Unknown transaction kind '{kind}'")
+    entries, next_cursor = account.get_transactions(cursor, limit, since, until, kind_filter, counterparty)
+    return {
+        "name": account.name,
+        "transactions": [
+            {
+                "timestamp": entry.timestamp,
+                "kind": entry.kind.name.lower(),
+                "amount": to_major(entry.amount),
+                "counterparty": entry.counterparty,
+                "balance": to_major(entry.balance),
+            }
+            for entry in entries
+        ],
+        "next_cursor": next_cursor,
+        "history_starts_at": bank.history_starts_at,
+    }
+
 
+@operation
+def apply_deposit(name: str, amount: int, idempotency_key: Optional[str]) -> None:
+    def apply():
+        try:
+            account = bank.get_account(name)
+            account.deposit(amount)
+        except (AccountNotFoundError, NegativeAmountError, BalanceLimitError) as e:
+            raise HTTPException(400, str(e))
+        feed.publish(time.time(), "deposit", name, amount, account.balance)
 
-@app.post("/transfers")
-async def transfer(data: Transfer):
+    return run_once(idempotency_key, ("deposit", name, amount), apply)
+
+
+@operation
+def apply_withdraw(name: str, amount: int, idempotency_key: Optional[str]) -> None:
+    def apply():
+        try:
+            account = bank.get_account(name)
+            account.withdraw(amount)
+        except (AccountNotFoundError, NegativeAmountError, InsufficientFundsError) as e:
+            raise HTTPException(400, str(e))
+        feed.publish(time.time(), "withdrawal", name, amount, account.balance)
+
+    return run_once(idempotency_key, ("withdraw", name, amount), apply)
+
+
+@operation
+def apply_transfer(sender_name: str, recipient_name: str, amount: int,
+                   idempotency_key: Optional[str]) -> None:
+    def apply():
+        try:
+            sender = bank.get_account(sender_name)
+            recipient = bank.get_account(recipient_name)
+            sender.transfer(recipient, amount)
+        except (AccountNotFoundError, NegativeAmountError, InsufficientFundsError, BalanceLimitError, ValueError) as e:
+            raise HTTPException(400, str(e))
+        feed.publish(time.time(), "transfer", sender_name, amount, sender.balance, recipient_name, recipient.balance)
+
+    return run_once(idempotency_key, ("transfer", sender_name, recipient_name, amount), apply)
+
+
+@operation
+def apply_transfer_batch(legs: List[list], idempotency_key: Optional[str]) -> dict:
+    legs = tuple(tuple(leg) for leg in legs)
+
+    def apply():
+        # balances before the batch, to publish each leg's resulting balances
+        balances = {name: bank.accounts[name].balance
+                    for leg in legs for name in leg[:2] if name in bank.accounts}
+        try:
+            count = bank.transfer_batch(legs)
+        except (AccountNotFoundError, NegativeAmountError, InsufficientFundsError, BalanceLimitError, ValueError) as e:
+            raise HTTPException(400, str(e))
+        now = time.time()
+        for sender, recipient, amount in legs:
+            balances[sender] -= amount
+            balances[recipient] += amount
+            feed.publish(now, "transfer", sender, amount, balances[sender], recipient, balances[recipient])
+        return {"message": f"{count} transfers applied"}
+
+    return run_once(idempotency_key, ("transfer_batch",) + legs, apply)
+
+
+# ---------- Routes ----------
+@app.get("/")
+async def root():
+    return {"message": "Welcome to the Simple Banking API"}
+
+
+@app.get("/health")
+async def health():
+    return await execute(apply_health)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(404, "Metrics are disabled")
+    if engine is None:
+        text = REGISTRY.render()
+    else:
+        # HTTP metrics are this worker's own; bank metrics come from the engine
+        text = REGISTRY.render(prefix="http_") + await execute(apply_render_metrics)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats", response_class=FastJSONResponse)
+async def stats():
+    """Account count, totals and a balance histogram, kept current on every change."""
+    return FastJSONResponse(await execute(apply_stats))
+
+
+# the sampling profiler currently running, if any
+profiler: Optional[SamplingProfiler] = None
+
+
+@app.get("/admin/profile", response_class=PlainTextResponse, include_in_schema=False)
+async def profile(seconds: float = Query(10, gt=0, le=300), interval_ms: float = Query(5, ge=1, le=1000)):
+    """Sample this process's event loop for ``seconds``; returns collapsed stacks for a flame graph."""
+    global profiler
+    if not PROFILING_ENABLED:
+        raise HTTPException(404, "Profiling is disabled")
+    if profiler is not None:
+        raise HTTPException(409, "A profile is already running")
+    running = profiler = SamplingProfiler(threading.get_ident(), interval_ms / 1000)
+    running.start()
     try:
-        sender = bank.get_account(data.sender)
-        recipient = bank.get_account(data.recipient)
-        sender.transfer(recipient, data.amount)
-        return {"message": f"{data.amount:.2f} transferred from {data.sender} to {data.recipient}"}
-    except (AccountNotFoundError, NegativeAmountError, InsufficientFundsError, ValueError) as e:
-        raise HTTPException(400, str(e))
+        await asyncio.sleep(seconds)
+    finally:
+        running.stop()
+        profiler = None
+    return PlainTextResponse(running.collapsed(), headers={
+        "Content-Disposition": 'attachment; filename="profile.folded"',
+        "X-Profile-Samples": str(running.samples),
+    })
+
+
+@app.get("/accounts")
+@app.get("/accounts/")
+async def list_accounts(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    prefix: str = "",
+    min_balance: Optional[Money] = None,
+    max_balance: Optional[Money] = None,
+):
+    return await execute(apply_list_accounts, cursor, limit, prefix, min_balance, max_balance)
+
+
+@app.post("/accounts/")
+async def create_account(data: AccountCreate):
+    return await execute(apply_create_account, data.name, data.initial_balance, locks=(data.name,))
+
+
+ExportFormat = Literal["ndjson", "csv"]
+
+
+@app.post("/accounts/import")
+async def import_accounts(request: Request, format: ExportFormat = "ndjson"):
+    """Create accounts from an NDJSON or CSV body, streamed and applied in chunks.
+
+    Each chunk is applied as a whole or not at all. A bad line stops the
+    import and the error says how many accounts were created before it.
+    """
+    parser = bulk.AccountParser(format)
+    imported = 0
+    chunk: List[list] = []
+
+    async def flush():
+        nonlocal imported, chunk
+        if chunk:
+            names = [name for name, _ in chunk]
+            result = await execute(apply_create_accounts, chunk, locks=names)
+            imported += result["imported"]
+            chunk = []
+
+    try:
+        try:
+            async for line in bulk.iter_lines(request.stream()):
+                row = parser.parse_line(line)
+                if row is not None:
+                    chunk.append(list(row))
+                    if len(chunk) == bulk.CHUNK_SIZE:
+                        await flush()
+        except (ValueError, UnicodeDecodeError) as e:
+            raise HTTPException(400, str(e))
+        await flush()
+    except HTTPException as e:
+        raise HTTPException(e.status_code, f"{e.detail} ({imported} accounts imported before the error)")
+    return {"imported": imported}
+
+
+async def _account_pages() -> AsyncIterator[List[list]]:
+    """Every account's ``[name, balance]``, a page at a time in name order."""
+    cursor = None
+    while True:
+        page = await execute(apply_export_accounts, cursor, bulk.CHUNK_SIZE)
+        yield page["rows"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
+
+
+async def _export_accounts(format: str) -> AsyncIterator[str]:
+    yield bulk.header(bulk.ACCOUNT_FIELDS, format)
+    async for rows in _account_pages():
+        yield bulk.format_accounts(rows, format)
+
+
+async def _export_ledger(format: str) -> AsyncIterator[str]:
+    yield bulk.header(bulk.LEDGER_FIELDS, format)
+    offset = 0
+    while offset is not None:
+        page = await execute(apply_export_ledger, offset, bulk.CHUNK_SIZE)
+        yield bulk.format_ledger(page["rows"], format)
+        offset = page["next_offset"]
+
+
+@app.get("/accounts/export")
+async def export_accounts(format: ExportFormat = "ndjson"):
+    """Stream every account in name order, one page of the name index at a time."""
+    return StreamingResponse(_export_accounts(format), media_type=bulk.MEDIA_TYPES[format])
+
+
+@app.get("/ledger/export")
+async def export_ledger(format: ExportFormat = "ndjson"):
+    """Stream every ledger entry in the order it was written."""
+    return StreamingResponse(_export_ledger(format), media_type=bulk.MEDIA_TYPES[format])
+
+
+FEED_PAGE_SIZE = 1000
+# Comment lines sent on an idle stream, so dead connections are noticed
+FEED_HEARTBEAT = float(os.getenv("BANK_FEED_HEARTBEAT", 15))
+# How often an HTTP worker asks the engine for new events once caught up
+FEED_POLL_INTERVAL = float(os.getenv("BANK_FEED_POLL_MS", 50)) / 1000
+
+
+def _sse(event: str, data: Any, id: Optional[int] = None) -> bytes:
+    head = f"id: {id}\nevent: {event}\n" if id is not None else f"event: {event}\n"
+    return head.encode() + b"data: " + dumps(data) + b"\n\n"
+
+
+async def _stream_feed(offset: Optional[int], follow: bool) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+    idle_since = loop.time()
+    while True:
+        page = await execute(apply_read_feed, offset, FEED_PAGE_SIZE)
+        if page.get("resync"):
+            # this subscriber fell behind the ring buffer; it must re-read state and start over
+            yield _sse("resync", {key: page[key] for key in ("oldest_offset", "next_offset")})
+            return
+        offset = page["next_offset"]
+        if page["events"]:
+            yield b"".join(_sse(event["type"], event, event["offset"]) for event in page["events"])
+            idle_since = loop.time()
+            continue
+        if not follow:
+            return
+        if engine is None:
+            await feed.wait(offset, FEED_HEARTBEAT)
+        else:
+            await asyncio.sleep(FEED_POLL_INTERVAL)
+        if loop.time() - idle_since >= FEED_HEARTBEAT:
+            yield b": keep-alive\n\n"
+            idle_since = loop.time()
+
+
+@app.get("/events")
+async def events(
+    offset: Optional[int] = Query(None, ge=0),
+    follow: bool = True,
+    last_event_id: Annotated[Optional[int], Header(ge=0)] = None,
+):
+    """Server-Sent Events for every account creation, deposit, withdrawal and transfer.
+
+    Starts at ``offset``, after ``Last-Event-ID`` when reconnecting, or else
+    at the end of the feed. ``follow=false`` ends the stream once caught up.
+    """
+    if offset is None and last_event_id is not None:
+        offset = last_event_id + 1
+    return StreamingResponse(
+        _stream_feed(offset, follow), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/accounts/{name}", response_class=FastJSONResponse)
+async def get_balance(name: str):
+    return FastJSONResponse(await execute(apply_get_balance, name))
+
+
+@app.get("/accounts/{name}/balance", response_class=FastJSONResponse)
+async def get_balance_at(name: str, as_of: Optional[datetime] = None):
+    """The balance now, or as of ``as_of`` (ISO 8601 or Unix seconds)."""
+    if as_of is None:
+        return FastJSONResponse(await execute(apply_get_balance, name))
+    body = await execute(apply_get_balance_at, name, as_of.timestamp())
+    body["as_of"] = as_of.isoformat()
+    return FastJSONResponse(body)
+
+
+@app.get("/accounts/{name}/transactions")
+async def list_transactions(
+    name: str,
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    kind: Optional[str] = None,
+    counterparty: Optional[str] = None,
+):
+    return await execute(
+        apply_list_transactions,
+        name,
+        cursor,
+        limit,
+        since.timestamp() if since is not None else None,
+        until.timestamp() if until is not None else None,
+        kind,
+        counterparty,
+    )
+
+
+# The hot money-moving routes format their message only when the client
+# wants a body ("Prefer: return=minimal" gets an empty 204 instead).
+@app.post("/accounts/{name}/deposits", response_class=FastJSONResponse)
+async def deposit(name: str, data: TransactionAmount, idempotency_key: IdempotencyKey = None,
+                  prefer: PreferHeader = None):
+    limit_accounts({name: 1})
+    await execute(apply_deposit, name, data.amount, idempotency_key, locks=credit_locks(name))
+    if wants_minimal(prefer):
+        return no_content()
+    return FastJSONResponse({"message": f"{format_minor(data.amount)} deposited to {name}"})
+
+
+@app.post("/accounts/{name}/withdrawals", response_class=FastJSONResponse)
+async def withdraw(name: str, data: TransactionAmount, idempotency_key: IdempotencyKey = None,
+                   prefer: PreferHeader = None):
+    limit_accounts({name: 1})
+    await execute(apply_withdraw, name, data.amount, idempotency_key, locks=(name,))
+    if wants_minimal(prefer):
+        return no_content()
+    return FastJSONResponse({"message": f"{format_minor(data.amount)} withdrawn from {name}"})
+
+
+@app.post("/transfers", response_class=FastJSONResponse)
+async def transfer(data: Transfer, idempotency_key: IdempotencyKey = None, prefer: PreferHeader = None):
+    # accounts are limited on the transactions they start, not the ones they receive
+    limit_accounts({data.sender: 1})
+    await execute(
+        apply_transfer, data.sender, data.recipient, data.amount, idempotency_key,
+        locks=(data.sender, *credit_locks(data.recipient)),
+    )
+    if wants_minimal(prefer):
+        return no_content()
+    return FastJSONResponse(
+        {"message": f"{format_minor(data.amount)} transferred from {data.sender} to {data.recipient}"}
+    )
+
+
+@app.post("/transfers/batch")
+async def transfer_batch(data: TransferBatch, idempotency_key: IdempotencyKey = None):
+    legs = [[leg.sender, leg.recipient, leg.amount] for leg in data.transfers]
+    names = {leg.sender for leg in data.transfers} | {leg.recipient for leg in data.transfers}
+    limit_accounts(collections.Counter(leg.sender for leg in data.transfers))
+    return await execute(apply_transfer_batch, legs, idempotency_key, locks=names)
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,179 @@
+import os
+from functools import wraps
+from time import perf_counter_ns
+from typing import Callable, Dict, List, Tuple
+
+# Read once at import: when off, nothing is wrapped and no middleware is installed
+METRICS_ENABLED = os.getenv("BANK_METRICS", "1").lower() not in ("0", "false", "off")
+
+# Histograms bucket nanosecond durations by power of two, so an observation
+# costs one int.bit_length() instead of a search over bucket bounds. Rendered
+# bounds run from 2**8 ns (256ns) to 2**33 ns (~8.6s), in seconds.
+MIN_BUCKET, MAX_BUCKET = 8, 33
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        # counts[k] holds the durations in (2**(k-1), 2**k] nanoseconds
+        self.counts = [0] * 64
+        self.sum = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, nanoseconds: int):
+        self.counts[(nanoseconds - 1).bit_length()] += 1
+        self.sum += nanoseconds
+
+
+class Registry:
+    """In-process metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._series: Dict[Tuple[str, Labels], object] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+
+    def counter(self, name: str, help: str, **labels: str) -> Counter:
+        return self._get(name, "counter", help, labels, Counter)
+
+    def histogram(self, name: str, help: str, **labels: str) -> Histogram:
+        return self._get(name, "histogram", help, labels, Histogram)
+
+    def gauge(self, name: str, help: str, read: Callable[[], float]):
+        """Register a gauge whose value is read when the registry is rendered."""
+        self._help[name] = ("gauge", help)
+        self._gauges[name] = read
+
+    def render(self, prefix: str = "") -> str:
+        """Render every metric, or only those whose name starts with ``prefix``."""
+        lines: List[str] = []
+        for name, (kind, help) in sorted(self._help.items()):
+            if not name.startswith(prefix):
+                continue
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "gauge":
+                lines.append(f"{name} {self._gauges[name]()}")
+                continue
+            for (series_name, labels), metric in sorted(self._series.items(), key=lambda item: item[0]):
+                if series_name != name:
+                    continue
+                if kind == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+                else:
+                    counts = metric.counts
+                    cumulative = sum(counts[:MIN_BUCKET])
+                    for k in range(MIN_BUCKET, MAX_BUCKET + 1):
+                        cumulative += counts[k]
+                        le = repr(2 ** k / 1e9)
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                    total = cumulative + sum(counts[MAX_BUCKET + 1:])
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {total}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum / 1e9}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {total}")
+        return "\n".join(lines) + "\n"
+
+    def _get(self, name: str, kind: str, help: str, labels: Dict[str, str], factory):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._series.get(key)
+        if metric is None:
+            self._help.setdefault(name, (kind, help))
+            metric = self._series[key] = factory()
+        return metric
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = (
+        key + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+REGISTRY = Registry()
+
+
+def timed(operation: str, registry: Registry = REGISTRY):
+    """Record the latency and failures of the decorated bank operation.
+
+    Returns the function unchanged when metrics are disabled.
+    """
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+        latency = registry.histogram(
+            "bank_operation_seconds", "Latency of bank operations.", operation=operation
+        )
+        errors = registry.counter(
+            "bank_operation_errors_total", "Bank operations that raised.", operation=operation
+        )
+
+        counts = latency.counts
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                errors.value += 1
+                raise
+            finally:
+                # Histogram.observe inlined: this runs on every deposit and transfer
+                elapsed = perf_counter_ns() - start
+                counts[(elapsed - 1).bit_length()] += 1
+                latency.sum += elapsed
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by method, route template and status."""
+
+    def __init__(self, app, registry: Registry = REGISTRY):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = perf_counter_ns()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            self.registry.histogram(
+                "http_request_duration_seconds", "HTTP request latency.",
+                method=scope["method"], route=path,
+            ).observe(perf_counter_ns() - start)
+            self.registry.counter(
+                "http_requests_total", "HTTP requests by response status.",
+                method=scope["method"], route=path, status=str(status[0]),
+            ).inc()
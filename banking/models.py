@@ -1,64 +1,507 @@
-from typing import Dict, List
+import itertools
+import os
+import time
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
-from banking.errors import AccountNotFoundError, InsufficientFundsError, NegativeAmountError
+from banking.errors import AccountNotFoundError, BalanceLimitError, InsufficientFundsError, NegativeAmountError
+from banking.index import SortedNameIndex
+from banking.ledger import NO_COUNTERPARTY, Ledger, LedgerEntry, TransactionKind
+from banking.locks import AccountLocks
+from banking.metrics import timed
+from banking.money import MAX_BALANCE, format_minor
+from banking.snapshot import Snapshot, read_snapshot, write_snapshot
+from banking.stats import BookStats, StatsSnapshot
+from banking.wal import WriteAheadLog
+
+# Credits a hot account buffers before folding them into its balance
+HOT_FOLD_SIZE = 256
+# Names a filtered account listing may scan per requested account
+SCAN_FACTOR = 10
 
 
 class Account:
-    def __init__(self, name: str, initial_balance: float):
+    """A named balance whose history lives in the shared ``Ledger``.
+
+    Accounts are kept small for books of millions: slots instead of a
+    ``__dict__``, and the ledger offsets of its entries held as a bare int
+    while there is only one (the opening entry), grown into an array on
+    the second.
+    """
+
+    __slots__ = ("name", "balance", "_ledger", "_ledger_id", "_entries")
+
+    def __init__(self, name: str, initial_balance: int, ledger: Optional[Ledger] = None,
+                 created_at: Optional[float] = None, opening_kind: TransactionKind = TransactionKind.CREATED):
         self.name = name
         self.balance = initial_balance
-        self.transactions: List[str] = [f'Account created with balance: {initial_balance:.2f}']
+        self._ledger = ledger if ledger is not None else Ledger()
+        self._ledger_id = self._ledger.register(name)
+        self._entries: Union[None, int, array] = None
+        self._record_transaction(opening_kind, initial_balance, timestamp=created_at)
 
-    def deposit(self, amount: float):
+    @timed("deposit")
+    def deposit(self, amount: int):
         self._validate_positive_amount(amount)
-        self.balance += amount
-        self._record_transaction('Deposited', amount)
+        self._credit(amount, TransactionKind.DEPOSIT)
 
-    def withdraw(self, amount: float):
+    @timed("withdraw")
+    def withdraw(self, amount: int):
         self._validate_positive_amount(amount)
-        if amount > self.balance:
-            raise InsufficientFundsError(f"Cannot withdraw {amount:.2f}; balance is only {self.balance:.2f}")
+        self._check_funds(amount)
         self.balance -= amount
-        self._record_transaction('Withdrawn', amount)
+        self._record_transaction(TransactionKind.WITHDRAWAL, amount)
 
-    def transfer(self, target: 'Account', amount: float):
+    @timed("transfer")
+    def transfer(self, target: 'Account', amount: int):
         if self == target:
             raise ValueError("Cannot transfer to the same account")
-        
-        self.withdraw(amount)
-        target.deposit(amount)
-        self._record_transaction('Transferred to', amount, target.name)
-        target._record_transaction('Received from', amount, self.name)
+
+        self._validate_positive_amount(amount)
+        self._check_funds(amount)
+        # checked before the debit, so a refused credit leaves both accounts untouched
+        target._check_room(amount)
+        self.balance -= amount
+        self._record_transaction(TransactionKind.TRANSFER_OUT, amount, target.name)
+        target._credit(amount, TransactionKind.TRANSFER_IN, self.name)
 
     def get_transaction_history(self) -> List[str]:
-        return self.transactions.copy()
+        return [self._ledger.render(offset) for offset in self._offsets()]
+
+    def get_transactions(self, cursor: int = 0, limit: int = 100,
+                         since: Optional[float] = None, until: Optional[float] = None,
+                         kind: Optional[TransactionKind] = None,
+                         counterparty: Optional[str] = None) -> Tuple[List[LedgerEntry], Optional[int]]:
+        return self._ledger.page(self._offsets(), cursor, limit, since, until, kind, counterparty)
 
-    def _validate_positive_amount(self, amount: float):
+    def balance_at(self, timestamp: float) -> Optional[int]:
+        """The balance as of ``timestamp``, or None before the account's first entry."""
+        return self._ledger.balance_at(self._offsets(), timestamp)
+
+    def _validate_positive_amount(self, amount: int):
         if amount <= 0:
             raise NegativeAmountError("Amount must be positive")
 
-    def _record_transaction(self, action: str, amount: float, other_party: str = ""):
-        transaction = f'{action}: {amount:.2f}'
-        if other_party:
-            transaction += f' {other_party}'
-        self.transactions.append(transaction)
+    def _check_funds(self, amount: int):
+        if amount > self.balance:
+            raise InsufficientFundsError(f"Cannot withdraw {format_minor(amount)}; balance is only {format_minor(self.balance)}")
+
+    def _check_room(self, amount: int):
+        if amount > MAX_BALANCE - self.balance:
+            raise BalanceLimitError(
+                f"Cannot credit {format_minor(amount)}; the balance of '{self.name}' would exceed "
+                f"the maximum of {format_minor(MAX_BALANCE)}"
+            )
+
+    def _credit(self, amount: int, kind: TransactionKind, other_party: str = ""):
+        self._check_room(amount)
+        self.balance += amount
+        self._record_transaction(kind, amount, other_party)
+
+    def _record_transaction(self, kind: TransactionKind, amount: int, other_party: str = "",
+                            timestamp: Optional[float] = None):
+        counterparty_id = self._ledger.register(other_party) if other_party else NO_COUNTERPARTY
+        self._add_entry(
+            self._ledger.append(self._ledger_id, kind, amount, self.balance, counterparty_id, timestamp)
+        )
+
+    def _offsets(self) -> Sequence[int]:
+        """Ledger offsets of this account's entries, oldest first."""
+        entries = self._entries
+        return (entries,) if type(entries) is int else entries
+
+    def _add_entry(self, offset: int):
+        entries = self._entries
+        if entries is None:
+            self._entries = offset
+        elif type(entries) is int:
+            self._entries = array('q', (entries, offset))
+        else:
+            entries.append(offset)
+
+    def _add_entries(self, first: int, count: int):
+        if count == 1:
+            self._add_entry(first)
+            return
+        entries = self._entries
+        if type(entries) is not array:
+            entries = self._entries = array('q', self._offsets())
+        entries.extend(range(first, first + count))
+
+
+class HotAccount(Account):
+    """An Account for heavily credited accounts, such as a busy merchant.
+
+    Deposits and incoming transfers only append to a pending buffer, which
+    is folded into the settled balance and the ledger in one batch every
+    ``fold_size`` credits, and before anything else changes the account or
+    reads its history. ``balance`` always includes the pending credits, so
+    debits are checked against the full balance.
+    """
+
+    __slots__ = ("fold_size", "_settled", "_pending_total", "_pending_kinds", "_pending_amounts",
+                 "_pending_counterparties", "_pending_timestamps")
+
+    def __init__(self, name: str, initial_balance: int, ledger: Optional[Ledger] = None,
+                 created_at: Optional[float] = None, opening_kind: TransactionKind = TransactionKind.CREATED,
+                 fold_size: int = HOT_FOLD_SIZE):
+        self.fold_size = fold_size
+        self._settled = 0
+        self._pending_total = 0
+        self._reset_pending()
+        super().__init__(name, initial_balance, ledger, created_at, opening_kind)
+
+    @property
+    def balance(self) -> int:
+        return self._settled + self._pending_total
+
+    @balance.setter
+    def balance(self, value: int):
+        self.settle()
+        self._settled = value
+
+    @property
+    def pending(self) -> int:
+        """Number of credits not yet folded into the ledger."""
+        return len(self._pending_amounts)
+
+    def settle(self):
+        """Fold the pending credits into the balance and the ledger."""
+        count = len(self._pending_amounts)
+        if not count:
+            return
+        running = itertools.accumulate(self._pending_amounts, initial=self._settled)
+        next(running)
+        balances = array('q', running)
+        first = self._ledger.extend_account(
+            self._ledger_id, self._pending_kinds, self._pending_amounts, balances,
+            self._pending_counterparties, self._pending_timestamps,
+            after=self._ledger[self._offsets()[-1]].timestamp,
+        )
+        self._add_entries(first, count)
+        self._settled = balances[-1]
+        self._pending_total = 0
+        self._reset_pending()
+
+    def get_transaction_history(self) -> List[str]:
+        self.settle()
+        return super().get_transaction_history()
+
+    def get_transactions(self, *args, **kwargs) -> Tuple[List[LedgerEntry], Optional[int]]:
+        self.settle()
+        return super().get_transactions(*args, **kwargs)
+
+    def balance_at(self, timestamp: float) -> Optional[int]:
+        self.settle()
+        return super().balance_at(timestamp)
+
+    def _credit(self, amount: int, kind: TransactionKind, other_party: str = ""):
+        self._check_room(amount)
+        self._pending_kinds.append(kind)
+        self._pending_amounts.append(amount)
+        self._pending_counterparties.append(
+            self._ledger.register(other_party) if other_party else NO_COUNTERPARTY
+        )
+        self._pending_timestamps.append(time.time())
+        self._pending_total += amount
+        if len(self._pending_amounts) >= self.fold_size:
+            self.settle()
+
+    def _record_transaction(self, kind: TransactionKind, amount: int, other_party: str = "",
+                            timestamp: Optional[float] = None):
+        # earlier credits go into the ledger first, so running balances stay in order
+        self.settle()
+        super()._record_transaction(kind, amount, other_party, timestamp)
+
+    def _reset_pending(self):
+        self._pending_kinds = array('B')
+        self._pending_amounts = array('q')
+        self._pending_counterparties = array('q')
+        self._pending_timestamps = array('d')
 
 
 class Bank:
-    def __init__(self):
+    def __init__(self, hot_accounts: Iterable[str] = ()):
         self.accounts: Dict[str, Account] = {}
+        # names whose accounts coalesce incoming credits (see HotAccount)
+        self.hot_accounts = frozenset(hot_accounts)
+        self._hot: List[HotAccount] = []
+        self.names = SortedNameIndex()
+        self.ledger = Ledger()
+        # aggregates over every account, updated by each ledger entry
+        self.stats = BookStats()
+        self.ledger.track(self.stats)
+        self.locks = AccountLocks()
+        self.wal: Optional[WriteAheadLog] = None
+        self.snapshot_path: Optional[str] = None
+        self.startup_seconds = 0.0
+        # when restored from a snapshot: where the ledger's history begins, and the log before it
+        self.history_starts_at: Optional[float] = None
+        self._archive_end = 0
+        self._archive: Optional[Dict[str, Tuple[array, array]]] = None
+
+    @classmethod
+    def open(cls, wal: WriteAheadLog, snapshot_path: Optional[str] = None,
+             hot_accounts: Iterable[str] = ()) -> 'Bank':
+        """Rebuild a bank and log every later change to ``wal``.
+
+        The latest snapshot at ``snapshot_path`` is loaded first when it is
+        usable, so only the log written after it has to be replayed.
+        """
+        started = time.perf_counter()
+        bank = cls()
+        bank.hot_accounts = frozenset(hot_accounts)
+        start = 0
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            try:
+                snapshot = read_snapshot(snapshot_path)
+            except ValueError:
+                snapshot = None
+            if snapshot is not None and snapshot.wal_offset <= wal.size:
+                bank.restore(snapshot)
+                start = snapshot.wal_offset
+        interrupted = bank.replay(wal.replay(start))
+        bank.wal = wal
+        bank.snapshot_path = snapshot_path
+        bank.ledger.subscribe(wal.append, wal.append_many)
+        for outgoing in interrupted:
+            bank._complete_transfer(outgoing)
+        bank.startup_seconds = time.perf_counter() - started
+        return bank
+
+    def settle(self):
+        """Fold the pending credits of every hot account into the ledger."""
+        for account in self._hot:
+            account.settle()
+
+    def close(self):
+        self.settle()
+        if self.wal is not None:
+            self.wal.close()
+
+    def capture_snapshot(self) -> Snapshot:
+        """Copy the current balances and the log position they correspond to."""
+        self.settle()
+        return Snapshot(
+            self.wal.size if self.wal is not None else 0,
+            time.time(),
+            list(self.accounts),
+            array('q', [account.balance for account in self.accounts.values()]),
+        )
+
+    def save_snapshot(self, snapshot: Optional[Snapshot] = None):
+        """Write ``snapshot`` (by default, the current state) to ``snapshot_path``.
+
+        Only the capture has to run on the event loop; the write is safe to
+        hand to a worker thread.
+        """
+        if snapshot is None:
+            snapshot = self.capture_snapshot()
+        if self.wal is not None:
+            # the snapshot must never be ahead of what the log has made durable
+            self.wal.sync()
+        write_snapshot(self.snapshot_path, snapshot.names, snapshot.balances,
+                       snapshot.wal_offset, snapshot.taken_at)
+
+    def restore(self, snapshot: Snapshot):
+        for name, balance in zip(snapshot.names, snapshot.balances):
+            self._add_account(self._new_account(name, balance, snapshot.taken_at, TransactionKind.OPENING))
+        self.history_starts_at = snapshot.taken_at
+        self._archive_end = snapshot.wal_offset
+        self._archive = None
+
+    def archived_balance_at(self, name: str, timestamp: float) -> Optional[int]:
+        """The balance of ``name`` as of ``timestamp``, from the log the restored snapshot replaced.
 
-    def create_account(self, name: str, initial_balance: float) -> Account:
+        The first call reads that part of the log once and keeps each
+        account's timestamps and running balances, so later calls are one
+        binary search. None if the account has no entry at or before
+        ``timestamp`` there, or the bank has no such log.
+        """
+        if self._archive is None:
+            if self.wal is None or not self._archive_end:
+                return None
+            archive: Dict[str, Tuple[array, array]] = {}
+            for entry in self.wal.read(0, self._archive_end):
+                timestamps, balances = archive.setdefault(entry.account, (array('d'), array('q')))
+                timestamps.append(entry.timestamp)
+                balances.append(entry.balance)
+            self._archive = archive
+        if name not in self._archive:
+            return None
+        timestamps, balances = self._archive[name]
+        position = bisect_right(timestamps, timestamp)
+        return balances[position - 1] if position else None
+
+    def replay(self, entries: Iterable[LedgerEntry]) -> List[LedgerEntry]:
+        """Re-apply logged ledger entries without re-validating them.
+
+        Returns the outgoing legs of transfers whose incoming leg was never
+        logged: the process stopped between the two, or before a hot
+        recipient folded its pending credits.
+        """
+        # the latest outgoing leg, while its incoming leg may still follow it directly
+        outgoing: Optional[LedgerEntry] = None
+        # (sender, recipient, amount) -> outgoing legs whose incoming leg was deferred
+        deferred: Dict[Tuple[str, str, int], List[LedgerEntry]] = {}
+        for entry in entries:
+            if entry.kind == TransactionKind.CREATED:
+                self._add_account(self._new_account(entry.account, entry.balance, entry.timestamp))
+            else:
+                account = self.accounts[entry.account]
+                account.balance = entry.balance
+                account._record_transaction(entry.kind, entry.amount, entry.counterparty or "", entry.timestamp)
+            if entry.kind == TransactionKind.TRANSFER_IN and outgoing is not None \
+                    and (outgoing.account, outgoing.counterparty, outgoing.amount) \
+                    == (entry.counterparty, entry.account, entry.amount):
+                outgoing = None
+                continue
+            if outgoing is not None:
+                deferred.setdefault((outgoing.account, outgoing.counterparty, outgoing.amount), []).append(outgoing)
+                outgoing = None
+            if entry.kind == TransactionKind.TRANSFER_OUT:
+                outgoing = entry
+            elif entry.kind == TransactionKind.TRANSFER_IN and deferred:
+                key = (entry.counterparty, entry.account, entry.amount)
+                legs = deferred.get(key)
+                if legs:
+                    legs.pop(0)
+                    if not legs:
+                        del deferred[key]
+        interrupted = [leg for legs in deferred.values() for leg in legs]
+        if outgoing is not None:
+            interrupted.append(outgoing)
+        return sorted(interrupted, key=lambda leg: leg.timestamp)
+
+    def _complete_transfer(self, outgoing: LedgerEntry):
+        recipient = self.accounts[outgoing.counterparty]
+        recipient.balance += outgoing.amount
+        recipient._record_transaction(
+            TransactionKind.TRANSFER_IN, outgoing.amount, outgoing.account, outgoing.timestamp
+        )
+
+    @timed("create_account")
+    def create_account(self, name: str, initial_balance: int) -> Account:
         if name in self.accounts:
             raise ValueError("Account already exists.")
         if initial_balance < 0:
             raise ValueError("Initial balance cannot be negative")
-        account = Account(name, initial_balance)
-        self.accounts[name] = account
+        if initial_balance > MAX_BALANCE:
+            raise BalanceLimitError(f"Initial balance cannot exceed {format_minor(MAX_BALANCE)}")
+        account = self._new_account(name, initial_balance)
+        self._add_account(account)
         return account
 
+    def create_accounts(self, rows: Iterable[Tuple[str, int]]) -> int:
+        """Create an account for every ``(name, initial_balance)`` row.
+
+        All rows are checked before any account is created, so a bad row
+        leaves the bank unchanged. Callers feed large imports through here
+        one bounded chunk at a time.
+        """
+        rows = list(rows)
+        seen = set()
+        for name, initial_balance in rows:
+            if name in self.accounts or name in seen:
+                raise ValueError(f"Account '{name}' already exists.")
+            if initial_balance < 0:
+                raise ValueError(f"Initial balance of '{name}' cannot be negative")
+            if initial_balance > MAX_BALANCE:
+                raise BalanceLimitError(f"Initial balance of '{name}' cannot exceed {format_minor(MAX_BALANCE)}")
+            seen.add(name)
+        for name, initial_balance in rows:
+            self._add_account(self._new_account(name, initial_balance))
+        return len(rows)
+
+    def _add_account(self, account: Account):
+        self.accounts[account.name] = account
+        self.names.add(account.name)
+
+    def _new_account(self, name: str, balance: int, created_at: Optional[float] = None,
+                     kind: TransactionKind = TransactionKind.CREATED) -> Account:
+        if name in self.hot_accounts:
+            account = HotAccount(name, balance, self.ledger, created_at, kind)
+            self._hot.append(account)
+            return account
+        return Account(name, balance, self.ledger, created_at, kind)
+
     def get_account(self, name: str) -> Account:
         account = self.accounts.get(name)
         if account is None:
             raise AccountNotFoundError(f"Account '{name}' not found")
         return account
+
+    def total_balance(self) -> int:
+        return sum(account.balance for account in self.accounts.values())
+
+    def snapshot_stats(self) -> StatsSnapshot:
+        """A consistent copy of the whole-book aggregates, pending credits included."""
+        self.settle()
+        return self.stats.snapshot()
+
+    def list_accounts(self, after: Optional[str] = None, limit: int = 100, prefix: str = "",
+                      min_balance: Optional[int] = None,
+                      max_balance: Optional[int] = None) -> Tuple[List[Account], Optional[str]]:
+        """Return one page of accounts in name order, starting after ``after``.
+
+        The returned cursor is the last name scanned (pass it back as
+        ``after``), or None once the index is exhausted. Balance filters skip
+        non-matching accounts as the scan goes, but a page scans at most
+        ``limit * SCAN_FACTOR`` names, so a filtered page may come back short
+        or empty with a cursor to continue from.
+        """
+        if after is not None and after >= prefix:
+            names = self.names.iter_from(after, inclusive=False)
+        else:
+            names = self.names.iter_from(prefix)
+        page: List[Account] = []
+        budget = limit * SCAN_FACTOR
+        for name in names:
+            if not name.startswith(prefix):
+                break
+            account = self.accounts[name]
+            if ((min_balance is None or account.balance >= min_balance)
+                    and (max_balance is None or account.balance <= max_balance)):
+                page.append(account)
+                if len(page) == limit:
+                    return page, name
+            budget -= 1
+            if not budget:
+                return page, name
+        return page, None
+
+    def transfer_batch(self, transfers: Iterable[Tuple[str, str, int]]) -> int:
+        """Apply every (sender, recipient, amount) leg, or none of them."""
+        legs = []
+        balances: Dict[str, int] = {}
+        for index, (sender_name, recipient_name, amount) in enumerate(transfers):
+            try:
+                sender = self.get_account(sender_name)
+                recipient = self.get_account(recipient_name)
+                if sender is recipient:
+                    raise ValueError("Cannot transfer to the same account")
+                sender._validate_positive_amount(amount)
+                available = balances.get(sender_name, sender.balance)
+                if amount > available:
+                    raise InsufficientFundsError(
+                        f"Cannot withdraw {format_minor(amount)}; balance is only {format_minor(available)}"
+                    )
+                received = balances.get(recipient_name, recipient.balance)
+                if amount > MAX_BALANCE - received:
+                    raise BalanceLimitError(
+                        f"Cannot credit {format_minor(amount)}; the balance of '{recipient_name}' would exceed "
+                        f"the maximum of {format_minor(MAX_BALANCE)}"
+                    )
+            except (AccountNotFoundError, NegativeAmountError, InsufficientFundsError, BalanceLimitError,
+                    ValueError) as e:
+                raise type(e)(f"Transfer {index}: {e}") from None
+            balances[sender_name] = available - amount
+            balances[recipient_name] = received + amount
+            legs.append((sender, recipient, amount))
+
+        # one write-ahead log record for the whole batch: a crash keeps all of it or none
+        with self.ledger.atomic():
+            for sender, recipient, amount in legs:
+                sender.transfer(recipient, amount)
+        return len(legs)
@@ -0,0 +1,64 @@
+from decimal import Decimal, InvalidOperation
+from typing import Union
+
+# Amounts are held as integer minor units (cents): 12.34 is stored as 1234.
+DECIMALS = 2
+SCALE = 10 ** DECIMALS
+# Largest balance, and largest single amount accepted from clients:
+# 9,999,999,999,999.99. Any decimal of at most 15 significant digits survives
+# the trip through a JSON float and back, so every amount and balance the API
+# prints is exact to the cent. (2**53 minor units is not enough: doubles near
+# 9e13 are about 0.016 apart.) It is also far below the int64 ledger limit.
+MAX_BALANCE = 10 ** 15 - 1
+MAX_AMOUNT = MAX_BALANCE
+
+
+def to_minor(value: Union[int, float, str, Decimal]) -> int:
+    """Convert a major-unit amount such as ``12.34`` to exact minor units.
+
+    Floats are converted through their shortest repr, so ``0.1`` becomes
+    ``10`` rather than whatever binary fraction it happens to hold. Amounts
+    with more than ``DECIMALS`` decimal places, or larger in magnitude than
+    ``MAX_AMOUNT`` minor units, are rejected, not rounded.
+    """
+    if isinstance(value, bool):
+        raise ValueError("Amount must be a number")
+    if isinstance(value, int):
+        return _bounded(value * SCALE, value)
+    try:
+        amount = Decimal(repr(value)) if isinstance(value, float) else Decimal(value)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"'{value}' is not a valid amount") from None
+    if not amount.is_finite():
+        raise ValueError(f"'{value}' is not a valid amount")
+    # checked before scaling: an exponent like 1e999999999 must not be expanded
+    if amount.copy_abs() > MAX_AMOUNT:
+        _too_large(value)
+    minor = amount.scaleb(DECIMALS)
+    if minor != minor.to_integral_value():
+        raise ValueError(f"Amount {value} has more than {DECIMALS} decimal places")
+    return _bounded(int(minor), value)
+
+
+def _bounded(minor: int, value) -> int:
+    if abs(minor) > MAX_AMOUNT:
+        _too_large(value)
+    return minor
+
+
+def _too_large(value):
+    raise ValueError(f"Amount {value} exceeds the maximum of {format_minor(MAX_AMOUNT)}")
+
+
+def to_major(minor: int) -> float:
+    """Major-unit value for JSON output.
+
+    The result prints as the exact decimal amount for any balance up to
+    ``MAX_BALANCE``.
+    """
+    return minor / SCALE
+
+
+def format_minor(minor: int) -> str:
+    whole, fraction = divmod(abs(minor), SCALE)
+    return f"{'-' if minor < 0 else ''}{whole}.{fraction:0{DECIMALS}d}"
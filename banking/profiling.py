@@ -0,0 +1,164 @@
+import os
+import sys
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter_ns
+from typing import Callable, Dict, List, Optional
+
+# Read once at import: when off, nothing is wrapped, no middleware is
+# installed and the profiling endpoint returns 404
+PROFILING_ENABLED = os.getenv("BANK_PROFILING", "0").lower() in ("1", "true", "on")
+
+# Spans of the request being traced, if it asked for a trace
+current_trace: ContextVar[Optional['Trace']] = ContextVar("current_trace", default=None)
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every ``interval`` seconds from a helper thread.
+
+    The profiled thread runs untouched: each sample is one read of its
+    current frame and a walk up the stack, done by the helper thread.
+    Samples are kept as counts of collapsed stacks ("outer;...;inner"),
+    the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        labels = self._labels
+        stack: List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            stack.append(label)
+            frame = frame.f_back
+        stack.reverse()
+        self.stacks[";".join(stack)] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        """One ``stack count`` line per distinct stack, most frequent first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+class Trace:
+    """Time spent per phase of one request, in nanoseconds, summed by span name."""
+
+    def __init__(self):
+        self.started = perf_counter_ns()
+        self.spans: Dict[str, int] = {}
+        # when the first bank operation was called and the last one returned
+        self.first_call: Optional[int] = None
+        self.last_return: Optional[int] = None
+
+    def add(self, name: str, nanoseconds: int):
+        self.spans[name] = self.spans.get(name, 0) + nanoseconds
+
+    def server_timing(self, now: int) -> str:
+        """The spans as a Server-Timing header value, in milliseconds.
+
+        ``validate`` runs from the request's arrival to its first bank
+        operation (routing, reading the body, validation), ``encode`` from
+        the last operation to the response headers, and ``total`` covers both.
+        """
+        first = self.first_call if self.first_call is not None else now
+        last = self.last_return if self.last_return is not None else now
+        spans = {"validate": first - self.started, **self.spans, "encode": now - last, "total": now - self.started}
+        return ", ".join(f"{name};dur={nanoseconds / 1e6:.3f}" for name, nanoseconds in spans.items())
+
+
+def traced(execute: Callable) -> Callable:
+    """Wrap ``banking.main.execute`` to time lock waits and bank operations of traced requests."""
+
+    async def execute_traced(func, *args, locks=()):
+        trace = current_trace.get()
+        if trace is None:
+            return await execute(func, *args, locks=locks)
+        called = perf_counter_ns()
+        if trace.first_call is None:
+            trace.first_call = called
+        name = func.__name__
+        ran: List[int] = []
+
+        def timed(*args):
+            ran.append(perf_counter_ns())
+            try:
+                return func(*args)
+            finally:
+                ran.append(perf_counter_ns())
+
+        # the engine looks operations up by name
+        timed.__name__ = name
+        try:
+            return await execute(timed, *args, locks=locks)
+        finally:
+            trace.last_return = perf_counter_ns()
+            label = name[len("apply_"):] if name.startswith("apply_") else name
+            if ran:
+                trace.add("lock_wait", ran[0] - called)
+                trace.add(f"bank.{label}", ran[-1] - ran[0])
+            else:
+                # ran in the engine: the round trip, queueing included
+                trace.add(f"engine.{label}", trace.last_return - called)
+
+    return execute_traced
+
+
+class TraceMiddleware:
+    """ASGI middleware answering requests sent with ``X-Trace: 1`` with a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_trace(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+        trace = Trace()
+        token = current_trace.set(trace)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                timing = trace.server_timing(perf_counter_ns()).encode()
+                message = {**message, "headers": [*message.get("headers", ()), (b"server-timing", timing)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_trace.reset(token)
+
+
+def _wants_trace(headers) -> bool:
+    for name, value in headers:
+        if name == b"x-trace":
+            return value.strip().lower() in (b"1", b"true", b"on")
+    return False
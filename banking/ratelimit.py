@@ -0,0 +1,192 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, List, Mapping, Optional
+
+from starlette.responses import JSONResponse
+
+# Monitoring must keep working while clients are throttled
+EXEMPT_PATHS = ("/health", "/metrics")
+# Long-lived streams would hold a queue slot for as long as they are open
+UNQUEUED_PATHS = ("/events", "/admin/profile")
+
+
+class QueueFull(Exception):
+    """A client already has as many requests waiting as it may."""
+
+
+class RateLimiter:
+    """Token buckets by key: ``rate`` tokens a second, holding at most ``burst``.
+
+    A bucket is two numbers, kept in least-recently-used order. A bucket that
+    has refilled completely is the same as having no bucket, so full buckets
+    are dropped from the front as the limiter is used: memory follows the
+    keys active in the last ``burst / rate`` seconds, plus those still
+    paying off a debt.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        if self.burst < 1:
+            raise ValueError("burst must be at least 1")
+        self._clock = clock
+        # key -> [tokens, last update]
+        self._buckets: 'OrderedDict[str, List[float]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, costs: Mapping[str, float]) -> float:
+        """Take ``costs[key]`` tokens from every key's bucket, or none at all.
+
+        A cost above ``burst`` can never be covered, so it is let through
+        once the bucket is full and charged in full: the bucket goes into
+        debt, and the key's next requests wait until it has refilled.
+        Returns 0.0 on success, otherwise the seconds until the request
+        would fit.
+        """
+        now = self._clock()
+        self._evict(now)
+        wait = 0.0
+        levels = []
+        for key, cost in costs.items():
+            bucket = self._buckets.get(key)
+            tokens = self.burst if bucket is None else min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            needed = min(cost, self.burst)
+            if tokens < needed:
+                wait = max(wait, (needed - tokens) / self.rate)
+            levels.append((key, tokens - cost))
+        if wait:
+            return wait
+        for key, tokens in levels:
+            self._buckets.pop(key, None)
+            self._buckets[key] = [tokens, now]
+        return 0.0
+
+    def _evict(self, now: float):
+        buckets = self._buckets
+        while buckets:
+            tokens, updated = next(iter(buckets.values()))
+            if now - updated < (self.burst - tokens) / self.rate:
+                break
+            buckets.popitem(last=False)
+
+
+class FairQueue:
+    """Runs at most ``concurrency`` requests at once and serves waiting clients in turn.
+
+    Each client waits in its own queue, and a freed slot goes to the next
+    client in round-robin order rather than to the oldest request overall,
+    so a client with hundreds of requests queued delays another client's
+    request by at most one of its own.
+    """
+
+    def __init__(self, concurrency: int, max_waiting: int = 100):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.active = 0
+        # client -> its waiting requests; the first client is next in turn
+        self._waiting: 'OrderedDict[str, Deque[asyncio.Future]]' = OrderedDict()
+
+    def waiting(self, client: Optional[str] = None) -> int:
+        if client is not None:
+            return len(self._waiting.get(client, ()))
+        return sum(len(queue) for queue in self._waiting.values())
+
+    @asynccontextmanager
+    async def turn(self, client: str) -> AsyncIterator[None]:
+        if self.active < self.concurrency and not self._waiting:
+            self.active += 1
+        else:
+            await self._wait(client)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _wait(self, client: str):
+        queue = self._waiting.get(client)
+        if queue is None:
+            queue = self._waiting[client] = deque()
+        elif len(queue) >= self.max_waiting:
+            raise QueueFull(f"Too many requests waiting for client '{client}'")
+        slot = asyncio.get_running_loop().create_future()
+        queue.append(slot)
+        try:
+            # _release hands the slot over without decrementing ``active``
+            await slot
+        except asyncio.CancelledError:
+            if slot.done() and not slot.cancelled():
+                self._release()
+            elif slot in queue:
+                queue.remove(slot)
+                if not queue and self._waiting.get(client) is queue:
+                    del self._waiting[client]
+            raise
+
+    def _release(self):
+        while self._waiting:
+            client, queue = next(iter(self._waiting.items()))
+            slot = queue.popleft()
+            if queue:
+                self._waiting.move_to_end(client)
+            else:
+                del self._waiting[client]
+            if not slot.done():
+                slot.set_result(None)
+                return
+        self.active -= 1
+
+
+def client_key(scope) -> str:
+    """The client a request counts against: its X-Client-Id header, else its address."""
+    for name, value in scope["headers"]:
+        if name == b"x-client-id":
+            return value.decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def too_many_requests(wait: float, detail: str) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=429, headers={"Retry-After": retry_after(wait)})
+
+
+def retry_after(wait: float) -> str:
+    # Retry-After takes whole seconds; round up so the retry fits
+    return str(max(1, math.ceil(wait)))
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying a per-client ``RateLimiter`` and a ``FairQueue``."""
+
+    def __init__(self, app, clients: Optional[RateLimiter] = None, queue: Optional[FairQueue] = None):
+        self.app = app
+        self.clients = clients
+        self.queue = queue
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        client = client_key(scope)
+        if self.clients is not None:
+            wait = self.clients.acquire({client: 1})
+            if wait:
+                await too_many_requests(wait, f"Rate limit exceeded for client '{client}'")(scope, receive, send)
+                return
+        if self.queue is None or scope["path"] in UNQUEUED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        try:
+            async with self.queue.turn(client):
+                await self.app(scope, receive, send)
+        except QueueFull as e:
+            await too_many_requests(1.0, str(e))(scope, receive, send)
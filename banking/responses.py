@@ -0,0 +1,51 @@
+import json
+import os
+from typing import Any, Optional
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional dependency
+    orjson = None
+
+# BANK_COMPACT_RESPONSES=1 answers money-moving requests with an empty 204
+# unless the client asks for a body with "Prefer: return=representation".
+COMPACT_BY_DEFAULT = os.getenv("BANK_COMPACT_RESPONSES", "0").lower() in ("1", "true", "on")
+
+if orjson is not None:
+    dumps = orjson.dumps
+else:  # pragma: no cover - exercised only without orjson
+    # One encoder built up front; json.dumps would build one per call for these options
+    _encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def dumps(content: Any) -> bytes:
+        return _encode(content).encode()
+
+
+class FastJSONResponse(Response):
+    """JSON response for plain dicts of str, int, float, bool and None.
+
+    Skips FastAPI's jsonable_encoder pass and encodes with orjson when it is
+    installed, falling back to a precompiled stdlib encoder.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def wants_minimal(prefer: Optional[str]) -> bool:
+    """Whether to answer with 204 No Content, per the RFC 7240 Prefer header."""
+    if prefer is None:
+        return COMPACT_BY_DEFAULT
+    if "return=minimal" in prefer:
+        return True
+    if "return=representation" in prefer:
+        return False
+    return COMPACT_BY_DEFAULT
+
+
+def no_content() -> Response:
+    return Response(status_code=204)
@@ -0,0 +1,258 @@
+"""A bank split by account name across worker processes.
+
+``ShardedBank(shards=N)`` starts N processes, each owning a plain ``Bank``
+with the accounts whose name hashes to it. Operations are submitted in
+batches: every shard receives its part of a batch in one message and
+the shards run their parts in parallel, in submission order.
+
+A transfer between accounts on different shards runs as a two-phase
+commit. In the first phase the sender's shard places a hold on the amount
+(so no later operation can spend it) and the recipient's shard checks the
+account exists. In the second phase both shards commit if both prepared,
+otherwise the hold is released. A hold only lives between the two phases
+of one ``execute`` call.
+"""
+import itertools
+import multiprocessing
+import threading
+import zlib
+from typing import Any, Dict, List, Sequence, Tuple
+
+from banking.errors import InsufficientFundsError
+from banking.ledger import TransactionKind
+from banking.models import Bank
+from banking.money import format_minor
+
+# ("create_account", name, balance) | ("deposit", name, amount)
+# | ("withdraw", name, amount) | ("transfer", sender, recipient, amount)
+# | ("balance", name) | ("history", name)
+Operation = Tuple[Any, ...]
+
+
+def shard_of(name: str, shards: int) -> int:
+    """The shard owning ``name``; stable across processes, unlike ``hash``."""
+    return zlib.crc32(name.encode()) % shards
+
+
+class Shard:
+    """One partition's state; runs inside its worker process."""
+
+    def __init__(self):
+        self.bank = Bank()
+        # name -> amount held by prepared cross-shard transfers
+        self.holds: Dict[str, int] = {}
+        # transaction id -> (kind, account name, amount, counterparty name)
+        self.prepared: Dict[int, Tuple[TransactionKind, str, int, str]] = {}
+
+    def create_account(self, name: str, balance: int):
+        self.bank.create_account(name, balance)
+
+    def balance(self, name: str) -> int:
+        return self.bank.get_account(name).balance
+
+    def history(self, name: str) -> List[str]:
+        return self.bank.get_account(name).get_transaction_history()
+
+    def deposit(self, name: str, amount: int):
+        self.bank.get_account(name).deposit(amount)
+
+    def withdraw(self, name: str, amount: int):
+        account = self.bank.get_account(name)
+        self._check_available(name, amount)
+        account.withdraw(amount)
+
+    def transfer(self, sender: str, recipient: str, amount: int):
+        source, target = self.bank.get_account(sender), self.bank.get_account(recipient)
+        self._check_available(sender, amount)
+        source.transfer(target, amount)
+
+    def total_balance(self) -> int:
+        return self.bank.total_balance()
+
+    def prepare_debit(self, txid: int, name: str, amount: int, counterparty: str):
+        account = self.bank.get_account(name)
+        account._validate_positive_amount(amount)
+        self._check_available(name, amount)
+        account._check_funds(amount)
+        self.holds[name] = self.holds.get(name, 0) + amount
+        self.prepared[txid] = (TransactionKind.TRANSFER_OUT, name, amount, counterparty)
+
+    def prepare_credit(self, txid: int, name: str, amount: int, counterparty: str):
+        account = self.bank.get_account(name)
+        account._validate_positive_amount(amount)
+        account._check_room(amount)
+        self.prepared[txid] = (TransactionKind.TRANSFER_IN, name, amount, counterparty)
+
+    def commit(self, txid: int):
+        kind, name, amount, counterparty = self.prepared.pop(txid)
+        account = self.bank.get_account(name)
+        if kind == TransactionKind.TRANSFER_OUT:
+            self._release(name, amount)
+            account.balance -= amount
+        else:
+            account.balance += amount
+        account._record_transaction(kind, amount, counterparty)
+
+    def abort(self, txid: int):
+        kind, name, amount, _ = self.prepared.pop(txid)
+        if kind == TransactionKind.TRANSFER_OUT:
+            self._release(name, amount)
+
+    def _check_available(self, name: str, amount: int):
+        held = self.holds.get(name)
+        if held:
+            available = self.bank.get_account(name).balance - held
+            if amount > available:
+                raise InsufficientFundsError(
+                    f"Cannot withdraw {format_minor(amount)}; available balance is only {format_minor(available)}"
+                )
+
+    def _release(self, name: str, amount: int):
+        held = self.holds[name] - amount
+        if held:
+            self.holds[name] = held
+        else:
+            del self.holds[name]
+
+    def run(self, batch: List[Operation]) -> List[Any]:
+        """Apply ``batch`` in order; a failed operation yields its exception."""
+        results = []
+        for method, *args in batch:
+            try:
+                results.append(getattr(self, method)(*args))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def _serve_shard(conn):
+    shard = Shard()
+    while True:
+        batch = conn.recv()
+        if batch is None:
+            break
+        conn.send(shard.run(batch))
+    conn.close()
+
+
+class ShardedBank:
+    """Accounts hash-partitioned across ``shards`` worker processes."""
+
+    def __init__(self, shards: int = 4):
+        if shards < 1:
+            raise ValueError("A sharded bank needs at least one shard")
+        # spawn, not fork: the parent may already be running threads
+        context = multiprocessing.get_context("spawn")
+        self.shards = shards
+        self._conns = []
+        self._processes = []
+        for _ in range(shards):
+            parent, child = context.Pipe()
+            process = context.Process(target=_serve_shard, args=(child,), daemon=True)
+            process.start()
+            child.close()
+            self._conns.append(parent)
+            self._processes.append(process)
+        self._txids = itertools.count()
+        # one batch at a time: the shards answer in the order they were asked
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'ShardedBank':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for conn, process in zip(self._conns, self._processes):
+            if process.is_alive():
+                conn.send(None)
+                process.join()
+            conn.close()
+        self._conns, self._processes = [], []
+
+    def execute(self, operations: Sequence[Operation]) -> List[Any]:
+        """Apply ``operations`` across the shards and return one result per operation.
+
+        A failed operation's result is its exception; the others still apply.
+        Operations on the same shard apply in the given order.
+        """
+        results: List[Any] = [None] * len(operations)
+        batches: List[List[Operation]] = [[] for _ in range(self.shards)]
+        # per shard, the result index each batch entry answers
+        slots: List[List[int]] = [[] for _ in range(self.shards)]
+        # (result index, txid, sender shard, recipient shard)
+        transfers: List[Tuple[int, int, int, int]] = []
+
+        for i, (method, *args) in enumerate(operations):
+            if method == "transfer" and args[0] != args[1]:
+                sender, recipient, amount = args
+                source, target = shard_of(sender, self.shards), shard_of(recipient, self.shards)
+                if source != target:
+                    txid = next(self._txids)
+                    batches[source].append(("prepare_debit", txid, sender, amount, recipient))
+                    slots[source].append(i)
+                    batches[target].append(("prepare_credit", txid, recipient, amount, sender))
+                    slots[target].append(-1 - len(transfers))
+                    transfers.append((i, txid, source, target))
+                    continue
+            batches[shard_of(args[0], self.shards)].append((method, *args))
+            slots[shard_of(args[0], self.shards)].append(i)
+
+        with self._lock:
+            credits = [None] * len(transfers)
+            for shard, answers in self._exchange(batches):
+                for slot, answer in zip(slots[shard], answers):
+                    if slot >= 0:
+                        results[slot] = answer
+                    else:
+                        credits[-1 - slot] = answer
+            if transfers:
+                decisions: List[List[Operation]] = [[] for _ in range(self.shards)]
+                for (i, txid, source, target), credit in zip(transfers, credits):
+                    debited = not isinstance(results[i], Exception)
+                    credited = not isinstance(credit, Exception)
+                    decision = "commit" if debited and credited else "abort"
+                    if debited:
+                        decisions[source].append((decision, txid))
+                    if credited:
+                        decisions[target].append((decision, txid))
+                    if debited and not credited:
+                        results[i] = credit
+                self._exchange(decisions)
+        return results
+
+    def _exchange(self, batches: List[List[Operation]]) -> List[Tuple[int, List[Any]]]:
+        # send every batch before waiting on any, so the shards work in parallel
+        busy = [shard for shard, batch in enumerate(batches) if batch]
+        for shard in busy:
+            self._conns[shard].send(batches[shard])
+        return [(shard, self._conns[shard].recv()) for shard in busy]
+
+    def _one(self, *operation: Any) -> Any:
+        result = self.execute([operation])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def create_account(self, name: str, initial_balance: int):
+        self._one("create_account", name, initial_balance)
+
+    def balance(self, name: str) -> int:
+        return self._one("balance", name)
+
+    def history(self, name: str) -> List[str]:
+        return self._one("history", name)
+
+    def deposit(self, name: str, amount: int):
+        self._one("deposit", name, amount)
+
+    def withdraw(self, name: str, amount: int):
+        self._one("withdraw", name, amount)
+
+    def transfer(self, sender: str, recipient: str, amount: int):
+        self._one("transfer", sender, recipient, amount)
+
+    def total_balance(self) -> int:
+        with self._lock:
+            return sum(answers[0] for _, answers in self._exchange([[("total_balance",)]] * self.shards))
@@ -0,0 +1,67 @@
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from typing import List, NamedTuple
+
+MAGIC = b'BANKSNAP'
+VERSION = 1
+
+# magic, version, account count, names blob length, WAL offset, taken at, crc32, reserved
+_HEADER = struct.Struct('<8sIIQQdII')
+
+
+class Snapshot(NamedTuple):
+    wal_offset: int
+    taken_at: float
+    names: List[str]
+    balances: List[int]
+
+
+def write_snapshot(path: str, names: List[str], balances: array, wal_offset: int, taken_at: float):
+    """Atomically write account balances as of ``wal_offset`` to ``path``.
+
+    Layout: a fixed header, the balances as one int64 column, then the
+    name column as (count + 1) uint64 byte offsets into a UTF-8 blob. Every
+    column starts 8-byte aligned so a reader can map the file and cast the
+    columns in place instead of parsing them.
+    """
+    encoded = [name.encode() for name in names]
+    offsets = array('Q', [0])
+    for name in encoded:
+        offsets.append(offsets[-1] + len(name))
+    blob = b''.join(encoded)
+    payload = balances.tobytes() + offsets.tobytes() + blob
+    header = _HEADER.pack(MAGIC, VERSION, len(names), len(blob), wal_offset, taken_at, zlib.crc32(payload), 0)
+
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as snapshot:
+        snapshot.write(header)
+        snapshot.write(payload)
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temporary, path)
+
+
+def read_snapshot(path: str) -> Snapshot:
+    with open(path, 'rb') as snapshot, mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if len(mapped) < _HEADER.size:
+            raise ValueError(f"Snapshot '{path}' is truncated")
+        magic, version, count, blob_length, wal_offset, taken_at, checksum, _ = _HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a version {VERSION} bank snapshot")
+        names_start = _HEADER.size + count * 8
+        blob_start = names_start + (count + 1) * 8
+        if len(mapped) != blob_start + blob_length:
+            raise ValueError(f"Snapshot '{path}' is corrupt")
+
+        with memoryview(mapped) as view, \
+                view[_HEADER.size:] as payload, \
+                view[_HEADER.size:names_start].cast('q') as balances, \
+                view[names_start:blob_start].cast('Q') as offsets:
+            if zlib.crc32(payload) != checksum:
+                raise ValueError(f"Snapshot '{path}' is corrupt")
+            names = [str(mapped[blob_start + offsets[i]:blob_start + offsets[i + 1]], 'utf-8')
+                     for i in range(count)]
+            return Snapshot(wal_offset, taken_at, names, balances.tolist())
@@ -0,0 +1,92 @@
+from array import array
+from typing import List, NamedTuple
+
+from banking.ledger import TransactionKind
+from banking.money import to_major
+
+# Kinds that add their amount to the account's balance; the rest subtract it
+_CREDITS = frozenset((TransactionKind.DEPOSIT, TransactionKind.TRANSFER_IN))
+# Kinds that bring a new account into the book
+_OPENINGS = frozenset((TransactionKind.CREATED, TransactionKind.OPENING))
+
+
+class StatsSnapshot(NamedTuple):
+    # ledger entries folded in: two snapshots with the same version are equal
+    version: int
+    accounts: int
+    total_balance: int
+    deposited: int
+    withdrawn: int
+    transferred: int
+    # histogram[k] counts the balances in [2**(k-1), 2**k) minor units; [0] counts zero
+    histogram: List[int]
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "accounts": self.accounts,
+            "total_balance": to_major(self.total_balance),
+            "total_deposited": to_major(self.deposited),
+            "total_withdrawn": to_major(self.withdrawn),
+            "total_transferred": to_major(self.transferred),
+            "balance_histogram": [
+                {"below": to_major(1 << k), "count": count} for k, count in enumerate(self.histogram)
+            ],
+        }
+
+
+class BookStats:
+    """Whole-book aggregates, kept up to date by every ledger entry.
+
+    Every entry carries the balance it left behind, and the kind and amount
+    give the balance before it, so an entry updates the totals and moves one
+    account between balance buckets in constant time. Buckets are powers of
+    two, so finding one is an ``int.bit_length()``. Reading is a copy of a
+    few dozen integers, however many accounts there are.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.accounts = 0
+        self.total_balance = 0
+        self.deposited = 0
+        self.withdrawn = 0
+        self.transferred = 0
+        self._histogram = array('q', [0] * 64)
+
+    def record(self, kind: int, amount: int, balance: int):
+        self.version += 1
+        histogram = self._histogram
+        if kind in _OPENINGS:
+            self.accounts += 1
+            self.total_balance += balance
+        else:
+            if kind in _CREDITS:
+                self.total_balance += amount
+                previous = balance - amount
+                if kind == TransactionKind.DEPOSIT:
+                    self.deposited += amount
+            else:
+                self.total_balance -= amount
+                previous = balance + amount
+                if kind == TransactionKind.WITHDRAWAL:
+                    self.withdrawn += amount
+                else:
+                    self.transferred += amount
+            histogram[previous.bit_length()] -= 1
+        histogram[balance.bit_length()] += 1
+
+    def record_many(self, kinds, amounts, balances):
+        record = self.record
+        for kind, amount, balance in zip(kinds, amounts, balances):
+            record(kind, amount, balance)
+
+    def snapshot(self) -> StatsSnapshot:
+        histogram = self._histogram
+        top = len(histogram)
+        while top > 1 and not histogram[top - 1]:
+            top -= 1
+        return StatsSnapshot(
+            self.version, self.accounts, self.total_balance,
+            self.deposited, self.withdrawn, self.transferred, histogram[:top].tolist(),
+        )
@@ -0,0 +1,342 @@
+"""Record the API's request stream and replay it, checking the final balances.
+
+Start the server with ``BANK_RECORD=traffic.ndjson.gz`` to record. The file
+is NDJSON, gzipped when the name ends in ``.gz``. It holds the balances at
+startup, then one line per request in the order responses were started.
+Each request line carries its method, path, query, the headers that change
+behaviour, the body and the arrival time. At shutdown a digest of every
+final balance is appended.
+
+    python -m banking.traffic traffic.ndjson.gz                       # in-process, one at a time
+    python -m banking.traffic traffic.ndjson.gz --concurrency 16      # closed loop, 16 in flight
+    python -m banking.traffic traffic.ndjson.gz --speed 1             # original pacing (10 = 10x faster)
+    python -m banking.traffic traffic.ndjson.gz --url http://localhost:8000
+
+Replaying one request at a time applies them in the recorded order, so the
+final balances must match exactly. Concurrent or paced replays may
+interleave requests differently; the report counts the requests whose
+status differed from the recording.
+"""
+import argparse
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import sys
+import time
+from typing import IO, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from banking import bulk
+from banking.money import to_minor
+
+VERSION = 1
+# Monitoring, profiling and long-lived streams are not part of the traffic to reproduce
+UNRECORDED_PATHS = ("/health", "/metrics", "/events", "/admin/profile")
+# Request headers that change how the API answers
+RECORDED_HEADERS = (b"content-type", b"idempotency-key", b"prefer", b"x-client-id", b"last-event-id")
+
+
+class RecordedRequest(NamedTuple):
+    # seconds after recording started that the request arrived
+    t: float
+    method: str
+    path: str
+    query: str
+    headers: Dict[str, str]
+    body: bytes
+    status: int
+
+
+class Recording(NamedTuple):
+    accounts: List[Tuple[str, int]]
+    requests: List[RecordedRequest]
+    # {"accounts", "total_balance", "digest"} of the final balances, if recording finished
+    final: Optional[dict]
+
+
+class BalanceDigest:
+    """Order-sensitive digest of ``(name, balance in minor units)`` rows, fed in name order."""
+
+    def __init__(self):
+        self.accounts = 0
+        self.total_balance = 0
+        self._hash = hashlib.sha256()
+
+    def update(self, rows: Iterable[Tuple[str, int]]):
+        for name, balance in rows:
+            self.accounts += 1
+            self.total_balance += balance
+            self._hash.update(f"{name}\t{balance}\n".encode())
+
+    def result(self) -> dict:
+        return {"accounts": self.accounts, "total_balance": self.total_balance, "digest": self._hash.hexdigest()}
+
+
+def _open(path: str, mode: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class TrafficRecorder:
+    """Appends the request stream to a recording file."""
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.monotonic):
+        self.path = path
+        self._clock = clock
+        self._file: Optional[IO[str]] = None
+        self._started = 0.0
+
+    @property
+    def recording(self) -> bool:
+        return self._file is not None
+
+    def start(self):
+        self._file = _open(self.path, "w")
+        self._started = self._clock()
+        self._write({"type": "start", "version": VERSION, "started_at": time.time()})
+
+    def opening_balances(self, rows: Iterable[Tuple[str, int]]):
+        for name, balance in rows:
+            self._write({"type": "account", "name": name, "balance": balance})
+
+    def elapsed(self) -> float:
+        return self._clock() - self._started
+
+    def record(self, t: float, method: str, path: str, query: str, headers: Dict[str, str],
+               body: bytes, status: int):
+        line = {"type": "request", "t": round(t, 6), "method": method, "path": path, "status": status}
+        if query:
+            line["query"] = query
+        if headers:
+            line["headers"] = headers
+        if body:
+            try:
+                line["body"] = body.decode()
+            except UnicodeDecodeError:
+                line["body64"] = base64.b64encode(body).decode()
+        self._write(line)
+
+    def finish(self, digest: BalanceDigest):
+        self._write({"type": "end", **digest.result()})
+        self._file.close()
+        self._file = None
+
+    def _write(self, line: dict):
+        self._file.write(json.dumps(line, separators=(",", ":")) + "\n")
+
+
+class RecordingMiddleware:
+    """ASGI middleware passing every API request to a ``TrafficRecorder``."""
+
+    def __init__(self, app, recorder: TrafficRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        recorder = self.recorder
+        if scope["type"] != "http" or scope["path"] in UNRECORDED_PATHS or not recorder.recording:
+            await self.app(scope, receive, send)
+            return
+        t = recorder.elapsed()
+        chunks: List[bytes] = []
+        status = [None]
+
+        async def receive_and_keep():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+            return message
+
+        def record(code: int):
+            status[0] = code
+            headers = {
+                name.decode("latin-1"): value.decode("latin-1")
+                for name, value in scope["headers"] if name in RECORDED_HEADERS
+            }
+            recorder.record(t, scope["method"], scope["path"], scope["query_string"].decode("latin-1"),
+                            headers, b"".join(chunks), code)
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                # the operation has been applied by now: this is its place in the order
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_keep, send_and_record)
+        finally:
+            if status[0] is None and recorder.recording:
+                record(500)
+
+
+def load(path: str) -> Recording:
+    accounts: List[Tuple[str, int]] = []
+    requests: List[RecordedRequest] = []
+    final = None
+    with _open(path, "r") as f:
+        for number, text in enumerate(f, 1):
+            line = json.loads(text)
+            kind = line.get("type")
+            if kind == "start":
+                if line["version"] != VERSION:
+                    raise ValueError(f"Unsupported recording version {line['version']}")
+            elif kind == "account":
+                accounts.append((line["name"], line["balance"]))
+            elif kind == "request":
+                body = base64.b64decode(line["body64"]) if "body64" in line else line.get("body", "").encode()
+                requests.append(RecordedRequest(
+                    line["t"], line["method"], line["path"], line.get("query", ""),
+                    line.get("headers", {}), body, line["status"],
+                ))
+            elif kind == "end":
+                final = {key: line[key] for key in ("accounts", "total_balance", "digest")}
+            else:
+                raise ValueError(f"Line {number}: unknown record type {kind!r}")
+    return Recording(accounts, requests, final)
+
+
+# ---------- Replay ----------
+class ReplayReport(NamedTuple):
+    requests: int
+    seconds: float
+    throughput: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    # requests answered with a different status than when recorded
+    status_mismatches: int
+    # None when the recording has no final balances to compare with
+    balances_match: Optional[bool]
+    expected: Optional[dict]
+    actual: dict
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def _send(client, request: RecordedRequest) -> Tuple[float, int]:
+    started = time.perf_counter()
+    response = await client.request(
+        request.method, request.path + ("?" + request.query if request.query else ""),
+        content=request.body or None, headers=request.headers,
+    )
+    return time.perf_counter() - started, response.status_code
+
+
+async def final_balances(client) -> BalanceDigest:
+    """Digest the target's balances, read through its NDJSON account export."""
+    digest = BalanceDigest()
+    response = await client.get("/accounts/export", params={"format": "ndjson"})
+    response.raise_for_status()
+    digest.update(
+        (record["name"], to_minor(record["balance"]))
+        for record in map(json.loads, response.text.splitlines())
+    )
+    return digest
+
+
+async def replay(recording: Recording, client, speed: Optional[float] = None,
+                 concurrency: int = 1) -> ReplayReport:
+    """Send the recorded requests to ``client``, an ``httpx.AsyncClient``.
+
+    With ``speed``, each request is sent at its recorded arrival time
+    divided by ``speed``, however many are still in flight. Otherwise
+    ``concurrency`` requests are kept in flight, in recorded order.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    if recording.accounts:
+        response = await client.post(
+            "/accounts/import", content=bulk.format_accounts(recording.accounts, "ndjson"),
+            headers={"Content-Type": bulk.MEDIA_TYPES["ndjson"]},
+        )
+        response.raise_for_status()
+
+    results: List[Tuple[float, int]] = [(0.0, 0)] * len(recording.requests)
+    started = time.perf_counter()
+    if speed is not None:
+        async def at(index: int, request: RecordedRequest):
+            delay = started + request.t / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            results[index] = await _send(client, request)
+
+        await asyncio.gather(*(at(index, request) for index, request in enumerate(recording.requests)))
+    else:
+        pending = iter(enumerate(recording.requests))
+
+        async def worker():
+            for index, request in pending:
+                results[index] = await _send(client, request)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    mismatches = sum(status != request.status for (_, status), request in zip(results, recording.requests))
+    actual = (await final_balances(client)).result()
+    expected = recording.final
+    return ReplayReport(
+        len(results),
+        round(seconds, 3),
+        round(len(results) / seconds, 1) if seconds else 0.0,
+        round(_percentile(latencies, 0.50), 3),
+        round(_percentile(latencies, 0.90), 3),
+        round(_percentile(latencies, 0.99), 3),
+        round(latencies[-1], 3) if latencies else 0.0,
+        mismatches,
+        None if expected is None else expected == actual,
+        expected,
+        actual,
+    )
+
+
+async def _replay_in_process(recording: Recording, speed: Optional[float], concurrency: int) -> ReplayReport:
+    import httpx
+    from banking import main as server
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.lifespan(server.app), httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+        return await replay(recording, client, speed, concurrency)
+
+
+async def _replay_remote(recording: Recording, url: str, speed: Optional[float], concurrency: int) -> ReplayReport:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+        return await replay(recording, client, speed, concurrency)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a recorded request stream and check the final balances.")
+    parser.add_argument("recording", help="file written by a server started with BANK_RECORD")
+    parser.add_argument("--url", help="replay against this server instead of the app in-process")
+    pacing = parser.add_mutually_exclusive_group()
+    pacing.add_argument("--speed", type=float, help="keep the recorded pacing, this many times faster")
+    pacing.add_argument("--concurrency", type=int, default=1, help="requests in flight (closed loop)")
+    args = parser.parse_args(argv)
+    if args.speed is not None and args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    recording = load(args.recording)
+    if args.url:
+        report = asyncio.run(_replay_remote(recording, args.url, args.speed, args.concurrency))
+    else:
+        report = asyncio.run(_replay_in_process(recording, args.speed, args.concurrency))
+    print(json.dumps(report._asdict(), indent=2))
+    print(f"{report.requests} requests in {report.seconds:.2f}s ({report.throughput:,.0f}/s)  "
+          f"p50 {report.p50_ms:.2f}ms  p90 {report.p90_ms:.2f}ms  p99 {report.p99_ms:.2f}ms  "
+          f"max {report.max_ms:.2f}ms  status mismatches {report.status_mismatches}  "
+          f"balances {'match' if report.balances_match else 'not checked' if report.balances_match is None else 'DIFFER'}",
+          file=sys.stderr)
+    return 1 if report.balances_match is False else 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import asyncio
+import os
+import struct
+import threading
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+from banking.ledger import LedgerEntry, TransactionKind
+
+FSYNC_GROUP = "group"
+FSYNC_ALWAYS = "always"
+FSYNC_PERIODIC = "periodic"
+FSYNC_NEVER = "never"
+FSYNC_POLICIES = (FSYNC_GROUP, FSYNC_ALWAYS, FSYNC_PERIODIC, FSYNC_NEVER)
+
+# length, crc32 of the body
+_FRAME = struct.Struct('<II')
+# set in a frame's length when its body is a group of entry frames, replayed all or none
+_GROUP = 1 << 31
+# timestamp, kind, amount, resulting balance, name length, counterparty length
+_RECORD = struct.Struct('<dBqqHH')
+
+
+def encode_entry(entry: LedgerEntry) -> bytes:
+    name = entry.account.encode()
+    counterparty = entry.counterparty.encode() if entry.counterparty else b''
+    body = _RECORD.pack(
+        entry.timestamp, entry.kind, entry.amount, entry.balance, len(name), len(counterparty)
+    ) + name + counterparty
+    return _FRAME.pack(len(body), zlib.crc32(body)) + body
+
+
+def encode_group(entries: List[LedgerEntry]) -> bytes:
+    body = b''.join(map(encode_entry, entries))
+    return _FRAME.pack(len(body) | _GROUP, zlib.crc32(body)) + body
+
+
+def decode_entry(body: bytes, offset: int = -1) -> LedgerEntry:
+    timestamp, kind, amount, balance, name_length, counterparty_length = _RECORD.unpack_from(body)
+    start = _RECORD.size
+    name = body[start:start + name_length].decode()
+    start += name_length
+    counterparty = body[start:start + counterparty_length].decode() or None
+    return LedgerEntry(offset, timestamp, TransactionKind(kind), name, amount, counterparty, balance)
+
+
+def decode_group(body: bytes) -> List[LedgerEntry]:
+    # the group's checksum covers its entries; theirs need no second check
+    entries = []
+    start = 0
+    while start < len(body):
+        length, _ = _FRAME.unpack_from(body, start)
+        start += _FRAME.size
+        entries.append(decode_entry(body[start:start + length]))
+        start += length
+    return entries
+
+
+class WriteAheadLog:
+    """Append-only, checksummed log of ledger entries on local disk.
+
+    The log subscribes to a ``Ledger`` and writes every entry it sees. How
+    often the file is fsynced is set by ``fsync``:
+
+    - ``group`` (group commit): entries are buffered, and a background
+      thread fsyncs them all at once when ``group_interval`` seconds have
+      passed since the first one a caller waits on, or when ``group_size``
+      entries are pending. Callers await ``commit()`` and answer only once
+      it resolves, so nothing acknowledged is lost, and concurrent writers
+      share one fsync.
+    - ``always``: flush and fsync after every entry, on the writing thread.
+    - ``periodic``: fsync every ``group_interval`` seconds, or once
+      ``group_size`` entries are pending, without anyone waiting for it.
+      Writes are acknowledged before they are durable, so a crash loses the
+      acknowledged writes of up to that window.
+    - ``never``: flush on the same interval and leave fsync to the OS.
+    """
+
+    def __init__(self, path: str, fsync: str = FSYNC_GROUP, group_size: int = 256,
+                 group_interval: float = 0.002):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}'; expected one of {', '.join(FSYNC_POLICIES)}")
+        self.path = path
+        self.fsync = fsync
+        self.group_size = group_size
+        self.group_interval = group_interval
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'ab', buffering=1 << 16)
+        self.size = self._file.tell()
+        # bytes of the file known to be on disk
+        self._synced = self.size
+        self._pending = 0
+        # (size to reach, loop, future) of every caller waiting on a commit
+        self._waiters: List[Tuple[int, asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        # set when a caller waits on a commit, and when a group is full
+        self._waiting = threading.Event()
+        self._full = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if fsync == FSYNC_GROUP:
+            self._flusher = threading.Thread(target=self._commit_groups, name="wal-committer", daemon=True)
+        elif fsync != FSYNC_ALWAYS:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="wal-flusher", daemon=True)
+        if self._flusher is not None:
+            self._flusher.start()
+
+    def append(self, entry: LedgerEntry):
+        self._write(encode_entry(entry), 1)
+
+    def append_many(self, entries: List[LedgerEntry]):
+        """Append ``entries`` as one checksummed record, replayed all or none.
+
+        ``always`` fsyncs once for all of them.
+        """
+        self._write(encode_group(entries), len(entries))
+
+    def _write(self, records: bytes, count: int):
+        with self._lock:
+            self._file.write(records)
+            self.size += len(records)
+            self._pending += count
+            if self.fsync == FSYNC_ALWAYS:
+                self._sync_locked()
+            elif self.fsync == FSYNC_PERIODIC and self._pending >= self.group_size:
+                self._sync_locked()
+            elif self.fsync == FSYNC_GROUP and self._pending >= self.group_size:
+                self._full.set()
+
+    def commit(self, since: int) -> Optional[asyncio.Future]:
+        """A future resolved once everything written after byte ``since`` is on disk.
+
+        None when there is nothing to wait for: nothing was written since,
+        it is already synced, or the policy does not hold answers back.
+        Call it from a running event loop, after releasing any locks, so
+        that other writers can join the same group meanwhile.
+        """
+        if self.fsync != FSYNC_GROUP or self.size == since:
+            return None
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._synced >= self.size:
+                return None
+            self._waiters.append((self.size, loop, future))
+        self._waiting.set()
+        return future
+
+    def sync(self):
+        with self._lock:
+            self._sync_locked()
+        self._release_waiters()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._waiting.set()
+        self._full.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.sync()
+        self._file.close()
+
+    def replay(self, start: int = 0) -> Iterator[LedgerEntry]:
+        """Yield the entries stored from byte ``start`` onwards.
+
+        A torn or corrupt record at the tail (a write cut short by a crash)
+        ends the replay, and the file is truncated back to the last intact
+        record so new entries are appended after it. A record written by
+        ``append_many`` is one record however many entries it holds.
+        """
+        good = start
+        for good, entries in self._records(start, self.size):
+            yield from entries
+        if good < self.size:
+            with self._lock:
+                self._file.flush()
+                os.truncate(self.path, good)
+                self.size = self._synced = good
+
+    def read(self, start: int, end: int) -> Iterator[LedgerEntry]:
+        """Yield the entries stored between bytes ``start`` and ``end``.
+
+        Unlike ``replay`` this leaves the file alone, for reading back a
+        part of the log that was already replayed or skipped.
+        """
+        for _, entries in self._records(start, end):
+            yield from entries
+
+    def _records(self, start: int, end: int) -> Iterator[Tuple[int, List[LedgerEntry]]]:
+        """Yield each intact record before ``end`` with the offset just after it."""
+        position = start
+        with open(self.path, 'rb') as log:
+            log.seek(start)
+            while position < end:
+                frame = log.read(_FRAME.size)
+                if len(frame) < _FRAME.size:
+                    break
+                length, checksum = _FRAME.unpack(frame)
+                group = length & _GROUP
+                length &= ~_GROUP
+                body = log.read(length)
+                if len(body) < length or zlib.crc32(body) != checksum:
+                    break
+                position += _FRAME.size + length
+                yield position, decode_group(body) if group else [decode_entry(body)]
+
+    def _sync_locked(self):
+        self._file.flush()
+        if self.fsync != FSYNC_NEVER:
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._synced = self.size
+
+    def _release_waiters(self):
+        with self._lock:
+            ready = [waiter for waiter in self._waiters if waiter[0] <= self._synced]
+            self._waiters = [waiter for waiter in self._waiters if waiter[0] > self._synced]
+        for _, loop, future in ready:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # the waiter's loop has closed; nobody is left to answer
+                pass
+
+    def _commit_groups(self):
+        while not self._closed.is_set():
+            if self._waiting.wait(self.group_interval) and not self._closed.is_set():
+                # a caller is waiting: hold the group open for others to join
+                self._full.wait(self.group_interval)
+            self._waiting.clear()
+            self._full.clear()
+            with self._lock:
+                if self._synced == self.size:
+                    continue
+                self._file.flush()
+                size = self.size
+                self._pending = 0
+            # fsync outside the lock so appends are not stalled behind the disk
+            os.fsync(self._file.fileno())
+            with self._lock:
+                self._synced = max(self._synced, size)
+            self._release_waiters()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.group_interval):
+            if not self._pending:
+                continue
+            with self._lock:
+                self._file.flush()
+                self._pending = 0
+            # fsync outside the lock so appends are not stalled behind the disk
+            if self.fsync != FSYNC_NEVER:
+                os.fsync(self._file.fileno())
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,434 @@
+"""Reproducible benchmarks for the banking model and its ASGI app.
+
+Every scenario builds a seeded workload (initial accounts plus a list of
+operations) up front, then replays the same operations against one or more
+layers:
+
+- ``model``: direct calls on a fresh ``Bank``.
+- ``asgi``: HTTP requests through ``httpx.ASGITransport`` into
+  ``banking.main.app``, backed by a fresh ``Bank``.
+- ``app``: the same requests as ``asgi``, handed straight to the ASGI app
+  as scope/receive/send calls, so only server-side work is timed.
+- ``sharded``: batches of operations on a ``ShardedBank``, once per
+  ``--shards`` count (reported as ``sharded/<count>``).
+
+Results are printed as JSON (p50/p99 latency, throughput, peak traced
+memory) and can be compared against a stored baseline:
+
+    python tests/performance/benchmark.py --save baseline.json
+    python tests/performance/benchmark.py --baseline baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Add the project root to sys.path so we can import 'banking'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from banking.errors import AccountNotFoundError, InsufficientFundsError, NegativeAmountError  # noqa: E402
+from banking.models import Bank  # noqa: E402
+from banking.money import to_major  # noqa: E402
+from banking.sharding import ShardedBank, shard_of  # noqa: E402
+from banking.wal import FSYNC_POLICIES, WriteAheadLog  # noqa: E402
+
+DOMAIN_ERRORS = (AccountNotFoundError, InsufficientFundsError, NegativeAmountError, ValueError)
+
+
+class Workload(NamedTuple):
+    accounts: List[Tuple[str, int]]
+    # ("create", name, balance) | ("deposit", name, amount)
+    # | ("withdraw", name, amount) | ("transfer", sender, recipient, amount)
+    # | ("balance", name)
+    operations: List[tuple]
+    # accounts the bank coalesces credits for (see HotAccount)
+    hot_accounts: Tuple[str, ...] = ()
+
+
+class Result(NamedTuple):
+    scenario: str
+    layer: str
+    operations: int
+    seconds: float
+    throughput: float
+    p50_us: float
+    p99_us: float
+    peak_mb: Optional[float]
+
+
+# ---------- Workloads ----------
+def _accounts(count: int, balance: int = 1_000_000_00) -> List[Tuple[str, int]]:
+    return [(f"User{i}", balance) for i in range(count)]
+
+
+def zipf_weights(count: int, exponent: float = 1.1) -> List[float]:
+    """Cumulative Zipf weights: account i is picked with probability ~ 1 / (i + 1) ** exponent."""
+    cumulative, total = [], 0.0
+    for rank in range(1, count + 1):
+        total += 1 / rank ** exponent
+        cumulative.append(total)
+    return cumulative
+
+
+def _transfers(rng: random.Random, names: List[str], count: int,
+               cum_weights: Optional[List[float]] = None) -> List[tuple]:
+    senders = rng.choices(names, cum_weights=cum_weights, k=count)
+    recipients = rng.choices(names, cum_weights=cum_weights, k=count)
+    return [("transfer", s, r, rng.randint(1, 1000_00)) for s, r in zip(senders, recipients)]
+
+
+def transfer_uniform(rng: random.Random, scale: float) -> Workload:
+    accounts = _accounts(1000)
+    return Workload(accounts, _transfers(rng, [n for n, _ in accounts], int(20_000 * scale)))
+
+
+def transfer_zipf(rng: random.Random, scale: float) -> Workload:
+    accounts = _accounts(1000)
+    names = [n for n, _ in accounts]
+    return Workload(accounts, _transfers(rng, names, int(20_000 * scale), zipf_weights(len(names))))
+
+
+def transfer_sharded(rng: random.Random, scale: float) -> Workload:
+    """Transfers that stay inside one of 8 account groups 95% of the time.
+
+    Groups follow ``shard_of(name, 8)``, so with 1, 2, 4 or 8 shards those
+    transfers never leave their shard.
+    """
+    accounts = _accounts(1000)
+    names = [n for n, _ in accounts]
+    groups = defaultdict(list)
+    for name in names:
+        groups[shard_of(name, 8)].append(name)
+    operations = []
+    for _ in range(int(20_000 * scale)):
+        sender = rng.choice(names)
+        recipient = rng.choice(groups[shard_of(sender, 8)] if rng.random() < 0.95 else names)
+        operations.append(("transfer", sender, recipient, rng.randint(1, 1000_00)))
+    return Workload(accounts, operations)
+
+
+def merchant_zipf(rng: random.Random, scale: float, hot: bool = False) -> Workload:
+    """Customers paying 10 merchants, Zipf-skewed: the top three get ~60% of payments."""
+    customers = _accounts(1000)
+    merchants = [(f"Merchant{i}", 0) for i in range(10)]
+    senders = rng.choices([n for n, _ in customers], k=int(20_000 * scale))
+    recipients = rng.choices([n for n, _ in merchants], cum_weights=zipf_weights(len(merchants)), k=len(senders))
+    operations = [("transfer", s, r, rng.randint(1, 100_00)) for s, r in zip(senders, recipients)]
+    return Workload(customers + merchants, operations, tuple(n for n, _ in merchants[:3]) if hot else ())
+
+
+def merchant_zipf_hot(rng: random.Random, scale: float) -> Workload:
+    """``merchant_zipf`` with the top three merchants as hot accounts."""
+    return merchant_zipf(rng, scale, hot=True)
+
+
+def deposit_withdraw_mix(rng: random.Random, scale: float) -> Workload:
+    accounts = _accounts(1000, balance=1000_00)
+    names = [n for n, _ in accounts]
+    operations = [
+        ("deposit" if rng.random() < 0.7 else "withdraw", rng.choice(names), rng.randint(1, 500_00))
+        for _ in range(int(20_000 * scale))
+    ]
+    return Workload(accounts, operations)
+
+
+def read_heavy(rng: random.Random, scale: float) -> Workload:
+    accounts = _accounts(1000)
+    names = [n for n, _ in accounts]
+    operations = [
+        ("balance", rng.choice(names)) if rng.random() < 0.8 else ("deposit", rng.choice(names), rng.randint(1, 500_00))
+        for _ in range(int(20_000 * scale))
+    ]
+    return Workload(accounts, operations)
+
+
+def account_creation(rng: random.Random, scale: float) -> Workload:
+    count = int(20_000 * scale)
+    names = [f"New{i:08d}" for i in range(count)]
+    rng.shuffle(names)
+    return Workload([], [("create", name, rng.randint(0, 1000_00)) for name in names])
+
+
+def large_book(rng: random.Random, scale: float) -> Workload:
+    accounts = _accounts(int(200_000 * scale))
+    return Workload(accounts, _transfers(rng, [n for n, _ in accounts], int(20_000 * scale)))
+
+
+SCENARIOS: Dict[str, Callable[[random.Random, float], Workload]] = {
+    "transfer_uniform": transfer_uniform,
+    "transfer_zipf": transfer_zipf,
+    "transfer_sharded": transfer_sharded,
+    "merchant_zipf": merchant_zipf,
+    "merchant_zipf_hot": merchant_zipf_hot,
+    "deposit_withdraw_mix": deposit_withdraw_mix,
+    "read_heavy": read_heavy,
+    "account_creation": account_creation,
+    "large_book": large_book,
+}
+
+
+# ---------- Layers ----------
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _summarize(scenario: str, layer: str, latencies: List[float], seconds: float,
+               peak_mb: Optional[float]) -> Result:
+    latencies.sort()
+    return Result(
+        scenario, layer, len(latencies), round(seconds, 6),
+        round(len(latencies) / seconds, 1) if seconds else 0.0,
+        round(_percentile(latencies, 0.50) * 1e6, 2),
+        round(_percentile(latencies, 0.99) * 1e6, 2),
+        peak_mb,
+    )
+
+
+def _new_bank(workload: Workload, wal_path: Optional[str] = None, fsync: Optional[str] = None) -> Bank:
+    if wal_path is None:
+        bank = Bank(workload.hot_accounts)
+    else:
+        bank = Bank.open(WriteAheadLog(wal_path, fsync=fsync), hot_accounts=workload.hot_accounts)
+    for name, balance in workload.accounts:
+        bank.create_account(name, balance)
+    return bank
+
+
+def run_model(workload: Workload, wal: Optional[str] = None) -> Tuple[List[float], float]:
+    """``wal``, an fsync policy, logs every change to a write-ahead log in a temporary directory."""
+    with tempfile.TemporaryDirectory() as directory:
+        bank = _new_bank(workload, os.path.join(directory, "bench.wal") if wal else None, wal)
+        try:
+            latencies = []
+            clock = time.perf_counter
+            started = clock()
+            for op in workload.operations:
+                begin = clock()
+                try:
+                    if op[0] == "transfer":
+                        bank.get_account(op[1]).transfer(bank.get_account(op[2]), op[3])
+                    elif op[0] == "deposit":
+                        bank.get_account(op[1]).deposit(op[2])
+                    elif op[0] == "withdraw":
+                        bank.get_account(op[1]).withdraw(op[2])
+                    elif op[0] == "balance":
+                        bank.get_account(op[1]).balance
+                    else:
+                        bank.create_account(op[1], op[2])
+                except DOMAIN_ERRORS:
+                    pass
+                latencies.append(clock() - begin)
+            # hot accounts' last credits are part of the work
+            bank.settle()
+            return latencies, clock() - started
+        finally:
+            bank.close()
+
+
+def _request(op: tuple) -> Tuple[str, str, Optional[dict]]:
+    if op[0] == "transfer":
+        return "POST", "/transfers", {"sender": op[1], "recipient": op[2], "amount": to_major(op[3])}
+    if op[0] == "deposit":
+        return "POST", f"/accounts/{op[1]}/deposits", {"amount": to_major(op[2])}
+    if op[0] == "withdraw":
+        return "POST", f"/accounts/{op[1]}/withdrawals", {"amount": to_major(op[2])}
+    if op[0] == "balance":
+        return "GET", f"/accounts/{op[1]}", None
+    return "POST", "/accounts/", {"name": op[1], "initial_balance": to_major(op[2])}
+
+
+async def _run_asgi(workload: Workload, concurrency: int, compact: bool) -> Tuple[List[float], float]:
+    import httpx
+    import banking.main as main
+
+    main.bank = _new_bank(workload)
+    requests = [_request(op) for op in workload.operations]
+    latencies: List[float] = []
+    clock = time.perf_counter
+    pending = iter(requests)
+    headers = {"Prefer": "return=minimal"} if compact else {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+        async def worker():
+            for method, path, body in pending:
+                begin = clock()
+                await client.request(method, path, json=body, headers=headers)
+                latencies.append(clock() - begin)
+
+        started = clock()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, clock() - started
+
+
+def run_asgi(workload: Workload, concurrency: int = 1, compact: bool = False) -> Tuple[List[float], float]:
+    return asyncio.run(_run_asgi(workload, concurrency, compact))
+
+
+def run_sharded(workload: Workload, shards: int = 4, batch: int = 1000) -> Tuple[List[float], float]:
+    operations = [("create_account",) + op[1:] if op[0] == "create" else op for op in workload.operations]
+    latencies: List[float] = []
+    clock = time.perf_counter
+    with ShardedBank(shards) as bank:
+        bank.execute([("create_account", name, balance) for name, balance in workload.accounts])
+        started = clock()
+        for i in range(0, len(operations), batch):
+            chunk = operations[i:i + batch]
+            begin = clock()
+            bank.execute(chunk)
+            # every operation in a batch completes when the batch does
+            latencies.extend([clock() - begin] * len(chunk))
+        return latencies, clock() - started
+
+
+async def _run_app(workload: Workload, compact: bool) -> Tuple[List[float], float]:
+    import banking.main as main
+
+    main.bank = _new_bank(workload)
+    headers = [(b"content-type", b"application/json")]
+    if compact:
+        headers.append((b"prefer", b"return=minimal"))
+    calls = []
+    for method, path, body in map(_request, workload.operations):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+            "root_path": "", "headers": headers, "server": ("bench", 80), "client": ("bench", 1),
+        }
+        calls.append((scope, json.dumps(body).encode() if body is not None else b""))
+
+    async def discard(message):
+        pass
+
+    latencies: List[float] = []
+    clock = time.perf_counter
+    started = clock()
+    for scope, body in calls:
+        async def receive(body=body):
+            return {"type": "http.request", "body": body, "more_body": False}
+        begin = clock()
+        await main.app(dict(scope), receive, discard)
+        latencies.append(clock() - begin)
+    return latencies, clock() - started
+
+
+def run_app(workload: Workload, compact: bool = False) -> Tuple[List[float], float]:
+    return asyncio.run(_run_app(workload, compact))
+
+
+LAYERS: Dict[str, Callable[..., Tuple[List[float], float]]] = {
+    "model": run_model,
+    "asgi": run_asgi,
+    "app": run_app,
+    "sharded": run_sharded,
+}
+
+
+def run_scenario(name: str, layer: str, seed: int = 42, scale: float = 1.0,
+                 measure_memory: bool = True, **options) -> Result:
+    workload = SCENARIOS[name](random.Random(seed), scale)
+    latencies, seconds = LAYERS[layer](workload, **options)
+    peak_mb = None
+    if measure_memory:
+        # A second, identical run under tracemalloc so tracing does not skew timings
+        tracemalloc.start()
+        LAYERS[layer](workload, **options)
+        peak_mb = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+        tracemalloc.stop()
+    return _summarize(name, layer, latencies, seconds, peak_mb)
+
+
+# ---------- Baseline comparison ----------
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """Describe every result that regressed more than ``tolerance`` against ``baseline``."""
+    previous = {(r["scenario"], r["layer"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["scenario"], result["layer"]))
+        if before is None:
+            continue
+        label = f"{result['scenario']}/{result['layer']}"
+        if result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {before['throughput']} -> {result['throughput']} ops/s")
+        if result["p99_us"] > before["p99_us"] * (1 + tolerance):
+            regressions.append(f"{label}: p99 {before['p99_us']} -> {result['p99_us']} us")
+        if before.get("peak_mb") and result.get("peak_mb") and result["peak_mb"] > before["peak_mb"] * (1 + tolerance):
+            regressions.append(f"{label}: peak memory {before['peak_mb']} -> {result['peak_mb']} MB")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable; default: all)")
+    parser.add_argument("--layer", action="append", choices=sorted(LAYERS),
+                        help="layer to run (repeatable; default: all)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply workload sizes")
+    parser.add_argument("--concurrency", type=int, default=1, help="in-flight requests for the asgi layer")
+    parser.add_argument("--compact", action="store_true",
+                        help="asgi/app layers: ask for empty 204 responses (Prefer: return=minimal)")
+    parser.add_argument("--wal", choices=FSYNC_POLICIES,
+                        help="model layer: write a write-ahead log with this fsync policy")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4],
+                        help="shard counts for the sharded layer")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--save", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scenario in args.scenario or list(SCENARIOS):
+        for layer in args.layer or list(LAYERS):
+            if layer == "asgi":
+                runs = [(layer, {"concurrency": args.concurrency, "compact": args.compact})]
+            elif layer == "app":
+                runs = [(layer, {"compact": args.compact})]
+            elif layer == "sharded":
+                runs = [(f"sharded/{count}", {"shards": count}) for count in args.shards]
+            elif layer == "model" and args.wal:
+                runs = [(f"model/wal-{args.wal}", {"wal": args.wal})]
+            else:
+                runs = [(layer, {})]
+            for label, options in runs:
+                result = run_scenario(scenario, layer, args.seed, args.scale, not args.no_memory, **options)
+                result = result._replace(layer=label)
+                results.append(result._asdict())
+                print(f"{scenario:>22} {label:>10}: {result.throughput:>12,.0f} ops/s  "
+                      f"p50 {result.p50_us:>9.2f}us  p99 {result.p99_us:>9.2f}us  "
+                      f"peak {result.peak_mb} MB", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "scale": args.scale,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Memory footprint and build time of a Bank by number of accounts.
+
+Each size is built in a fresh interpreter, the way an import fills a bank
+(``Bank.create_accounts`` in chunks), and reports the resident memory it
+added divided by the number of accounts. Bytes per account and seconds per
+million accounts should stay flat as the book grows:
+
+    python tests/performance/memory.py                      # 1M and 10M accounts
+    python tests/performance/memory.py --accounts 100000 1000000 --save memory.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+# Add the project root to sys.path so we can import 'banking'
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+sys.path.append(ROOT)
+
+from banking.bulk import CHUNK_SIZE  # noqa: E402
+from banking.models import Bank  # noqa: E402
+
+
+def _rss_bytes() -> int:
+    """Resident set size now, or the peak where the current size is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:  # pragma: no cover - not Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(accounts: int) -> dict:
+    """Build a bank of ``accounts`` accounts in this process and report its cost."""
+    before = _rss_bytes()
+    started = time.perf_counter()
+    bank = Bank()
+    for first in range(0, accounts, CHUNK_SIZE):
+        bank.create_accounts(
+            (f"account-{i:09d}", 10_000) for i in range(first, min(first + CHUNK_SIZE, accounts))
+        )
+    seconds = time.perf_counter() - started
+    grown = _rss_bytes() - before
+    return {
+        "accounts": len(bank.accounts),
+        "build_seconds": round(seconds, 2),
+        "seconds_per_million": round(seconds / accounts * 1_000_000, 2),
+        "rss_mb": round(grown / 1024 / 1024, 1),
+        "bytes_per_account": round(grown / accounts, 1),
+    }
+
+
+def run(accounts: int) -> dict:
+    """Measure ``accounts`` in a fresh interpreter, so earlier sizes do not skew it."""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", str(accounts)],
+        check=True, capture_output=True, text=True, cwd=ROOT,
+    ).stdout
+    return json.loads(output)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report bytes per account and build time by book size.")
+    parser.add_argument("--accounts", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--save", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        print(json.dumps(measure(args.child)))
+        return 0
+
+    results = []
+    for accounts in args.accounts:
+        result = run(accounts)
+        results.append(result)
+        print(f"{accounts:>12,} accounts: {result['bytes_per_account']:>7.1f} B/account  "
+              f"{result['rss_mb']:>9.1f} MB  built in {result['build_seconds']:.2f}s "
+              f"({result['seconds_per_million']:.2f}s per million)", file=sys.stderr)
+    report = {"meta": {"python": platform.python_version(), "platform": platform.platform()}, "results": results}
+    print(json.dumps(report, indent=2))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import random
+import pytest
+from tests.performance.benchmark import SCENARIOS, compare, main, run_scenario
+from tests.test_logger import log_test
+
+
+@pytest.fixture(autouse=True)
+def restore_bank():
+    import banking.main as m
+    original = m.bank
+    yield
+    m.bank = original
+
+
+@log_test()
+def test_workloads_are_reproducible():
+    for build in SCENARIOS.values():
+        assert build(random.Random(1), 0.01) == build(random.Random(1), 0.01)
+    assert SCENARIOS["transfer_uniform"](random.Random(1), 0.01) != SCENARIOS["transfer_uniform"](random.Random(2), 0.01)
+
+
+@log_test()
+def test_every_scenario_runs_on_every_layer():
+    for scenario in SCENARIOS:
+        for layer in ("model", "asgi", "app"):
+            result = run_scenario(scenario, layer, scale=0.002, measure_memory=layer == "model")
+            assert result.operations > 0
+            assert result.throughput > 0
+            assert result.p50_us <= result.p99_us
+
+
+@log_test()
+def test_compare_flags_regressions():
+    baseline = [{"scenario": "s", "layer": "model", "throughput": 1000.0, "p99_us": 10.0, "peak_mb": 1.0}]
+    steady = [{"scenario": "s", "layer": "model", "throughput": 950.0, "p99_us": 10.5, "peak_mb": 1.05}]
+    slower = [{"scenario": "s", "layer": "model", "throughput": 500.0, "p99_us": 30.0, "peak_mb": 3.0}]
+    assert compare(steady, baseline, 0.10) == []
+    assert len(compare(slower, baseline, 0.10)) == 3
+    assert compare([{**slower[0], "scenario": "new"}], baseline, 0.10) == []
+
+
+@log_test()
+def test_cli_saves_and_compares(tmp_path, capsys):
+    report = str(tmp_path / "report.json")
+    args = ["--scenario", "deposit_withdraw_mix", "--layer", "model", "--scale", "0.002", "--no-memory"]
+    assert main(args + ["--save", report]) == 0
+    # an impossible tolerance turns any difference into a regression
+    assert main(args + ["--baseline", report, "--tolerance", "-1"]) == 1
+    assert "REGRESSION" in capsys.readouterr().err
+
+
+@log_test()
+def test_sharded_layer_reports_each_shard_count(capsys):
+    args = ["--scenario", "transfer_sharded", "--layer", "sharded", "--shards", "1", "2",
+            "--scale", "0.005", "--no-memory"]
+    assert main(args) == 0
+    err = capsys.readouterr().err
+    assert "sharded/1" in err and "sharded/2" in err
+
+
+@log_test()
+def test_memory_report_covers_each_size(capsys):
+    import json
+    from tests.performance import memory
+    assert memory.main(["--accounts", "2000"]) == 0
+    [result] = json.loads(capsys.readouterr().out)["results"]
+    assert result["accounts"] == 2000
+    assert result["bytes_per_account"] > 0 or result["rss_mb"] == 0
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from banking import bulk
+from banking.bulk import AccountParser, chunked, iter_lines, parse_accounts
+from banking.models import Bank
+from tests.test_logger import log_test
+
+
+@log_test()
+def test_parse_ndjson_and_csv():
+    ndjson = ['{"name": "alice", "balance": 12.34}', "", '{"name": "bob", "balance": "0.10"}']
+    assert list(parse_accounts(ndjson)) == [("alice", 1234), ("bob", 10)]
+    rows = ["balance,name", '5,"smith, jr"', "0.01,zoe"]
+    assert list(parse_accounts(rows, "csv")) == [("smith, jr", 500), ("zoe", 1)]
+
+
+@pytest.mark.parametrize("format, lines, message", [
+    ("ndjson", ['{"name": "a", "balance": 1}', "not json"], "Line 2"),
+    ("ndjson", ["[1, 2]"], "JSON object"),
+    ("ndjson", ['{"balance": 1}'], "'name'"),
+    ("ndjson", ['{"name": "a"}'], "'balance' is required"),
+    ("ndjson", ['{"name": "a", "balance": 0.001}'], "decimal places"),
+    ("ndjson", ['{"name": "a", "balance": -1}'], "negative"),
+    ("csv", ["name,amount"], "CSV header"),
+    ("csv", ["name,balance", "a"], "Line 2: 'balance' is required"),
+])
+def test_parse_rejects_bad_lines(format, lines, message):
+    with pytest.raises(ValueError, match=message):
+        list(parse_accounts(lines, format))
+
+
+@log_test()
+def test_parser_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        AccountParser("xml")
+
+
+@log_test()
+def test_chunked_and_iter_lines():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+    async def body(*chunks):
+        for chunk in chunks:
+            yield chunk
+
+    async def lines(*chunks):
+        return [line async for line in iter_lines(body(*chunks))]
+
+    assert asyncio.run(lines(b"a\r\nb", b"c\n", b"d")) == ["a", "bc", "d"]
+    with pytest.raises(ValueError, match="longer than"):
+        asyncio.run(lines(b"x" * (bulk.MAX_LINE + 1)))
+
+
+@log_test()
+def test_formatting_round_trips():
+    assert bulk.format_accounts([("a,b", 1234), ("c", -5)], "csv") == '"a,b",12.34\nc,-0.05\n'
+    assert json.loads(bulk.format_accounts([("a", 5)], "ndjson")) == {"name": "a", "balance": 0.05}
+    rows = [(3, 1.5, "transfer_in", "bob", 250, "alice", 1000), (4, 2.0, "deposit", "bob", 1, None, 1001)]
+    assert bulk.format_ledger(rows, "csv") == "3,1.5,transfer_in,bob,2.50,alice,10.00\n4,2.0,deposit,bob,0.01,,10.01\n"
+    assert [json.loads(line)["counterparty"] for line in bulk.format_ledger(rows, "ndjson").splitlines()] == ["alice", None]
+    assert bulk.header(bulk.ACCOUNT_FIELDS, "csv") == "name,balance\n"
+    assert bulk.header(bulk.ACCOUNT_FIELDS, "ndjson") == ""
+
+
+@log_test()
+def test_bank_create_accounts_checks_the_whole_chunk_first():
+    bank = Bank()
+    bank.create_account("taken", 1)
+    with pytest.raises(ValueError, match="'taken' already exists"):
+        bank.create_accounts([("new", 1), ("taken", 2)])
+    with pytest.raises(ValueError, match="'twice' already exists"):
+        bank.create_accounts([("twice", 1), ("twice", 2)])
+    with pytest.raises(ValueError, match="negative"):
+        bank.create_accounts([("neg", -1)])
+    assert list(bank.accounts) == ["taken"]
+    assert bank.create_accounts(iter([("b", 2), ("a", 1)])) == 2
+    assert list(bank.names) == ["a", "b", "taken"]
+
+
+@log_test()
+def test_cli_imports_and_exports(tmp_path, monkeypatch, capsys):
+    import httpx
+    import banking.main as m
+    monkeypatch.setattr(m, "bank", Bank())
+    monkeypatch.setattr(httpx, "Client", lambda base_url, timeout: TestClient(m.app, base_url=base_url))
+
+    source = tmp_path / "accounts.csv"
+    source.write_text("name,balance\nalice,10.50\nbob,3\n")
+    assert bulk.main(["import", str(source)]) == 0
+    assert json.loads(capsys.readouterr().out) == {"imported": 2}
+    assert bulk.main(["import", str(source)]) == 1
+    assert "already exists" in capsys.readouterr().out
+
+    out = tmp_path / "out.csv"
+    assert bulk.main(["export", "-o", str(out)]) == 0
+    assert out.read_text() == "name,balance\nalice,10.50\nbob,3.00\n"
+    ledger = tmp_path / "ledger.ndjson"
+    assert bulk.main(["export-ledger", "-o", str(ledger)]) == 0
+    assert [json.loads(line)["account"] for line in ledger.read_text().splitlines()] == ["alice", "bob"]
+    assert bulk.main(["export", "--format", "ndjson"]) == 0
+    assert capsys.readouterr().out.count("\n") == 2
@@ -0,0 +1,124 @@
+import pytest
+from banking.errors import BalanceLimitError, InsufficientFundsError, NegativeAmountError
+from banking.ledger import TransactionKind
+from tests.test_logger import log_test
+
+pytest.importorskip("numpy")
+
+from banking.columnar import BalanceColumn, ColumnarBank  # noqa: E402
+
+
+@log_test()
+def test_balance_column_grows_and_tracks_total():
+    column = BalanceColumn(capacity=2)
+    slots = [column.append(balance) for balance in (100, 200, 300)]
+    assert slots == [0, 1, 2]
+    assert len(column) == 3
+    assert column.total == 600
+    column[1] = 50
+    assert column[1] == 50
+    assert column.total == 450
+    assert column.values.tolist() == [100, 50, 300]
+
+
+@log_test()
+def test_columnar_bank_behaves_like_bank():
+    bank = ColumnarBank()
+    alice = bank.create_account("Alice", 10000)
+    bob = bank.create_account("Bob", 0)
+    alice.transfer(bob, 2500)
+    bob.withdraw(500)
+    with pytest.raises(InsufficientFundsError):
+        bob.withdraw(10 ** 6)
+    assert (alice.balance, bob.balance) == (7500, 2000)
+    assert bank.balances.values.tolist() == [7500, 2000]
+    assert bank.total_balance() == 9500
+    assert bob.get_transaction_history() == [
+        "Account created with balance: 0.00",
+        "Received from: 25.00 Alice",
+        "Withdrawn: 5.00",
+    ]
+
+
+@log_test()
+def test_bulk_deposit():
+    bank = ColumnarBank()
+    for name in ("a", "b", "c"):
+        bank.create_account(name, 100)
+    assert bank.bulk_deposit(["c", "a"], [5, 7]) == 2
+    assert [bank.get_account(n).balance for n in "abc"] == [107, 100, 105]
+    assert bank.total_balance() == 312
+    entries, _ = bank.get_account("a").get_transactions()
+    assert (entries[-1].kind, entries[-1].amount, entries[-1].balance) == (TransactionKind.DEPOSIT, 7, 107)
+
+    with pytest.raises(NegativeAmountError):
+        bank.bulk_deposit(["a"], [0])
+    with pytest.raises(ValueError, match="only once"):
+        bank.bulk_deposit(["a", "a"], [1, 1])
+    with pytest.raises(ValueError, match="same length"):
+        bank.bulk_deposit(["a"], [1, 2])
+    assert bank.total_balance() == 312
+
+
+@log_test()
+def test_interest_and_fees_across_all_accounts():
+    bank = ColumnarBank()
+    bank.create_account("rich", 1_000_000)
+    bank.create_account("poor", 50)
+    bank.create_account("empty", 0)
+
+    # 1.5% rounded down: 50 cents earns nothing
+    assert bank.apply_interest(150) == 15_000
+    assert bank.get_account("rich").balance == 1_015_000
+    assert bank.get_account("poor").get_transaction_history()[-1] == "Account created with balance: 0.50"
+
+    assert bank.apply_fee(100) == 1
+    assert bank.get_account("rich").get_transaction_history()[-1] == "Withdrawn: 1.00"
+    assert bank.total_balance() == 1_014_900 + 50
+    assert bank.apply_fee(10 ** 9) == 0
+
+    with pytest.raises(ValueError):
+        bank.apply_interest(-1)
+    with pytest.raises(NegativeAmountError):
+        bank.apply_fee(0)
+
+
+@log_test()
+def test_interest_on_large_balances_is_exact_and_bounded():
+    import numpy as np
+    from banking.columnar import _exact_sum
+    bank = ColumnarBank()
+    bank.create_account("a", 4 * 10 ** 14 + 1234)
+    bank.create_account("b", 12_345)
+    assert bank.apply_interest(150) == 6 * 10 ** 12 + 18 + 185
+    assert bank.get_account("a").balance == 406 * 10 ** 12 + 1252
+    assert bank.get_account("a").get_transactions()[0][-1].amount == 6 * 10 ** 12 + 18
+
+    # 100% of 9.3e14 is past the maximum balance, and balance * rate past int64
+    bank.create_account("c", 93 * 10 ** 13)
+    entries, total = len(bank.ledger), bank.total_balance()
+    with pytest.raises(BalanceLimitError):
+        bank.apply_interest(10_000)
+    assert bank.get_account("c").balance == 93 * 10 ** 13
+    assert (len(bank.ledger), bank.total_balance()) == (entries, total)
+    with pytest.raises(ValueError, match="cannot exceed"):
+        bank.apply_interest(10_001)
+    # column totals are summed exactly, even past int64
+    assert _exact_sum(np.array([2 ** 62] * 3 + [-5], dtype=np.int64)) == 3 * 2 ** 62 - 5
+
+
+@log_test()
+def test_columnar_bank_snapshot_and_log(tmp_path):
+    from banking.wal import WriteAheadLog
+    wal_path, snapshot_path = str(tmp_path / "bank.wal"), str(tmp_path / "bank.snapshot")
+    bank = ColumnarBank.open(WriteAheadLog(wal_path, fsync="always"), snapshot_path)
+    for i in range(3):
+        bank.create_account(f"u{i}", 1000)
+    bank.save_snapshot()
+    bank.apply_interest(1000)
+    bank.close()
+
+    recovered = ColumnarBank.open(WriteAheadLog(wal_path), snapshot_path)
+    assert recovered.balances.values.tolist() == [1100, 1100, 1100]
+    assert recovered.total_balance() == 3300
+    recovered.close()
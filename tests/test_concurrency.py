@@ -1,8 +1,10 @@
 
 import pytest
 import asyncio
+import time
 import httpx
 from banking.main import app, bank
+from banking.money import to_minor
 
 # We need to run the app in a way that allows concurrent requests.
 # Since we are testing an ASGI app, we can use httpx.AsyncClient.
@@ -52,4 +54,83 @@ async def test_race_condition_transfer():
         
         print(f"Alice: {alice_bal}, Bob: {bob_bal}")
         
-        assert alice_bal + bob_bal == 2000.0
+        # in minor units: float sums of balances are not exact
+        assert to_minor(alice_bal) + to_minor(bob_bal) == 200_000
+
+
+@pytest.mark.asyncio
+async def test_opposite_order_transfers_do_not_deadlock():
+    from banking.locks import AccountLocks
+    locks = AccountLocks()
+    order = []
+
+    async def hold(first, second):
+        async with locks.hold(first, second):
+            order.append(first)
+            await asyncio.sleep(0.01)
+
+    # Alice->Bob and Bob->Alice would deadlock with naive lock ordering
+    await asyncio.wait_for(
+        asyncio.gather(*(hold("Alice", "Bob") if i % 2 else hold("Bob", "Alice") for i in range(20))),
+        timeout=5,
+    )
+    assert len(order) == 20
+    # idle locks are dropped so the table does not grow with the number of accounts
+    assert len(locks) == 0
+
+
+@pytest.mark.asyncio
+async def test_transfer_throughput_under_contention():
+    from banking.models import Bank
+    local_bank = Bank()
+    pairs = 20
+    transfers_per_pair = 10
+    io_delay = 0.005  # simulated persistence latency inside the critical section
+    for i in range(pairs):
+        local_bank.create_account(f"S{i}", 100_000)
+        local_bank.create_account(f"R{i}", 100_000)
+    local_bank.create_account("Hot", 100_000)
+
+    async def transfer(sender, recipient):
+        async with local_bank.locks.hold(sender, recipient):
+            local_bank.get_account(sender).transfer(local_bank.get_account(recipient), 100)
+            await asyncio.sleep(io_delay)
+
+    async def timed(jobs):
+        start = time.perf_counter()
+        await asyncio.gather(*jobs)
+        return time.perf_counter() - start
+
+    # Unrelated account pairs only contend with themselves
+    disjoint = await timed(
+        transfer(f"S{i}", f"R{i}") for i in range(pairs) for _ in range(transfers_per_pair)
+    )
+    # Every transfer touches the same hot account
+    hot = await timed(
+        transfer(f"S{i}", "Hot") for i in range(pairs) for _ in range(transfers_per_pair)
+    )
+
+    total = pairs * transfers_per_pair
+    print(f"disjoint pairs: {total / disjoint:,.0f} transfers/s, hot account: {total / hot:,.0f} transfers/s")
+
+    assert hot >= total * io_delay  # a single hot account serializes everything
+    assert disjoint < hot / 4  # disjoint pairs overlap their critical sections
+    balances = sum(account.balance for account in local_bank.accounts.values())
+    assert balances == 100_000 * (2 * pairs + 1)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_retries_with_one_idempotency_key_apply_once(monkeypatch):
+    import banking.main as main
+    from banking.models import Bank
+    monkeypatch.setattr(main, "bank", Bank())
+    main.bank.create_account("Carol", 0)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        responses = await asyncio.gather(*(
+            client.post("/accounts/Carol/deposits", json={"amount": 25}, headers={"Idempotency-Key": "retry-me"})
+            for _ in range(20)
+        ))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert main.bank.get_account("Carol").balance == 2500
@@ -0,0 +1,260 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import httpx
+import pytest
+import banking.main as main
+from banking.engine import EngineClient, RemoteError, serve
+from banking.feed import ChangeFeed
+from banking.idempotency import IdempotencyCache
+from banking.models import Bank
+from tests.test_logger import log_test
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture
+def engine_mode(tmp_path, monkeypatch):
+    """Route every request of banking.main.app through an in-process engine."""
+    monkeypatch.setattr(main, "bank", Bank())
+    monkeypatch.setattr(main, "idempotency", IdempotencyCache())
+    monkeypatch.setattr(main, "feed", ChangeFeed())
+    path = str(tmp_path / "engine.sock")
+    monkeypatch.setattr(main, "engine", EngineClient(path))
+    return path
+
+
+@pytest.mark.asyncio
+async def test_routes_forward_to_the_engine(engine_mode):
+    server = await serve(engine_mode, main.dispatch)
+    transport = httpx.ASGITransport(app=main.app)
+    # a worker's lifespan only closes its engine connection on shutdown
+    async with server, main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://w") as client:
+        assert (await client.post("/accounts/", json={"name": "alice", "initial_balance": 100})).status_code == 200
+        assert (await client.post("/accounts/", json={"name": "bob", "initial_balance": 0})).status_code == 200
+        headers = {"Idempotency-Key": "t1"}
+        for _ in range(2):
+            resp = await client.post("/transfers", json={"sender": "alice", "recipient": "bob", "amount": 40},
+                                     headers=headers)
+            assert resp.json() == {"message": "40.00 transferred from alice to bob"}
+
+        assert (await client.get("/accounts/bob")).json() == {"name": "bob", "balance": 40}
+        missing = await client.get("/accounts/nobody")
+        assert missing.status_code == 404
+        assert "not found" in missing.json()["detail"].lower()
+        overdraw = await client.post("/accounts/bob/withdrawals", json={"amount": 1000})
+        assert overdraw.status_code == 400
+        history = (await client.get("/accounts/bob/transactions", params={"kind": "transfer_in"})).json()
+        assert [t["amount"] for t in history["transactions"]] == [40]
+        assert (await client.get("/accounts", params={"limit": 1})).json()["next_cursor"] == "alice"
+        assert (await client.get("/health")).json()["status"] == "ready"
+        metrics = (await client.get("/metrics")).text
+        assert "http_requests_total" in metrics
+        assert 'bank_operation_seconds_count{operation="transfer"}' in metrics
+
+
+@pytest.mark.asyncio
+async def test_pipelined_calls_on_one_connection(engine_mode):
+    main.bank.create_account("hot", 0)
+    server = await serve(engine_mode, main.dispatch)
+    async with server:
+        client = main.engine
+        results = await asyncio.gather(*(client.call("apply_deposit", "hot", 1, None) for _ in range(500)))
+        assert len(results) == 500
+        assert main.bank.get_account("hot").balance == 500
+
+        with pytest.raises(RemoteError) as error:
+            await client.call("apply_get_balance", "nobody")
+        assert error.value.status_code == 404
+        with pytest.raises(RemoteError) as error:
+            await client.call("no_such_operation")
+        assert error.value.status_code == 500
+        # large messages wait for the other side to drain
+        with pytest.raises(RemoteError) as error:
+            await client.call("apply_get_balance", "x" * 1_000_000)
+        assert error.value.status_code == 404
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_engine_survives_a_torn_request_and_replaces_a_stale_socket(tmp_path):
+    path = str(tmp_path / "engine.sock")
+    with open(path, "w"):
+        pass
+    server = await serve(path, lambda operation, args: operation)
+    async with server:
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(b"\x05\x00")  # half a header, then hang up
+        writer.close()
+        client = EngineClient(path)
+        assert await client.call("still serving") == "still serving"
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_client_reports_connect_failures_and_torn_answers(tmp_path):
+    path = str(tmp_path / "engine.sock")
+    client = EngineClient(path)
+    with pytest.raises(OSError):
+        await client.call("apply_health")
+
+    async def torn_answer(reader, writer):
+        await reader.read(1)
+        writer.write(b"\x05\x00")
+        writer.close()
+
+    server = await asyncio.start_unix_server(torn_answer, path)
+    async with server:
+        with pytest.raises(ConnectionError, match="lost"):
+            await client.call("apply_health")
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_calls_in_flight_fail_when_the_engine_goes_away(tmp_path):
+    path = str(tmp_path / "engine.sock")
+    release = asyncio.Event()
+
+    async def never_answers(reader, writer):
+        await reader.read(1)
+        await release.wait()
+        writer.close()
+
+    server = await asyncio.start_unix_server(never_answers, path)
+    async with server:
+        client = EngineClient(path)
+        call = asyncio.ensure_future(client.call("apply_health"))
+        await asyncio.sleep(0.05)
+        release.set()
+        with pytest.raises(ConnectionError):
+            await call
+        await client.close()
+
+
+@log_test()
+def test_engine_process_serves_several_workers(tmp_path):
+    path = str(tmp_path / "engine.sock")
+    env = dict(os.environ, BANK_WAL_PATH=str(tmp_path / "bank.wal"), BANK_SNAPSHOT_INTERVAL="0")
+    engine = subprocess.Popen([sys.executable, "-m", "banking.engine", "--socket", path], cwd=ROOT, env=env)
+    try:
+        for _ in range(200):
+            if os.path.exists(path):
+                break
+            assert engine.poll() is None
+            time.sleep(0.05)
+
+        async def workers():
+            first, second = EngineClient(path), EngineClient(path)
+            await first.call("apply_create_account", "shared", 0)
+            await asyncio.gather(
+                *(first.call("apply_deposit", "shared", 100, None) for _ in range(100)),
+                *(second.call("apply_withdraw", "shared", 1, None) for _ in range(50)),
+            )
+            # each worker sees the one balance the engine holds
+            balances = [await w.call("apply_get_balance", "shared") for w in (first, second)]
+            await first.close()
+            await second.close()
+            return balances
+
+        assert asyncio.run(workers()) == [{"name": "shared", "balance": 99.5}] * 2
+    finally:
+        engine.terminate()
+        assert engine.wait(timeout=10) == 0
+    # shutting down takes a snapshot, as a single-process server does
+    assert os.path.exists(str(tmp_path / "bank.wal.snapshot"))
+
+
+class FakeProcess:
+    def __init__(self, target=None, args=(), name=None, alive=True):
+        self.alive = alive
+        self.exitcode = None if alive else 3
+        self.terminated = False
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return self.alive
+
+    def terminate(self):
+        self.terminated = True
+
+    def join(self):
+        self.exitcode = 0
+
+
+@log_test()
+def test_launcher_starts_engine_then_workers(tmp_path, monkeypatch):
+    import uvicorn
+    import banking.engine as engine_module
+    path = str(tmp_path / "engine.sock")
+    open(path, "w").close()
+    processes, served = [], []
+
+    def process(**kwargs):
+        processes.append(FakeProcess(**kwargs))
+        return processes[-1]
+
+    monkeypatch.setattr(engine_module.multiprocessing, "Process", process)
+    monkeypatch.setattr(uvicorn, "run", lambda app, **kwargs: served.append((app, kwargs, os.environ["BANK_ENGINE_SOCKET"])))
+    monkeypatch.delenv("BANK_ENGINE_SOCKET", raising=False)
+
+    assert engine_module.main(["--socket", path, "--workers", "3", "--port", "9000"]) == 0
+    assert served == [("banking.main:app", {"host": "0.0.0.0", "port": 9000, "workers": 3}, path)]
+    assert processes[0].terminated
+    monkeypatch.delenv("BANK_ENGINE_SOCKET")
+
+    ran = []
+    monkeypatch.setattr(engine_module, "run_engine", ran.append)
+    assert engine_module.main(["--socket", path]) == 0
+    assert ran == [path]
+
+
+@log_test()
+def test_launcher_gives_up_on_a_dead_or_silent_engine(tmp_path):
+    from banking.engine import _wait_for_socket
+    path = str(tmp_path / "never.sock")
+    with pytest.raises(SystemExit, match="exited with code 3"):
+        _wait_for_socket(path, FakeProcess(alive=False))
+    with pytest.raises(SystemExit, match="did not listen"):
+        _wait_for_socket(path, FakeProcess(), timeout=0.1)
+
+
+@pytest.mark.asyncio
+async def test_feed_stream_polls_the_engine(engine_mode, monkeypatch):
+    monkeypatch.setattr(main, "FEED_POLL_INTERVAL", 0.001)
+    server = await serve(engine_mode, main.dispatch)
+    async with server:
+        stream = main._stream_feed(None, follow=True)
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        assert not first.done()
+        await main.execute(main.apply_create_account, "alice", 100)
+        chunk = await asyncio.wait_for(first, 5)
+        assert chunk.startswith(b"id: 0\nevent: account_created\n")
+        await stream.aclose()
+        await main.engine.close()
+
+
+@pytest.mark.asyncio
+async def test_engine_holds_answers_until_their_entries_are_on_disk(engine_mode, tmp_path, monkeypatch):
+    from banking.wal import WriteAheadLog
+    wal = WriteAheadLog(str(tmp_path / "bank.wal"), fsync="group", group_size=1000, group_interval=0.05)
+    monkeypatch.setattr(main, "bank", Bank.open(wal))
+    main.bank.create_account("hot", 0)
+    wal.sync()
+    server = await serve(engine_mode, main.dispatch, wal)
+    async with server:
+        client = main.engine
+        await client.connect()
+        deposits = [asyncio.ensure_future(client.call("apply_deposit", "hot", 1, None)) for _ in range(50)]
+        await asyncio.sleep(0)
+        # a read logs nothing, so it is answered without waiting for the deposits' fsync
+        assert (await client.call("apply_get_balance", "hot"))["balance"] == 0.5
+        assert not any(deposit.done() for deposit in deposits)
+        await asyncio.gather(*deposits)
+        assert wal._synced == wal.size
+        await client.close()
+    main.bank.close()
@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from banking.feed import ChangeFeed
+from tests.test_logger import log_test
+
+
+@log_test()
+def test_ring_keeps_the_last_events():
+    feed = ChangeFeed(capacity=3)
+    for i in range(5):
+        feed.publish(float(i), "deposit", "alice", 100, 100 * (i + 1))
+    assert (feed.oldest_offset, feed.next_offset) == (2, 5)
+    assert [e.offset for e in feed.read(2)] == [2, 3, 4]
+    assert [e.balance for e in feed.read(3, limit=1)] == [400]
+    assert feed.read(5) == []
+    with pytest.raises(ValueError, match="no longer in the feed"):
+        feed.read(1)
+    with pytest.raises(ValueError):
+        ChangeFeed(capacity=0)
+
+
+@log_test()
+def test_events_render_in_major_units():
+    feed = ChangeFeed()
+    feed.publish(1.5, "deposit", "alice", 1050, 2050)
+    feed.publish(2.5, "transfer", "alice", 50, 2000, "bob", 50)
+    deposit, transfer = (e.to_dict() for e in feed.read(0))
+    assert deposit == {"offset": 0, "timestamp": 1.5, "type": "deposit", "account": "alice",
+                       "amount": 10.5, "balance": 20.5}
+    assert transfer["counterparty"] == "bob" and transfer["counterparty_balance"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_wait_wakes_on_publish_and_times_out():
+    feed = ChangeFeed()
+    assert not await feed.wait(0, timeout=0.01)
+    waiter = asyncio.create_task(feed.wait(0, timeout=5))
+    await asyncio.sleep(0)
+    feed.publish(0.0, "deposit", "alice", 1, 1)
+    assert await waiter
+    assert await feed.wait(0, timeout=0)
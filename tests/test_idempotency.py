@@ -0,0 +1,52 @@
+import pytest
+from banking.idempotency import IdempotencyCache
+from tests.test_logger import log_test
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@log_test()
+def test_cache_returns_stored_outcome():
+    cache = IdempotencyCache()
+    assert cache.get("k1") is None
+    cache.put("k1", ("deposit", "alice", 100), {"message": "ok"})
+    cached = cache.get("k1")
+    assert cached.fingerprint == ("deposit", "alice", 100)
+    assert cached.outcome == {"message": "ok"}
+
+
+@log_test()
+def test_cache_evicts_oldest_beyond_max_keys():
+    cache = IdempotencyCache(max_keys=3)
+    for i in range(10_000):
+        cache.put(f"k{i}", i, i)
+        assert len(cache) <= 3
+    assert cache.get("k9996") is None
+    assert [cache.get(f"k{i}").outcome for i in (9997, 9998, 9999)] == [9997, 9998, 9999]
+
+
+@log_test()
+def test_cache_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = IdempotencyCache(ttl=10, clock=clock)
+    cache.put("old", 1, "first")
+    clock.now = 5
+    cache.put("new", 2, "second")
+    clock.now = 10
+    assert cache.get("old") is None
+    assert cache.get("new").outcome == "second"
+    clock.now = 15
+    assert cache.get("new") is None
+    assert len(cache) == 0
+
+
+@log_test()
+def test_cache_rejects_empty_bound():
+    with pytest.raises(ValueError):
+        IdempotencyCache(max_keys=0)
@@ -0,0 +1,63 @@
+import random
+from banking.index import SortedNameIndex
+from banking.models import Bank
+from tests.test_logger import log_test
+
+
+@log_test()
+def test_index_stays_sorted_across_chunk_splits():
+    names = [f"user{i:05d}" for i in range(2000)]
+    shuffled = names[:]
+    random.Random(7).shuffle(shuffled)
+    index = SortedNameIndex(shuffled[:100], chunk_size=8)
+    for name in shuffled[100:]:
+        index.add(name)
+    assert len(index) == 2000
+    assert list(index) == names
+    assert max(len(chunk) for chunk in index._chunks) <= 16
+
+
+@log_test()
+def test_index_iter_from():
+    index = SortedNameIndex(["b", "d", "f", "h"], chunk_size=2)
+    assert list(index.iter_from("d")) == ["d", "f", "h"]
+    assert list(index.iter_from("d", inclusive=False)) == ["f", "h"]
+    assert list(index.iter_from("c")) == ["d", "f", "h"]
+    assert list(index.iter_from("z")) == []
+    assert list(SortedNameIndex().iter_from("a")) == []
+
+
+@log_test()
+def test_bank_list_accounts_pages():
+    bank = Bank()
+    for name, balance in [("carol", 300), ("alice", 100), ("bob", 200), ("alex", 50)]:
+        bank.create_account(name, balance)
+    page, cursor = bank.list_accounts(limit=2)
+    assert [a.name for a in page] == ["alex", "alice"] and cursor == "alice"
+    page, cursor = bank.list_accounts(after=cursor, limit=2)
+    assert [a.name for a in page] == ["bob", "carol"] and cursor == "carol"
+    assert bank.list_accounts(after=cursor) == ([], None)
+
+    page, _ = bank.list_accounts(prefix="al")
+    assert [a.name for a in page] == ["alex", "alice"]
+    page, _ = bank.list_accounts(after="a", prefix="b")
+    assert [a.name for a in page] == ["bob"]
+    page, _ = bank.list_accounts(min_balance=100, max_balance=200)
+    assert [a.name for a in page] == ["alice", "bob"]
+
+
+@log_test()
+def test_filtered_listing_scans_a_bounded_number_of_names(monkeypatch):
+    from banking import models
+    monkeypatch.setattr(models, "SCAN_FACTOR", 3)
+    bank = Bank()
+    for i in range(20):
+        bank.create_account(f"n{i:02d}", 500 if i in (4, 15) else 0)
+    # at most limit * SCAN_FACTOR names per page; short pages still carry a cursor
+    pages, cursor = [], None
+    while True:
+        page, cursor = bank.list_accounts(after=cursor, limit=2, min_balance=100)
+        pages.append([a.name for a in page])
+        if cursor is None:
+            break
+    assert pages == [["n04"], [], ["n15"], []]
@@ -0,0 +1,241 @@
+from array import array
+
+import pytest
+
+from banking.ledger import Ledger, TransactionKind
+from banking.models import Account, Bank
+from tests.test_logger import log_test
+
+
+@log_test()
+def test_ledger_append_and_read_back():
+    ledger = Ledger()
+    alice = ledger.register("Alice")
+    bob = ledger.register("Bob")
+    assert ledger.register("Alice") == alice
+
+    first = ledger.append(alice, TransactionKind.DEPOSIT, 2500, 12500)
+    second = ledger.append(alice, TransactionKind.TRANSFER_OUT, 1000, 11500, bob)
+    assert (first, second) == (0, 1)
+    assert len(ledger) == 2
+
+    entry = ledger[second]
+    assert entry.kind is TransactionKind.TRANSFER_OUT
+    assert entry.account == "Alice"
+    assert entry.counterparty == "Bob"
+    assert entry.amount == 1000
+    assert entry.balance == 11500
+    assert entry.timestamp >= ledger[first].timestamp
+    assert ledger[first].counterparty is None
+
+
+@log_test()
+def test_ledger_renders_history_strings():
+    ledger = Ledger()
+    alice = ledger.register("Alice")
+    bob = ledger.register("Bob")
+    ledger.append(alice, TransactionKind.CREATED, 10000, 10000)
+    ledger.append(alice, TransactionKind.WITHDRAWAL, 550, 9450)
+    ledger.append(alice, TransactionKind.TRANSFER_IN, 300, 9750, bob)
+    assert [ledger.render(i) for i in range(3)] == [
+        "Account created with balance: 100.00",
+        "Withdrawn: 5.50",
+        "Received from: 3.00 Bob",
+    ]
+
+
+@log_test()
+def test_bank_accounts_share_one_ledger():
+    bank = Bank()
+    alice = bank.create_account("Alice", 10000)
+    bob = bank.create_account("Bob", 0)
+    alice.transfer(bob, 4000)
+    bob.deposit(500)
+
+    assert len(bank.ledger) == 5
+    assert [entry.kind for entry in (bank.ledger[i] for i in range(5))] == [
+        TransactionKind.CREATED,
+        TransactionKind.CREATED,
+        TransactionKind.TRANSFER_OUT,
+        TransactionKind.TRANSFER_IN,
+        TransactionKind.DEPOSIT,
+    ]
+    assert bank.ledger[3].balance == 4000
+    assert bob.get_transaction_history() == [
+        "Account created with balance: 0.00",
+        "Received from: 40.00 Alice",
+        "Deposited: 5.00",
+    ]
+
+
+@log_test()
+def test_standalone_account_keeps_private_ledger():
+    acc = Account("Solo", 1000)
+    acc.withdraw(400)
+    assert acc.get_transaction_history() == [
+        "Account created with balance: 10.00",
+        "Withdrawn: 4.00",
+    ]
+
+
+@log_test()
+def test_account_transactions_paginate_with_cursor():
+    acc = Account("Pager", 0)
+    for amount in range(1, 8):
+        acc.deposit(amount * 100)
+
+    first, cursor = acc.get_transactions(limit=3)
+    assert [entry.amount for entry in first] == [0, 100, 200]
+    second, cursor = acc.get_transactions(cursor, limit=3)
+    assert [entry.amount for entry in second] == [300, 400, 500]
+    last, cursor = acc.get_transactions(cursor, limit=3)
+    assert [entry.amount for entry in last] == [600, 700]
+    assert cursor is None
+
+
+@log_test()
+def test_account_transactions_filters():
+    bank = Bank()
+    alice = bank.create_account("Alice", 10000)
+    bob = bank.create_account("Bob", 10000)
+    carol = bank.create_account("Carol", 10000)
+    alice.transfer(bob, 100)
+    alice.deposit(200)
+    alice.transfer(carol, 300)
+    alice.transfer(bob, 400)
+
+    out, _ = alice.get_transactions(kind=TransactionKind.TRANSFER_OUT)
+    assert [entry.amount for entry in out] == [100, 300, 400]
+    to_bob, _ = alice.get_transactions(counterparty="Bob")
+    assert [entry.amount for entry in to_bob] == [100, 400]
+    page, cursor = alice.get_transactions(limit=1, counterparty="Bob")
+    assert [entry.amount for entry in page] == [100] and cursor is not None
+    assert alice.get_transactions(counterparty="Nobody") == ([], None)
+
+    entries, _ = alice.get_transactions()
+    middle = entries[2].timestamp
+    window, _ = alice.get_transactions(since=middle, until=entries[-1].timestamp)
+    assert all(middle <= entry.timestamp < entries[-1].timestamp for entry in window)
+    assert alice.get_transactions(since=entries[-1].timestamp + 1) == ([], None)
+
+
+@log_test()
+def test_extend_account_notifies_batch_listeners_once():
+    from array import array
+    ledger = Ledger()
+    alice = ledger.register("Alice")
+    bob = ledger.register("Bob")
+    single, batches = [], []
+    ledger.subscribe(single.append)
+    ledger.subscribe(single.append, batches.append)
+
+    ledger.append(alice, TransactionKind.CREATED, 100, 100, timestamp=0.5)
+    first = ledger.extend_account(
+        alice, array('B', [TransactionKind.DEPOSIT, TransactionKind.TRANSFER_IN]), array('q', [5, 7]),
+        array('q', [105, 112]), array('q', [-1, bob]), array('d', [1.0, 2.0]),
+    )
+    assert first == 1
+    assert [e.offset for e in single] == [0, 0, 1, 2]
+    assert [[e.offset for e in batch] for batch in batches] == [[1, 2]]
+    assert ledger[2].counterparty == "Bob" and ledger[2].balance == 112 and ledger[2].timestamp == 2.0
+
+
+@log_test()
+def test_balance_at_binary_searches_entry_balances():
+    ledger = Ledger()
+    alice = ledger.register("Alice")
+    offsets = array('q', [
+        ledger.append(alice, TransactionKind.CREATED, 100, 100, timestamp=10.0),
+        ledger.append(alice, TransactionKind.DEPOSIT, 50, 150, timestamp=20.0),
+        ledger.append(alice, TransactionKind.WITHDRAWAL, 30, 120, timestamp=20.0),
+        ledger.append(alice, TransactionKind.DEPOSIT, 5, 125, timestamp=30.0),
+    ])
+    assert ledger.balance_at(offsets, 9.9) is None
+    assert ledger.balance_at(offsets, 10.0) == 100
+    assert ledger.balance_at(offsets, 19.9) == 100
+    # both entries at 20.0 count as of 20.0
+    assert ledger.balance_at(offsets, 20.0) == 120
+    assert ledger.balance_at(offsets, 1e12) == 125
+    assert ledger.balance_at(array('q'), 1e12) is None
+
+
+@log_test()
+def test_a_failed_append_leaves_every_column_the_same_length():
+    ledger = Ledger()
+    account_id = ledger.register("Alice")
+    ledger.append(account_id, TransactionKind.CREATED, 0, 100)
+
+    with pytest.raises(OverflowError):
+        ledger.append(account_id, TransactionKind.DEPOSIT, 1, 2 ** 63)
+    with pytest.raises(OverflowError):
+        ledger.extend(array('q', [account_id]), TransactionKind.DEPOSIT, array('q', [1]), [2 ** 63])
+    with pytest.raises(OverflowError):
+        ledger.extend_account(account_id, array('B', [TransactionKind.DEPOSIT]), array('q', [1]),
+                              [2 ** 63], array('q', [-1]), array('d', [0.0]))
+
+    columns = (ledger._timestamps, ledger._kinds, ledger._accounts,
+               ledger._amounts, ledger._counterparties, ledger._balances)
+    assert [len(column) for column in columns] == [1] * 6
+    assert ledger.append(account_id, TransactionKind.DEPOSIT, 5, 105) == 1
+    assert ledger[1].balance == 105
+
+
+@log_test()
+def test_timestamps_never_go_back_when_the_clock_does(monkeypatch):
+    from types import SimpleNamespace
+    from banking import ledger as ledger_module
+    clock = iter([100.0, 90.0, 95.0, 120.0])
+    monkeypatch.setattr(ledger_module, "time", SimpleNamespace(time=lambda: next(clock)))
+    ledger = Ledger()
+    alice = ledger.register("Alice")
+    ledger.append(alice, TransactionKind.CREATED, 100, 100)  # t=100
+    ledger.append(alice, TransactionKind.DEPOSIT, 10, 110)  # the clock says 90
+    ledger.extend(array('q', [alice]), TransactionKind.DEPOSIT, array('q', [1]), array('q', [111]))  # 95
+    ledger.extend_account(
+        alice, array('B', [TransactionKind.DEPOSIT] * 2), array('q', [1, 1]), array('q', [112, 113]),
+        array('q', [-1, -1]), array('d', [80.0, 130.0]), after=100.0,
+    )
+    ledger.append(alice, TransactionKind.WITHDRAWAL, 3, 110)  # 120
+    assert [ledger[i].timestamp for i in range(len(ledger))] == [100.0, 100.0, 100.0, 100.0, 130.0, 130.0]
+    # the binary search by time stays correct
+    offsets = array('q', range(len(ledger)))
+    assert ledger.balance_at(offsets, 99.0) is None
+    assert ledger.balance_at(offsets, 100.0) == 112
+    assert ledger.balance_at(offsets, 130.0) == 110
+
+
+@log_test()
+def test_atomic_blocks_reach_batch_listeners_as_one_batch():
+    ledger = Ledger()
+    alice = ledger.register("Alice")
+    single, batches = [], []
+    ledger.subscribe(single.append)
+    ledger.subscribe(lambda entry: None, batches.append)
+    with ledger.atomic():
+        ledger.append(alice, TransactionKind.CREATED, 0, 10)
+        with ledger.atomic():
+            ledger.append(alice, TransactionKind.DEPOSIT, 5, 15)
+        ledger.extend(array('q', [alice]), TransactionKind.DEPOSIT, array('q', [1]), array('q', [16]))
+        assert not single and not batches
+    assert [e.offset for e in single] == [0, 1, 2]
+    assert [[e.offset for e in batch] for batch in batches] == [[0, 1, 2]]
+
+
+@log_test()
+def test_filtered_pages_scan_a_bounded_number_of_entries(monkeypatch):
+    from banking import ledger as ledger_module
+    monkeypatch.setattr(ledger_module, "SCAN_FACTOR", 3)
+    bank = Bank()
+    alice = bank.create_account("Alice", 0)
+    for i in range(1, 20):
+        alice.deposit(1) if i % 8 else alice.withdraw(1)
+    # offsets 8 and 16 are withdrawals; each page scans at most 2 * 3 entries
+    pages, cursors, cursor = [], [], 0
+    while cursor is not None:
+        page, cursor = alice.get_transactions(cursor, limit=2, kind=TransactionKind.WITHDRAWAL)
+        pages.append([e.offset for e in page])
+        cursors.append(cursor)
+    assert pages == [[], [8], [16], []]
+    assert cursors == [6, 12, 18, None]
+    # unfiltered pages are unaffected
+    assert len(alice.get_transactions(limit=20)[0]) == 20
@@ -6,15 +6,30 @@ from tests.test_logger import log_test
 
 client = TestClient(app)
 
+
+@pytest.fixture(scope="module", autouse=True)
+def event_loop_portal():
+    """
+    Serve every request from one event loop, as uvicorn does.
+    Without this, TestClient starts a fresh loop per request and the
+    per-account asyncio locks would be shared across loops.
+    """
+    with client:
+        yield
+
 @pytest.fixture(autouse=True)
 def reset_bank(monkeypatch):
     """
     Each test gets a fresh Bank() instance.
     We re-import main and replace its `bank` with a new one.
     """
+    from banking.feed import ChangeFeed
+    from banking.idempotency import IdempotencyCache
     from banking.models import Bank
     import banking.main as m
     m.bank = Bank()
+    m.idempotency = IdempotencyCache()
+    m.feed = ChangeFeed()
     yield
 
 @log_test()
@@ -50,7 +65,8 @@ def test_list_accounts():
         "accounts": [
             {"name": "alice", "balance": 100.0},
             {"name": "bob", "balance": 50.0},
-        ]
+        ],
+        "next_cursor": None,
     }
 @log_test()
 def test_deposit_success():
@@ -160,3 +176,450 @@ def test_concurrent_transfers():
 
     assert alice_balance == 1000 - 5 * 100
     assert bob_balance == 1000 + 5 * 100
+
+@log_test()
+def test_transfer_batch_endpoint():
+    setup_accounts()
+    client.post("/accounts/", json={"name": "carol", "initial_balance": 0})
+
+    ok = client.post("/transfers/batch", json={"transfers": [
+        {"sender": "alice", "recipient": "carol", "amount": 100},
+        {"sender": "bob", "recipient": "carol", "amount": 200},
+    ]})
+    assert ok.status_code == 200
+    assert ok.json() == {"message": "2 transfers applied"}
+    assert client.get("/accounts/carol").json()["balance"] == 300
+
+    # one bad leg rejects the whole batch
+    err = client.post("/transfers/batch", json={"transfers": [
+        {"sender": "carol", "recipient": "alice", "amount": 300},
+        {"sender": "carol", "recipient": "bob", "amount": 1},
+    ]})
+    assert err.status_code == 400
+    assert err.json()["detail"].startswith("Transfer 1:")
+    assert client.get("/accounts/carol").json()["balance"] == 300
+    assert client.get("/accounts/alice").json()["balance"] == 900
+
+@log_test()
+def test_list_transactions_paginated():
+    setup_accounts()
+    for amount in (1, 2, 3):
+        client.post("/accounts/alice/deposits", json={"amount": amount})
+    client.post("/transfers", json={"sender": "alice", "recipient": "bob", "amount": 5})
+
+    page = client.get("/accounts/alice/transactions", params={"limit": 2}).json()
+    assert page["name"] == "alice"
+    assert [t["kind"] for t in page["transactions"]] == ["created", "deposit"]
+    assert page["next_cursor"] == 2
+
+    rest = client.get("/accounts/alice/transactions",
+                      params={"cursor": page["next_cursor"], "limit": 10}).json()
+    assert [t["amount"] for t in rest["transactions"]] == [2, 3, 5]
+    assert rest["next_cursor"] is None
+    assert rest["transactions"][-1] == {
+        "timestamp": rest["transactions"][-1]["timestamp"],
+        "kind": "transfer_out",
+        "amount": 5,
+        "counterparty": "bob",
+        "balance": 1001,
+    }
+
+    received = client.get("/accounts/bob/transactions",
+                          params={"kind": "transfer_in", "counterparty": "alice"}).json()
+    assert [t["amount"] for t in received["transactions"]] == [5]
+
+    windowed = client.get("/accounts/alice/transactions",
+                          params={"since": "2000-01-01T00:00:00Z", "until": "2000-01-02T00:00:00Z"})
+    assert windowed.json()["transactions"] == []
+
+
+@log_test()
+def test_list_transactions_errors():
+    setup_accounts()
+    assert client.get("/accounts/nobody/transactions").status_code == 404
+    bad = client.get("/accounts/alice/transactions", params={"kind": "refund"})
+    assert bad.status_code == 400
+    assert "refund" in bad.json()["detail"]
+
+@log_test()
+def test_health_reports_startup_time():
+    resp = client.get("/health")
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ready", "startup_seconds": 0.0}
+
+@log_test()
+def test_amounts_are_exact_to_the_cent():
+    client.post("/accounts/", json={"name": "ivy", "initial_balance": 0})
+    for _ in range(3):
+        client.post("/accounts/ivy/deposits", json={"amount": 0.1})
+    # float arithmetic would give 0.30000000000000004
+    assert client.get("/accounts/ivy").json()["balance"] == 0.3
+
+    sub_cent = client.post("/accounts/ivy/deposits", json={"amount": 0.001})
+    assert sub_cent.status_code == 422
+    assert client.post("/accounts/ivy/withdrawals", json={"amount": "0.30"}).status_code == 200
+    assert client.get("/accounts/ivy").json()["balance"] == 0
+
+@log_test()
+def test_list_accounts_pagination_and_filters():
+    for i, balance in enumerate([5, 50, 500, 5000, 50000]):
+        client.post("/accounts/", json={"name": f"user{i}", "initial_balance": balance})
+    client.post("/accounts/", json={"name": "zed", "initial_balance": 1})
+
+    first = client.get("/accounts", params={"limit": 2}).json()
+    assert [a["name"] for a in first["accounts"]] == ["user0", "user1"]
+    assert first["next_cursor"] == "user1"
+    rest = client.get("/accounts", params={"cursor": first["next_cursor"], "limit": 10}).json()
+    assert [a["name"] for a in rest["accounts"]] == ["user2", "user3", "user4", "zed"]
+    assert rest["next_cursor"] is None
+
+    by_prefix = client.get("/accounts", params={"prefix": "user", "limit": 3}).json()
+    assert [a["name"] for a in by_prefix["accounts"]] == ["user0", "user1", "user2"]
+    tail = client.get("/accounts", params={"prefix": "user", "cursor": "user2"}).json()
+    assert [a["name"] for a in tail["accounts"]] == ["user3", "user4"]
+
+    ranged = client.get("/accounts", params={"min_balance": "50", "max_balance": 5000.0}).json()
+    assert [a["balance"] for a in ranged["accounts"]] == [50, 500, 5000]
+    assert client.get("/accounts", params={"min_balance": "0.001"}).status_code == 422
+
+@log_test()
+def test_metrics_endpoint_reports_routes_and_operations():
+    client.post("/accounts/", json={"name": "mia", "initial_balance": 10})
+    client.post("/accounts/mia/deposits", json={"amount": 5})
+    client.get("/accounts/nobody")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    text = resp.text
+    assert 'http_requests_total{method="POST",route="/accounts/{name}/deposits",status="200"}' in text
+    assert 'http_requests_total{method="GET",route="/accounts/{name}",status="404"}' in text
+    assert 'bank_operation_seconds_count{operation="deposit"}' in text
+    assert "bank_accounts 1" in text
+    assert "bank_startup_seconds 0.0" in text
+
+@log_test()
+def test_metrics_endpoint_hidden_when_disabled(monkeypatch):
+    import banking.main as m
+    monkeypatch.setattr(m, "METRICS_ENABLED", False)
+    assert client.get("/metrics").status_code == 404
+
+@log_test()
+def test_idempotency_key_applies_money_movement_once():
+    client.post("/accounts/", json={"name": "olga", "initial_balance": 100})
+    client.post("/accounts/", json={"name": "pete", "initial_balance": 0})
+    headers = {"Idempotency-Key": "deposit-1"}
+
+    first = client.post("/accounts/olga/deposits", json={"amount": 10}, headers=headers)
+    retry = client.post("/accounts/olga/deposits", json={"amount": 10}, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert client.get("/accounts/olga").json()["balance"] == 110
+
+    headers = {"Idempotency-Key": "transfer-1"}
+    body = {"sender": "olga", "recipient": "pete", "amount": 30}
+    for _ in range(3):
+        assert client.post("/transfers", json=body, headers=headers).status_code == 200
+    assert client.get("/accounts/pete").json()["balance"] == 30
+
+    headers = {"Idempotency-Key": "batch-1"}
+    body = {"transfers": [{"sender": "pete", "recipient": "olga", "amount": 5}]}
+    for _ in range(2):
+        assert client.post("/transfers/batch", json=body, headers=headers).status_code == 200
+    assert client.get("/accounts/pete").json()["balance"] == 25
+    # a big batch is remembered by a fixed-size fingerprint, not by its legs
+    import banking.main as m
+    body = {"transfers": [{"sender": "olga", "recipient": "pete", "amount": 0.01}] * 500}
+    assert client.post("/transfers/batch", json=body, headers={"Idempotency-Key": "batch-2"}).status_code == 200
+    assert len(m.idempotency.get("batch-2").fingerprint) == 32
+    body["transfers"][-1] = {"sender": "olga", "recipient": "pete", "amount": 0.02}
+    assert client.post("/transfers/batch", json=body, headers={"Idempotency-Key": "batch-2"}).status_code == 422
+    client.post("/transfers", json={"sender": "pete", "recipient": "olga", "amount": 5})
+
+    # without a key every request is applied
+    client.post("/accounts/olga/withdrawals", json={"amount": 1})
+    client.post("/accounts/olga/withdrawals", json={"amount": 1})
+    assert client.get("/accounts/olga").json()["balance"] == 83
+
+@log_test()
+def test_idempotency_key_replays_errors_and_rejects_reuse():
+    client.post("/accounts/", json={"name": "quinn", "initial_balance": 10})
+    headers = {"Idempotency-Key": "withdraw-1"}
+    first = client.post("/accounts/quinn/withdrawals", json={"amount": 50}, headers=headers)
+    assert first.status_code == 400
+    client.post("/accounts/quinn/deposits", json={"amount": 100})
+    # the retry gets the original answer even though it would now succeed
+    retry = client.post("/accounts/quinn/withdrawals", json={"amount": 50}, headers=headers)
+    assert retry.status_code == 400
+    assert retry.json() == first.json()
+    assert client.get("/accounts/quinn").json()["balance"] == 110
+
+    reused = client.post("/accounts/quinn/withdrawals", json={"amount": 20}, headers=headers)
+    assert reused.status_code == 422
+    assert client.get("/accounts/quinn").json()["balance"] == 110
+
+@log_test()
+def test_import_and_export_accounts_in_chunks(monkeypatch):
+    from banking import bulk
+    monkeypatch.setattr(bulk, "CHUNK_SIZE", 3)
+    body = "".join(f'{{"name": "u{i:02d}", "balance": {i}.5}}\n' for i in range(10))
+    resp = client.post("/accounts/import", content=body)
+    assert resp.json() == {"imported": 10}
+    assert client.get("/accounts/u09").json()["balance"] == 9.5
+
+    export = client.get("/accounts/export", params={"format": "csv"})
+    assert export.headers["content-type"].startswith("text/csv")
+    lines = export.text.splitlines()
+    assert lines[0] == "name,balance"
+    assert lines[1:] == [f"u{i:02d},{i}.50" for i in range(10)]
+
+    ndjson = client.get("/accounts/export").text.splitlines()
+    assert len(ndjson) == 10
+
+    client.post("/accounts/u00/deposits", json={"amount": 1})
+    ledger = client.get("/ledger/export", params={"format": "csv"}).text.splitlines()
+    assert ledger[0] == "offset,timestamp,kind,account,amount,counterparty,balance"
+    assert len(ledger) == 12
+    assert ledger[-1].split(",")[2:] == ["deposit", "u00", "1.00", "", "1.50"]
+
+@log_test()
+def test_import_stops_at_the_first_bad_line(monkeypatch):
+    from banking import bulk
+    monkeypatch.setattr(bulk, "CHUNK_SIZE", 2)
+    body = "name,balance\na,1\nb,2\nc,3\nd,oops\ne,5\n"
+    resp = client.post("/accounts/import", params={"format": "csv"}, content=body)
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Line 5: 'oops' is not a valid amount (2 accounts imported before the error)"
+    # whole chunks apply: a and b did, c was never applied
+    assert client.get("/accounts/b").status_code == 200
+    assert client.get("/accounts/c").status_code == 404
+
+    dup = client.post("/accounts/import", params={"format": "csv"}, content="name,balance\nx,1\na,1\n")
+    assert dup.status_code == 400
+    assert "'a' already exists" in dup.json()["detail"]
+    assert client.get("/accounts/x").status_code == 404
+    assert client.post("/accounts/import", params={"format": "xml"}, content="").status_code == 422
+
+@log_test()
+def test_import_rejects_oversized_balances_and_leaves_the_bank_unchanged():
+    import banking.main as m
+    before = client.get("/stats").json()
+    body = "name,balance\nb,1\nx,100000000000000000\n"
+    resp = client.post("/accounts/import", params={"format": "csv"}, content=body)
+    assert resp.status_code == 400
+    assert resp.json()["detail"].startswith("Line 3: Amount 100000000000000000 exceeds the maximum")
+    assert client.get("/accounts/b").status_code == 404
+    assert client.get("/stats").json() == before
+    # a balance the parser allows but the ledger cannot hold is refused by the bank's own check
+    from banking.money import MAX_BALANCE
+    with pytest.raises(m.HTTPException) as e:
+        m.apply_create_accounts([["y", 1], ["z", MAX_BALANCE + 1]])
+    assert e.value.status_code == 400
+    assert "y" not in m.bank.accounts
+
+@log_test()
+def test_prefer_return_minimal_skips_the_body(monkeypatch):
+    import banking.responses as r
+    client.post("/accounts/", json={"name": "rita", "initial_balance": 50})
+    client.post("/accounts/", json={"name": "sam", "initial_balance": 0})
+    minimal = {"Prefer": "return=minimal"}
+
+    resp = client.post("/accounts/rita/deposits", json={"amount": 5}, headers=minimal)
+    assert resp.status_code == 204 and resp.content == b""
+    resp = client.post("/accounts/rita/withdrawals", json={"amount": 10}, headers=minimal)
+    assert resp.status_code == 204
+    resp = client.post("/transfers", json={"sender": "rita", "recipient": "sam", "amount": 20}, headers=minimal)
+    assert resp.status_code == 204
+    assert client.get("/accounts/rita").json() == {"name": "rita", "balance": 25.0}
+    # errors keep their body
+    resp = client.post("/accounts/rita/withdrawals", json={"amount": 100}, headers=minimal)
+    assert resp.status_code == 400 and "detail" in resp.json()
+
+    monkeypatch.setattr(r, "COMPACT_BY_DEFAULT", True)
+    assert client.post("/accounts/sam/deposits", json={"amount": 1}).status_code == 204
+    resp = client.post("/accounts/sam/deposits", json={"amount": 1},
+                       headers={"Prefer": "return=representation"})
+    assert resp.json() == {"message": "1.00 deposited to sam"}
+
+@log_test()
+def test_hot_accounts_take_credits_without_their_lock():
+    import banking.main as m
+    from banking.models import Bank
+    m.bank = Bank(hot_accounts=["shop"])
+    client.post("/accounts/", json={"name": "shop", "initial_balance": 0})
+    client.post("/accounts/", json={"name": "tina", "initial_balance": 100})
+    assert m.credit_locks("shop") == ()
+    assert m.credit_locks("tina") == ("tina",)
+
+    client.post("/accounts/shop/deposits", json={"amount": 5})
+    client.post("/transfers", json={"sender": "tina", "recipient": "shop", "amount": 20})
+    assert m.bank.get_account("shop").pending == 2
+    assert client.get("/accounts/shop").json()["balance"] == 25.0
+    # an export folds pending credits first
+    ledger = client.get("/ledger/export", params={"format": "csv"}).text.splitlines()
+    assert ledger[-1].split(",")[2:] == ["transfer_in", "shop", "20.00", "tina", "25.00"]
+    assert client.post("/accounts/shop/withdrawals", json={"amount": 25}).status_code == 200
+    assert client.get("/accounts/shop").json()["balance"] == 0.0
+
+@log_test()
+def test_account_rate_limit_returns_429(monkeypatch):
+    import banking.main as m
+    from banking.ratelimit import RateLimiter
+    monkeypatch.setattr(m, "account_limiter", RateLimiter(rate=0.5, burst=2))
+    client.post("/accounts/", json={"name": "uma", "initial_balance": 100})
+    client.post("/accounts/", json={"name": "vic", "initial_balance": 100})
+
+    assert client.post("/accounts/uma/deposits", json={"amount": 1}).status_code == 200
+    assert client.post("/transfers", json={"sender": "uma", "recipient": "vic", "amount": 1}).status_code == 200
+    limited = client.post("/accounts/uma/withdrawals", json={"amount": 1})
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "2"
+    assert limited.json()["detail"] == "Rate limit exceeded for account 'uma'"
+    # receiving money does not count against vic, and vic has its own budget
+    assert client.post("/accounts/vic/deposits", json={"amount": 1}).status_code == 200
+    body = {"transfers": [{"sender": "vic", "recipient": "uma", "amount": 1}] * 2}
+    assert client.post("/transfers/batch", json=body).status_code == 429
+    assert client.get("/accounts/vic").json()["balance"] == 102.0
+
+@log_test()
+def test_batch_with_more_legs_than_the_burst_succeeds_and_delays_the_next(monkeypatch):
+    import banking.main as m
+    from banking.ratelimit import RateLimiter
+    monkeypatch.setattr(m, "account_limiter", RateLimiter(rate=0.5, burst=5))
+    client.post("/accounts/", json={"name": "pay", "initial_balance": 100})
+    client.post("/accounts/", json={"name": "get", "initial_balance": 0})
+    body = {"transfers": [{"sender": "pay", "recipient": "get", "amount": 1}] * 6}
+    assert client.post("/transfers/batch", json=body).status_code == 200
+    assert client.get("/accounts/get").json()["balance"] == 6.0
+    # all six legs were charged: the next transaction waits for 1 + 1 tokens at 0.5/s
+    delayed = client.post("/accounts/pay/withdrawals", json={"amount": 1})
+    assert delayed.status_code == 429
+    assert delayed.headers["Retry-After"] == "4"
+
+@log_test()
+def test_balance_as_of(monkeypatch):
+    from types import SimpleNamespace
+    from banking import ledger
+    clock = iter(range(1_000, 2_000))
+    monkeypatch.setattr(ledger, "time", SimpleNamespace(time=lambda: float(next(clock))))
+    client.post("/accounts/", json={"name": "wes", "initial_balance": 10})  # t=1000
+    client.post("/accounts/wes/deposits", json={"amount": 5})  # t=1001
+    client.post("/accounts/wes/withdrawals", json={"amount": 3})  # t=1002
+
+    def as_of(value):
+        return client.get("/accounts/wes/balance", params={"as_of": value})
+
+    assert as_of(1001).json() == {"name": "wes", "balance": 15.0, "as_of": "1970-01-01T00:16:41+00:00"}
+    assert as_of("1970-01-01T00:16:42Z").json()["balance"] == 12.0
+    assert as_of(5000).json()["balance"] == 12.0
+    assert client.get("/accounts/wes/balance").json() == {"name": "wes", "balance": 12.0}
+    early = as_of(999)
+    assert early.status_code == 404
+    assert early.json()["detail"] == "Account 'wes' has no history at or before the requested time"
+    assert client.get("/accounts/nobody/balance", params={"as_of": 1}).status_code == 404
+    assert as_of("yesterday").status_code == 422
+
+def read_events(**params):
+    import json
+    resp = client.get("/events", params={"follow": False, **params.pop("query", {})}, **params)
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for block in resp.text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if line)
+        if fields:
+            events.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+    return events
+
+@log_test()
+def test_change_feed_publishes_each_successful_change():
+    client.post("/accounts/", json={"name": "xia", "initial_balance": 100})
+    client.post("/accounts/", json={"name": "yan", "initial_balance": 0})
+    headers = {"Idempotency-Key": "d1"}
+    for _ in range(2):
+        client.post("/accounts/xia/deposits", json={"amount": 5}, headers=headers)
+    client.post("/accounts/xia/withdrawals", json={"amount": 500})  # fails: no event
+    client.post("/accounts/xia/withdrawals", json={"amount": 1})
+    client.post("/transfers", json={"sender": "xia", "recipient": "yan", "amount": 4})
+    body = {"transfers": [{"sender": "xia", "recipient": "yan", "amount": 10},
+                          {"sender": "yan", "recipient": "xia", "amount": 3}]}
+    client.post("/transfers/batch", json=body)
+    client.post("/accounts/import", content='{"name": "zed", "balance": 1}\n')
+
+    events = read_events(query={"offset": 0})
+    assert [(id, kind) for id, kind, _ in events] == [
+        ("0", "account_created"), ("1", "account_created"), ("2", "deposit"), ("3", "withdrawal"),
+        ("4", "transfer"), ("5", "transfer"), ("6", "transfer"), ("7", "account_created"),
+    ]
+    transfer = events[4][2]
+    assert {k: v for k, v in transfer.items() if k != "timestamp"} == {
+        "offset": 4, "type": "transfer", "account": "xia", "amount": 4.0, "balance": 100.0,
+        "counterparty": "yan", "counterparty_balance": 4.0,
+    }
+    # batch legs carry the balances right after each leg
+    assert [(e["balance"], e["counterparty_balance"]) for _, _, e in events[5:7]] == [(90.0, 14.0), (11.0, 93.0)]
+
+    # resume after the last event seen, or from the end by default
+    assert [id for id, _, _ in read_events(headers={"Last-Event-ID": "5"})] == ["6", "7"]
+    assert read_events() == []
+
+@log_test()
+def test_change_feed_tells_lagging_subscribers_to_resync(monkeypatch):
+    import banking.main as m
+    from banking.feed import ChangeFeed
+    m.feed = ChangeFeed(capacity=2)
+    for name in ("a1", "a2", "a3"):
+        client.post("/accounts/", json={"name": name, "initial_balance": 0})
+    assert read_events(query={"offset": 0}) == [(None, "resync", {"oldest_offset": 1, "next_offset": 3})]
+    assert [id for id, _, _ in read_events(query={"offset": 1})] == ["1", "2"]
+
+@pytest.mark.asyncio
+async def test_change_feed_wakes_followers_and_sends_heartbeats(monkeypatch):
+    import asyncio
+    import banking.main as m
+    monkeypatch.setattr(m, "FEED_HEARTBEAT", 0.01)
+    stream = m._stream_feed(None, follow=True)
+    assert await asyncio.wait_for(stream.__anext__(), 5) == b": keep-alive\n\n"
+    waiting = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0)
+    m.feed.publish(0.0, "account_created", "live", 100, 100)
+    assert (await asyncio.wait_for(waiting, 5)).startswith(b"id: 0\nevent: account_created\n")
+    await stream.aclose()
+
+@log_test()
+def test_stats_endpoint():
+    client.post("/accounts/", json={"name": "sa", "initial_balance": 10})
+    client.post("/accounts/", json={"name": "sb", "initial_balance": 0})
+    client.post("/transfers", json={"sender": "sa", "recipient": "sb", "amount": 4})
+    client.post("/accounts/sb/deposits", json={"amount": 1.5})
+    body = client.get("/stats").json()
+    assert {k: v for k, v in body.items() if k != "balance_histogram"} == {
+        "version": 5, "accounts": 2, "total_balance": 11.5,
+        "total_deposited": 1.5, "total_withdrawn": 0.0, "total_transferred": 4.0,
+    }
+    # 6.00 and 5.50 are 600 and 550 minor units: both in [512, 1024)
+    assert body["balance_histogram"][-1] == {"below": 10.24, "count": 2}
+    assert sum(bucket["count"] for bucket in body["balance_histogram"]) == 2
+
+
+@log_test()
+def test_oversized_amounts_and_balances_are_rejected_cleanly():
+    import banking.main as m
+    from banking.money import MAX_BALANCE
+    assert client.post("/accounts/", json={"name": "huge", "initial_balance": 1e300}).status_code == 422
+    client.post("/accounts/", json={"name": "a", "initial_balance": 1})
+    assert client.post("/accounts/a/deposits", json={"amount": 10 ** 17}).status_code == 422
+    assert client.get("/accounts/a").json() == {"name": "a", "balance": 1}
+
+    m.bank.create_account("full", MAX_BALANCE - 50)
+    resp = client.post("/accounts/full/deposits", json={"amount": 1})
+    assert resp.status_code == 400
+    assert "would exceed" in resp.json()["detail"]
+    assert client.post("/transfers", json={"sender": "a", "recipient": "full", "amount": 1}).status_code == 400
+    assert m.bank.get_account("full").balance == MAX_BALANCE - 50
+    assert client.get("/accounts/a").json()["balance"] == 1
+    # the largest balances still print exactly to the cent
+    from banking.money import to_minor
+    assert to_minor(client.get("/accounts/full").json()["balance"]) == MAX_BALANCE - 50
+    # the ledger is still readable for every account
+    for name in ("a", "full"):
+        assert client.get(f"/accounts/{name}/transactions").status_code == 200
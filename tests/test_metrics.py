@@ -0,0 +1,66 @@
+import pytest
+import banking.metrics as metrics
+from banking.metrics import Histogram, Registry, timed
+from banking.models import Bank
+from tests.test_logger import log_test
+
+
+@log_test()
+def test_histogram_buckets_by_power_of_two_nanoseconds():
+    histogram = Histogram()
+    for nanoseconds in (1, 256, 257, 1000, 10 ** 10):
+        histogram.observe(nanoseconds)
+    assert histogram.counts[0] == 1
+    assert histogram.counts[8] == 1   # 256ns is on the 2**8 bound
+    assert histogram.counts[9] == 1
+    assert histogram.counts[10] == 1
+    assert histogram.count == 5
+    assert histogram.sum == 1 + 256 + 257 + 1000 + 10 ** 10
+
+
+@log_test()
+def test_registry_renders_text_exposition():
+    registry = Registry()
+    registry.counter("requests_total", "Requests.", route='/a"b').inc(3)
+    registry.histogram("latency_seconds", "Latency.", op="x").observe(300)
+    registry.gauge("accounts", "Accounts.", lambda: 7)
+    registry.counter("plain_total", "No labels.").inc()
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a\\"b"} 3' in text
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{op="x",le="2.56e-07"} 0' in text
+    assert 'latency_seconds_bucket{op="x",le="5.12e-07"} 1' in text
+    assert 'latency_seconds_bucket{op="x",le="+Inf"} 1' in text
+    assert 'latency_seconds_count{op="x"} 1' in text
+    assert "accounts 7" in text
+    assert "plain_total 1" in text
+    # the same name and labels always return the same series
+    assert registry.counter("requests_total", "Requests.", route='/a"b').value == 3
+
+
+@log_test()
+def test_bank_operations_are_timed_and_failures_counted():
+    registry = metrics.REGISTRY
+    deposits = registry.histogram("bank_operation_seconds", "", operation="deposit")
+    failures = registry.counter("bank_operation_errors_total", "", operation="withdraw")
+    before_deposits, before_failures = deposits.count, failures.value
+
+    bank = Bank()
+    account = bank.create_account("alice", 100)
+    account.deposit(50)
+    with pytest.raises(Exception):
+        account.withdraw(1000)
+
+    assert deposits.count == before_deposits + 1
+    assert failures.value == before_failures + 1
+
+
+@log_test()
+def test_timed_is_a_no_op_when_disabled(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+
+    def operation():
+        return 1
+
+    assert timed("noop", Registry())(operation) is operation
@@ -1,68 +1,70 @@
 import threading
+import time
 import pytest
-from banking.models import Account, Bank
-from banking.errors import AccountNotFoundError, InsufficientFundsError, NegativeAmountError
+from banking.ledger import TransactionKind
+from banking.models import Account, Bank, HotAccount
+from banking.errors import AccountNotFoundError, BalanceLimitError, InsufficientFundsError, NegativeAmountError
 from tests.test_logger import log_test
 
 # ---------- Account Tests ----------
 @log_test()
 def test_account_creation():
-    acc = Account("Alice", 100.0)
+    acc = Account("Alice", 10000)
     assert acc.name == "Alice"
-    assert acc.balance == 100.0
+    assert acc.balance == 10000
     assert acc.get_transaction_history() == ["Account created with balance: 100.00"]
 
 @log_test()
 def test_deposit_valid():
-    acc = Account("Bob", 50.0)
-    acc.deposit(25.0)
-    assert acc.balance == 75.0
+    acc = Account("Bob", 5000)
+    acc.deposit(2500)
+    assert acc.balance == 7500
     assert "Deposited: 25.00" in acc.get_transaction_history()
 
 @log_test()
 def test_deposit_negative():
-    acc = Account("Carol", 30.0)
+    acc = Account("Carol", 3000)
     with pytest.raises(NegativeAmountError):
         acc.deposit(-5)
 
 @log_test()
 def test_withdraw_valid():
-    acc = Account("Daisy", 100.0)
-    acc.withdraw(60.0)
-    assert acc.balance == 40.0
+    acc = Account("Daisy", 10000)
+    acc.withdraw(6000)
+    assert acc.balance == 4000
     assert "Withdrawn: 60.00" in acc.get_transaction_history()
 
 @log_test()
 def test_withdraw_insufficient():
-    acc = Account("Eve", 20.0)
+    acc = Account("Eve", 2000)
     with pytest.raises(InsufficientFundsError):
-        acc.withdraw(30.0)
+        acc.withdraw(3000)
 
 @log_test()
 def test_withdraw_negative():
-    acc = Account("Frank", 100.0)
+    acc = Account("Frank", 10000)
     with pytest.raises(NegativeAmountError):
         acc.withdraw(0)
 
 @log_test()
 def test_transfer_successful():
-    acc1 = Account("Gina", 200.0)
-    acc2 = Account("Harry", 100.0)
-    acc1.transfer(acc2, 50.0)
-    assert acc1.balance == 150.0
-    assert acc2.balance == 150.0
+    acc1 = Account("Gina", 20000)
+    acc2 = Account("Harry", 10000)
+    acc1.transfer(acc2, 5000)
+    assert acc1.balance == 15000
+    assert acc2.balance == 15000
     assert "Transferred to: 50.00 Harry" in acc1.get_transaction_history()
     assert "Received from: 50.00 Gina" in acc2.get_transaction_history()
 
 @log_test()
 def test_transfer_to_self():
-    acc = Account("Ivan", 100.0)
+    acc = Account("Ivan", 10000)
     with pytest.raises(ValueError):
-        acc.transfer(acc, 10.0)
+        acc.transfer(acc, 1000)
 
 @log_test()
 def test_transaction_history_is_copy():
-    acc = Account("Jack", 100.0)
+    acc = Account("Jack", 10000)
     history = acc.get_transaction_history()
     history.append("Fake transaction")
     assert "Fake transaction" not in acc.get_transaction_history()
@@ -72,27 +74,27 @@ def test_transaction_history_is_copy():
 @log_test()
 def test_bank_create_account_success():
     bank = Bank()
-    acc = bank.create_account("Kate", 300.0)
+    acc = bank.create_account("Kate", 30000)
     assert acc.name == "Kate"
-    assert acc.balance == 300.0
+    assert acc.balance == 30000
 
 @log_test()
 def test_bank_create_account_duplicate():
     bank = Bank()
-    bank.create_account("Leo", 150.0)
+    bank.create_account("Leo", 15000)
     with pytest.raises(ValueError):
-        bank.create_account("Leo", 200.0)
+        bank.create_account("Leo", 20000)
 
 @log_test()
 def test_bank_create_account_negative_initial():
     bank = Bank()
     with pytest.raises(ValueError):
-        bank.create_account("Mona", -10.0)
+        bank.create_account("Mona", -1000)
 
 @log_test()
 def test_get_account_success():
     bank = Bank()
-    bank.create_account("Nina", 400.0)
+    bank.create_account("Nina", 40000)
     acc = bank.get_account("Nina")
     assert acc.name == "Nina"
 
@@ -106,13 +108,13 @@ def test_get_account_not_found():
 # ---------- Concurrency Test ----------
 @log_test()
 def test_concurrent_transfer_does_not_deadlock():
-    acc1 = Account("Penny", 1000.0)
-    acc2 = Account("Quinn", 1000.0)
+    acc1 = Account("Penny", 100000)
+    acc2 = Account("Quinn", 100000)
 
     def transfer_loop(from_acc, to_acc):
         for _ in range(100):
             try:
-                from_acc.transfer(to_acc, 1.0)
+                from_acc.transfer(to_acc, 100)
             except InsufficientFundsError:
                 pass
 
@@ -125,4 +127,179 @@ def test_concurrent_transfer_does_not_deadlock():
     t2.join(timeout=5)
 
     assert not t1.is_alive() and not t2.is_alive(), "Deadlock detected"
-    assert abs(acc1.balance + acc2.balance - 2000.0) < 0.001
+    assert acc1.balance + acc2.balance == 200000
+
+
+# ---------- Batch Transfer Tests ----------
+@log_test()
+def test_transfer_batch_applies_all_legs():
+    bank = Bank()
+    bank.create_account("Ruth", 10000)
+    bank.create_account("Sam", 0)
+    bank.create_account("Tom", 0)
+    # Sam can forward money he receives earlier in the same batch
+    count = bank.transfer_batch([("Ruth", "Sam", 6000), ("Sam", "Tom", 5000)])
+    assert count == 2
+    assert bank.get_account("Ruth").balance == 4000
+    assert bank.get_account("Sam").balance == 1000
+    assert bank.get_account("Tom").balance == 5000
+    assert "Received from: 50.00 Sam" in bank.get_account("Tom").get_transaction_history()
+
+@log_test()
+def test_transfer_batch_is_all_or_nothing():
+    bank = Bank()
+    bank.create_account("Uma", 10000)
+    bank.create_account("Vic", 0)
+    with pytest.raises(InsufficientFundsError, match="Transfer 1"):
+        bank.transfer_batch([("Uma", "Vic", 8000), ("Uma", "Vic", 3000)])
+    assert bank.get_account("Uma").balance == 10000
+    assert bank.get_account("Vic").balance == 0
+    assert bank.get_account("Vic").get_transaction_history() == ["Account created with balance: 0.00"]
+
+@log_test()
+def test_transfer_batch_rejects_invalid_legs():
+    bank = Bank()
+    bank.create_account("Walt", 10000)
+    bank.create_account("Xena", 10000)
+    with pytest.raises(AccountNotFoundError, match="Transfer 0"):
+        bank.transfer_batch([("Walt", "Nobody", 1000)])
+    with pytest.raises(NegativeAmountError):
+        bank.transfer_batch([("Walt", "Xena", -100)])
+    with pytest.raises(ValueError, match="same account"):
+        bank.transfer_batch([("Walt", "Walt", 1000)])
+
+# ---------- Hot Account Tests ----------
+@log_test()
+def test_hot_account_buffers_credits_until_folded():
+    bank = Bank(hot_accounts=["Shop"])
+    shop = bank.create_account("Shop", 0)
+    alice = bank.create_account("Alice", 10000)
+    assert isinstance(shop, HotAccount)
+    assert not isinstance(alice, HotAccount)
+
+    shop.deposit(500)
+    alice.transfer(shop, 2000)
+    assert shop.balance == 2500
+    assert shop.pending == 2
+    assert len(bank.ledger) == 3  # two openings and Alice's outgoing leg
+
+    bank.settle()
+    assert shop.pending == 0
+    assert shop.balance == 2500
+    entries, _ = shop.get_transactions()
+    assert [(e.kind, e.amount, e.counterparty, e.balance) for e in entries[1:]] == [
+        (TransactionKind.DEPOSIT, 500, None, 500),
+        (TransactionKind.TRANSFER_IN, 2000, "Alice", 2500),
+    ]
+
+@log_test()
+def test_folded_credits_keep_their_arrival_times(monkeypatch):
+    from types import SimpleNamespace
+    from banking import ledger as ledger_module, models
+    now = [1000.0]
+    clock = SimpleNamespace(time=lambda: now[0])
+    monkeypatch.setattr(ledger_module, "time", clock)
+    monkeypatch.setattr(models, "time", SimpleNamespace(time=clock.time, perf_counter=lambda: 0.0))
+    bank = Bank(hot_accounts=["Shop"])
+    shop = bank.create_account("Shop", 0)
+    alice = bank.create_account("Alice", 1000)
+    now[0] = 1001.0
+    shop.deposit(100)
+    # other accounts keep moving money before the fold
+    for second in range(1002, 1006):
+        now[0] = float(second)
+        alice.withdraw(1)
+    bank.settle()
+    assert [e.timestamp for e in shop.get_transactions()[0]] == [1000.0, 1001.0]
+    assert shop.balance_at(1000.5) == 0
+    assert shop.balance_at(1001.001) == 100
+
+@log_test()
+def test_hot_account_folds_every_fold_size_credits():
+    shop = HotAccount("Shop", 0, fold_size=3)
+    for _ in range(7):
+        shop.deposit(100)
+    assert shop.pending == 1
+    assert shop.balance == 700
+    assert shop.get_transaction_history()[-1] == "Deposited: 1.00"
+    assert shop.pending == 0
+
+@log_test()
+def test_hot_account_debits_see_pending_credits_in_order():
+    bank = Bank(hot_accounts=["Shop"])
+    shop = bank.create_account("Shop", 100)
+    bob = bank.create_account("Bob", 0)
+    shop.deposit(900)
+    # the pending deposit is spendable, but not more than that
+    with pytest.raises(InsufficientFundsError):
+        shop.withdraw(1001)
+    shop.transfer(bob, 1000)
+    assert (shop.balance, bob.balance) == (0, 1000)
+    assert [e.balance for e in shop.get_transactions()[0]] == [100, 1000, 0]
+    with pytest.raises(InsufficientFundsError):
+        shop.withdraw(1)
+
+@log_test()
+def test_hot_and_plain_accounts_record_the_same_history():
+    def run(hot):
+        bank = Bank(hot_accounts=["Shop"] if hot else [])
+        shop = bank.create_account("Shop", 0)
+        payers = [bank.create_account(f"P{i}", 10000) for i in range(5)]
+        for i in range(50):
+            payers[i % 5].transfer(shop, 10 + i)
+            if i % 7 == 0:
+                shop.withdraw(5)
+        return [(e.kind, e.amount, e.counterparty, e.balance) for e in shop.get_transactions(limit=1000)[0]]
+
+    assert run(hot=True) == run(hot=False)
+
+@log_test()
+def test_balance_at_includes_pending_hot_credits():
+    bank = Bank(hot_accounts=["Shop"])
+    shop = bank.create_account("Shop", 100)
+    created = shop.get_transactions()[0][0].timestamp
+    assert shop.balance_at(created - 1) is None
+    shop.deposit(50)
+    assert shop.balance_at(time.time() + 1) == 150
+    assert shop.balance_at(created) == 100
+
+
+@log_test()
+def test_accounts_are_slotted_and_grow_their_history_on_demand():
+    bank = Bank()
+    account = bank.create_account("Lean", 100)
+    assert not hasattr(account, "__dict__")
+    assert type(account._entries) is int
+    assert account.get_transaction_history() == ["Account created with balance: 1.00"]
+    account.deposit(50)
+    account.withdraw(25)
+    assert account.get_transaction_history() == [
+        "Account created with balance: 1.00", "Deposited: 0.50", "Withdrawn: 0.25",
+    ]
+    hot = HotAccount("Hot", 0, bank.ledger, fold_size=2)
+    hot.deposit(1)
+    hot.deposit(2)
+    assert [entry.balance for entry in hot.get_transactions()[0]] == [0, 1, 3]
+
+
+@log_test()
+def test_credits_past_the_int64_limit_are_refused_before_anything_changes():
+    from banking.money import MAX_BALANCE
+    bank = Bank(hot_accounts=["HotFull"])
+    with pytest.raises(BalanceLimitError):
+        bank.create_account("Huge", MAX_BALANCE + 1)
+    full = bank.create_account("Full", MAX_BALANCE - 5)
+    hot = bank.create_account("HotFull", MAX_BALANCE - 5)
+    payer = bank.create_account("Payer", 100)
+    entries = len(bank.ledger)
+    for account in (full, hot):
+        with pytest.raises(BalanceLimitError, match="would exceed"):
+            account.deposit(10)
+        with pytest.raises(BalanceLimitError):
+            payer.transfer(account, 10)
+    with pytest.raises(BalanceLimitError, match="Transfer 1"):
+        bank.transfer_batch([("Payer", "Full", 5), ("Payer", "Full", 1)])
+    assert (full.balance, hot.balance, payer.balance) == (MAX_BALANCE - 5, MAX_BALANCE - 5, 100)
+    assert len(bank.ledger) == entries
+    full.deposit(5)
+    assert full.balance == MAX_BALANCE
@@ -0,0 +1,51 @@
+from decimal import Decimal
+import pytest
+from banking.money import MAX_AMOUNT, format_minor, to_major, to_minor
+from tests.test_logger import log_test
+
+
+@log_test()
+def test_to_minor_is_exact():
+    assert to_minor(12) == 1200
+    assert to_minor(12.34) == 1234
+    assert to_minor(0.1) == 10
+    assert to_minor("19.99") == 1999
+    assert to_minor(Decimal("-0.5")) == -50
+    assert to_minor(1e2) == 10000
+
+
+@log_test()
+def test_to_minor_rejects_invalid_amounts():
+    for value in (0.001, "1.234", "abc", float("nan"), float("inf"), True, None):
+        with pytest.raises(ValueError):
+            to_minor(value)
+
+
+@log_test()
+def test_to_major_and_format():
+    assert to_major(1234) == 12.34
+    # adding in minor units avoids float drift: 0.1 + 0.2 is exactly 0.3
+    assert to_major(to_minor(0.1) + to_minor(0.2)) == 0.3
+    assert format_minor(1234) == "12.34"
+    assert format_minor(5) == "0.05"
+    assert format_minor(-250) == "-2.50"
+    assert format_minor(0) == "0.00"
+
+
+@log_test()
+def test_to_minor_rejects_amounts_over_the_maximum():
+    assert to_minor("9999999999999.99") == MAX_AMOUNT
+    assert to_minor(-9999999999999.99) == -MAX_AMOUNT
+    for value in (1e300, 10 ** 17, 10 ** 13, "10000000000000.00", "1e999999999", Decimal("-1e14")):
+        with pytest.raises(ValueError, match="exceeds the maximum"):
+            to_minor(value)
+
+
+@log_test()
+def test_balances_up_to_the_maximum_print_exactly():
+    import json
+    from banking.money import MAX_BALANCE
+    for minor in (MAX_BALANCE, 900000000000001, 123456789012345, 10 ** 15 - 100):
+        printed = json.dumps(to_major(minor))
+        assert Decimal(printed) == Decimal(format_minor(minor))
+        assert to_minor(json.loads(printed)) == minor
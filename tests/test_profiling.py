@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+import banking.main as main
+from banking.feed import ChangeFeed
+from banking.idempotency import IdempotencyCache
+from banking.models import Bank
+from banking.profiling import SamplingProfiler, Trace, TraceMiddleware, traced
+from tests.test_logger import log_test
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    """Switch on what BANK_PROFILING=1 installs at import, for banking.main.app."""
+    monkeypatch.setattr(main, "bank", Bank())
+    monkeypatch.setattr(main, "idempotency", IdempotencyCache())
+    monkeypatch.setattr(main, "feed", ChangeFeed())
+    monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(main, "execute", traced(main.execute))
+    transport = httpx.ASGITransport(app=TraceMiddleware(main.app))
+    return httpx.AsyncClient(transport=transport, base_url="http://p")
+
+
+def timings(header: str) -> dict:
+    spans = {}
+    for span in header.split(", "):
+        name, duration = span.split(";dur=")
+        spans[name] = float(duration)
+    return spans
+
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(100))
+
+
+@log_test()
+def test_sampler_collapses_the_target_thread_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    profiler = SamplingProfiler(worker.ident, interval=0.001)
+    profiler.start()
+    time.sleep(0.05)
+    profiler.stop()
+    stop.set()
+    worker.join()
+    assert profiler.samples > 0
+    lines = profiler.collapsed().splitlines()
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == profiler.samples
+    assert any("busy_loop (test_profiling.py:" in line for line in lines)
+    # a thread that is gone yields no samples
+    profiler.sample()
+    assert sum(profiler.stacks.values()) == profiler.samples
+    with pytest.raises(ValueError):
+        SamplingProfiler(worker.ident, interval=0)
+
+
+@log_test()
+def test_trace_without_operations_counts_everything_as_validation():
+    trace = Trace()
+    spans = timings(trace.server_timing(trace.started + 2_000_000))
+    assert spans == {"validate": 2.0, "encode": 0.0, "total": 2.0}
+
+
+@pytest.mark.asyncio
+async def test_x_trace_returns_a_span_breakdown(profiling):
+    async with profiling as client:
+        await client.post("/accounts/", json={"name": "alice", "initial_balance": 10})
+        untraced = await client.post("/accounts/alice/deposits", json={"amount": 1})
+        assert "server-timing" not in untraced.headers
+        traced_response = await client.post("/accounts/alice/deposits", json={"amount": 1}, headers={"X-Trace": "1"})
+        assert traced_response.status_code == 200
+        spans = timings(traced_response.headers["server-timing"])
+        assert list(spans) == ["validate", "lock_wait", "bank.deposit", "encode", "total"]
+        assert spans["total"] >= spans["validate"] + spans["bank.deposit"] + spans["encode"] - 0.01
+        # failed operations are timed too
+        failed = await client.get("/accounts/nobody", headers={"X-Trace": "on"})
+        assert failed.status_code == 404
+        assert "bank.get_balance" in failed.headers["server-timing"]
+
+
+@pytest.mark.asyncio
+async def test_x_trace_times_engine_round_trips(profiling, tmp_path, monkeypatch):
+    from banking.engine import EngineClient, serve
+    path = str(tmp_path / "engine.sock")
+    monkeypatch.setattr(main, "engine", EngineClient(path))
+    server = await serve(path, main.dispatch)
+    async with server, profiling as client:
+        response = await client.get("/health", headers={"X-Trace": "1"})
+        assert list(timings(response.headers["server-timing"])) == ["validate", "engine.health", "encode", "total"]
+        await main.engine.close()
+
+
+@pytest.mark.asyncio
+async def test_profile_endpoint_samples_the_event_loop(profiling):
+    async with profiling as client:
+        async def traffic():
+            await asyncio.sleep(0.01)
+            for _ in range(20):
+                await client.get("/")
+
+        profile, _ = await asyncio.gather(
+            client.get("/admin/profile", params={"seconds": 0.2, "interval_ms": 1}), traffic()
+        )
+        assert profile.status_code == 200
+        assert profile.headers["content-disposition"] == 'attachment; filename="profile.folded"'
+        assert int(profile.headers["x-profile-samples"]) > 0
+        # the sampled thread is the one running the event loop
+        assert "run_forever (base_events.py:" in profile.text
+
+        first = asyncio.ensure_future(client.get("/admin/profile", params={"seconds": 0.1}))
+        await asyncio.sleep(0.02)
+        assert (await client.get("/admin/profile", params={"seconds": 0.1})).status_code == 409
+        assert (await first).status_code == 200
+
+
+@log_test()
+def test_profiling_is_off_by_default():
+    from fastapi.testclient import TestClient
+    assert not main.PROFILING_ENABLED
+    client = TestClient(main.app)
+    assert client.get("/admin/profile", params={"seconds": 0.01}).status_code == 404
+    assert "server-timing" not in client.get("/health", headers={"X-Trace": "1"}).headers
@@ -0,0 +1,185 @@
+import asyncio
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from banking.ratelimit import FairQueue, QueueFull, RateLimiter, RateLimitMiddleware, client_key
+from tests.test_logger import log_test
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@log_test()
+def test_bucket_allows_bursts_then_refills_at_rate():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2, burst=4, clock=clock)
+    assert [limiter.acquire({"a": 1}) for _ in range(4)] == [0.0] * 4
+    assert limiter.acquire({"a": 1}) == pytest.approx(0.5)
+    # other keys have their own bucket
+    assert limiter.acquire({"b": 1}) == 0.0
+    clock.now = 0.5
+    assert limiter.acquire({"a": 1}) == 0.0
+    assert limiter.acquire({"a": 3}) == pytest.approx(1.5)
+
+
+@log_test()
+def test_bucket_takes_all_keys_or_none():
+    limiter = RateLimiter(rate=1, burst=2, clock=FakeClock())
+    limiter.acquire({"a": 2})
+    assert limiter.acquire({"a": 1, "b": 1}) > 0
+    # b was not charged for the rejected request
+    assert limiter.acquire({"b": 2}) == 0.0
+
+
+@log_test()
+def test_costs_above_burst_are_charged_in_full_as_debt():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=1, burst=5, clock=clock)
+    assert limiter.acquire({"a": 1}) == 0.0
+    # a cost above the burst waits for a full bucket instead of forever
+    assert limiter.acquire({"a": 100}) == pytest.approx(1.0)
+    clock.now = 1.0
+    assert limiter.acquire({"a": 100}) == 0.0
+    # then the whole cost is paid off before the key may go again
+    assert limiter.acquire({"a": 1}) == pytest.approx(96.0)
+    clock.now = 96.0
+    assert limiter.acquire({"a": 1}) == pytest.approx(1.0)
+    clock.now = 97.0
+    assert limiter.acquire({"a": 1}) == 0.0
+    # a bucket in debt is kept, even past burst / rate
+    limiter.acquire({"b": 50})
+    clock.now = 120.0
+    limiter.acquire({"c": 1})
+    assert len(limiter) == 2
+
+
+@log_test()
+def test_idle_buckets_are_evicted():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=10, burst=10, clock=clock)
+    for i in range(1000):
+        clock.now = i * 0.01
+        limiter.acquire({f"k{i}": 1})
+        # only keys touched within the last second (the refill time) are kept
+        assert len(limiter) <= 101
+    clock.now += 5
+    limiter.acquire({"fresh": 1})
+    assert len(limiter) == 1
+
+
+@log_test()
+def test_limiter_rejects_bad_settings():
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0)
+    with pytest.raises(ValueError):
+        RateLimiter(rate=1, burst=0.5)
+    with pytest.raises(ValueError):
+        FairQueue(concurrency=0)
+    assert RateLimiter(rate=0.5).burst == 1.0
+
+
+async def _run(queue, client, order, hold=0.0):
+    async with queue.turn(client):
+        order.append(client)
+        await asyncio.sleep(hold)
+
+
+@pytest.mark.asyncio
+async def test_fair_queue_serves_waiting_clients_in_turn():
+    queue = FairQueue(concurrency=1)
+    order = []
+    first = asyncio.create_task(_run(queue, "noisy", order, hold=0.01))
+    await asyncio.sleep(0)
+    tasks = [asyncio.create_task(_run(queue, "noisy", order)) for _ in range(5)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(_run(queue, "quiet", order)))
+    await asyncio.sleep(0)
+    assert queue.waiting() == 6 and queue.waiting("quiet") == 1
+    await asyncio.gather(first, *tasks)
+    # the quiet client goes second, not after all of the noisy client's backlog
+    assert order[:3] == ["noisy", "noisy", "quiet"]
+    assert queue.active == 0 and queue.waiting() == 0
+
+
+@pytest.mark.asyncio
+async def test_fair_queue_bounds_waiting_and_survives_cancellation():
+    queue = FairQueue(concurrency=1, max_waiting=2)
+    order = []
+    first = asyncio.create_task(_run(queue, "a", order, hold=0.01))
+    await asyncio.sleep(0)
+    waiting = [asyncio.create_task(_run(queue, "b", order)) for _ in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(QueueFull):
+        async with queue.turn("b"):
+            pass
+    waiting[0].cancel()
+    await asyncio.sleep(0)
+    assert queue.waiting("b") == 1
+    await asyncio.gather(first, waiting[1])
+    assert order == ["a", "b"]
+    assert queue.active == 0
+
+    # a slot handed to a request cancelled before it resumed is passed on
+    first = asyncio.create_task(_run(queue, "a", order, hold=0.01))
+    await asyncio.sleep(0)
+    handed = asyncio.create_task(_run(queue, "b", order))
+    await asyncio.sleep(0)
+    await first
+    handed.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await handed
+    assert queue.active == 0
+
+
+def _app(**options):
+    async def hello(request):
+        await asyncio.sleep(0)
+        return PlainTextResponse("hi")
+
+    app = Starlette(routes=[Route("/", hello), Route("/health", hello), Route("/events", hello)])
+    return RateLimitMiddleware(app, **options)
+
+
+@pytest.mark.asyncio
+async def test_middleware_answers_429_with_retry_after():
+    app = _app(clients=RateLimiter(rate=1, burst=2))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        headers = {"X-Client-Id": "noisy"}
+        assert [(await client.get("/", headers=headers)).status_code for _ in range(2)] == [200, 200]
+        limited = await client.get("/", headers=headers)
+        assert limited.status_code == 429
+        assert limited.headers["Retry-After"] == "1"
+        assert limited.json() == {"detail": "Rate limit exceeded for client 'noisy'"}
+        # other clients and health checks are unaffected
+        assert (await client.get("/", headers={"X-Client-Id": "quiet"})).status_code == 200
+        assert (await client.get("/health", headers=headers)).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_middleware_queues_fairly_and_rejects_overflow():
+    queue = FairQueue(concurrency=1, max_waiting=1)
+    transport = httpx.ASGITransport(app=_app(queue=queue))
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        responses = await asyncio.gather(*(client.get("/", headers={"X-Client-Id": "c"}) for _ in range(3)))
+        statuses = sorted(r.status_code for r in responses)
+        assert statuses == [200, 200, 429]
+        assert (await client.get("/")).status_code == 200
+        # streams bypass the queue
+        responses = await asyncio.gather(*(client.get("/events", headers={"X-Client-Id": "c"}) for _ in range(3)))
+        assert [r.status_code for r in responses] == [200, 200, 200]
+    assert queue.active == 0
+
+
+@log_test()
+def test_client_key_prefers_header():
+    assert client_key({"headers": [(b"x-client-id", b"app-1")], "client": ("10.0.0.1", 5)}) == "app-1"
+    assert client_key({"headers": [], "client": ("10.0.0.1", 5)}) == "10.0.0.1"
+    assert client_key({"headers": []}) == "unknown"
@@ -0,0 +1,26 @@
+import json
+from banking import responses
+from banking.responses import FastJSONResponse, dumps, no_content, wants_minimal
+from tests.test_logger import log_test
+
+
+@log_test()
+def test_dumps_matches_stdlib_json():
+    body = {"name": "zoë", "balance": 12.5, "count": 3, "ok": True, "next": None}
+    assert json.loads(dumps(body)) == body
+    assert FastJSONResponse(body).body == dumps(body)
+    assert FastJSONResponse(body).headers["content-type"] == "application/json"
+
+
+@log_test()
+def test_wants_minimal_follows_prefer_header(monkeypatch):
+    assert wants_minimal("return=minimal")
+    assert wants_minimal("respond-async, return=minimal")
+    assert not wants_minimal("return=representation")
+    assert not wants_minimal(None)
+    assert not wants_minimal("wait=5")
+    monkeypatch.setattr(responses, "COMPACT_BY_DEFAULT", True)
+    assert wants_minimal(None)
+    assert wants_minimal("wait=5")
+    assert not wants_minimal("return=representation")
+    assert no_content().status_code == 204
@@ -0,0 +1,107 @@
+import pytest
+from banking.errors import AccountNotFoundError, InsufficientFundsError, NegativeAmountError
+from banking.sharding import Shard, ShardedBank, shard_of
+from tests.test_logger import log_test
+
+
+def names_on(shard: int, shards: int, count: int):
+    names, i = [], 0
+    while len(names) < count:
+        if shard_of(f"user{i}", shards) == shard:
+            names.append(f"user{i}")
+        i += 1
+    return names
+
+
+@pytest.fixture(scope="module")
+def bank():
+    with ShardedBank(shards=2) as sharded:
+        yield sharded
+
+
+@log_test()
+def test_shard_of_is_stable_and_in_range():
+    assert shard_of("alice", 4) == shard_of("alice", 4)
+    assert {shard_of(f"user{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+    # a name's shard for 8 shards determines its shard for any divisor of 8
+    assert all(shard_of(f"user{i}", 8) % 4 == shard_of(f"user{i}", 4) for i in range(100))
+
+
+@log_test()
+def test_sharded_bank_applies_operations_on_the_owning_shard(bank):
+    a, b = names_on(0, 2, 2)
+    c, = names_on(1, 2, 1)
+    for name in (a, b, c):
+        bank.create_account(name, 1000)
+    bank.deposit(a, 500)
+    bank.withdraw(c, 100)
+    bank.transfer(a, b, 300)  # same shard
+    bank.transfer(b, c, 200)  # across shards
+    assert [bank.balance(n) for n in (a, b, c)] == [1200, 1100, 1100]
+    assert bank.history(c)[-1] == f"Received from: 2.00 {b}"
+    assert bank.history(b)[-1] == f"Transferred to: 2.00 {c}"
+
+    with pytest.raises(AccountNotFoundError):
+        bank.balance("nobody")
+    with pytest.raises(ValueError):
+        bank.create_account(a, 1)
+    with pytest.raises(ValueError):
+        bank.transfer(a, a, 1)
+    with pytest.raises(InsufficientFundsError):
+        bank.transfer(c, a, 10_000)
+    with pytest.raises(NegativeAmountError):
+        bank.transfer(c, a, -5)
+    with pytest.raises(AccountNotFoundError):
+        bank.transfer(c, "nobody", 5)
+    assert bank.total_balance() == 3400
+
+
+@log_test()
+def test_cross_shard_hold_blocks_double_spend_within_a_batch(bank):
+    sender = names_on(0, 2, 3)[-1]
+    recipient = names_on(1, 2, 2)[-1]
+    bank.create_account(sender, 1000)
+    bank.create_account(recipient, 0)
+
+    results = bank.execute([
+        ("transfer", sender, recipient, 800),
+        ("withdraw", sender, 500),      # only 200 is available while 800 is held
+        ("transfer", sender, "nobody", 100),
+        ("withdraw", sender, 200),      # held until the failed transfer aborts
+    ])
+    assert results[0] is None
+    assert isinstance(results[1], InsufficientFundsError)
+    assert "available balance is only 2.00" in str(results[1])
+    assert isinstance(results[2], AccountNotFoundError)
+    assert isinstance(results[3], InsufficientFundsError)
+    # the abort released its hold
+    bank.withdraw(sender, 200)
+    assert bank.balance(sender) == 0
+    assert bank.balance(recipient) == 800
+
+
+@log_test()
+def test_shard_two_phase_commit_and_abort():
+    shard = Shard()
+    shard.create_account("alice", 100)
+    shard.prepare_debit(1, "alice", 60, "bob")
+    with pytest.raises(InsufficientFundsError):
+        shard.prepare_debit(2, "alice", 50, "bob")
+    shard.prepare_debit(3, "alice", 40, "bob")
+    assert shard.holds == {"alice": 100}
+    shard.abort(3)
+    shard.commit(1)
+    assert shard.holds == {}
+    assert shard.balance("alice") == 40
+
+    shard.prepare_credit(4, "alice", 5, "carol")
+    shard.abort(4)
+    assert shard.balance("alice") == 40
+    assert shard.run([("deposit", "alice", 1), ("deposit", "alice", 0)])[0] is None
+    assert shard.balance("alice") == 41
+
+
+@log_test()
+def test_sharded_bank_needs_a_shard():
+    with pytest.raises(ValueError):
+        ShardedBank(shards=0)
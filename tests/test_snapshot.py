@@ -0,0 +1,171 @@
+import asyncio
+import os
+import pytest
+from array import array
+from banking.ledger import TransactionKind
+from banking.models import Bank
+from banking.snapshot import read_snapshot, write_snapshot
+from banking.wal import WriteAheadLog
+from tests.test_logger import log_test
+
+
+def open_bank(tmp_path):
+    return Bank.open(WriteAheadLog(str(tmp_path / "bank.wal"), fsync="always"),
+                     str(tmp_path / "bank.snapshot"))
+
+
+@log_test()
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "bank.snapshot")
+    write_snapshot(path, ["Alice", "Zoë"], array("q", [150, 2000]), 1234, 99.0)
+    snapshot = read_snapshot(path)
+    assert snapshot.names == ["Alice", "Zoë"]
+    assert snapshot.balances == [150, 2000]
+    assert (snapshot.wal_offset, snapshot.taken_at) == (1234, 99.0)
+    assert not os.path.exists(path + ".tmp")
+
+
+@log_test()
+def test_read_snapshot_rejects_bad_files(tmp_path):
+    path = str(tmp_path / "bank.snapshot")
+    with open(path, "wb") as f:
+        f.write(b"short")
+    with pytest.raises(ValueError, match="truncated"):
+        read_snapshot(path)
+
+    with open(path, "wb") as f:
+        f.write(b"x" * 64)
+    with pytest.raises(ValueError, match="not a version"):
+        read_snapshot(path)
+
+    write_snapshot(path, ["Alice"], array("q", [100]), 0, 0.0)
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"!")
+    with pytest.raises(ValueError, match="corrupt"):
+        read_snapshot(path)
+
+
+@log_test()
+def test_startup_replays_only_the_tail(tmp_path):
+    bank = open_bank(tmp_path)
+    alice = bank.create_account("Alice", 10000)
+    bob = bank.create_account("Bob", 0)
+    alice.transfer(bob, 4000)
+    bank.save_snapshot()
+    bob.deposit(500)
+    bank.close()
+
+    recovered = open_bank(tmp_path)
+    assert recovered.get_account("Alice").balance == 6000
+    assert recovered.get_account("Bob").balance == 4500
+    # Bob's history starts at the snapshot: one opening entry plus the replayed tail
+    kinds = [e.kind for e in recovered.get_account("Bob").get_transactions()[0]]
+    assert kinds == [TransactionKind.OPENING, TransactionKind.DEPOSIT]
+    assert recovered.get_account("Bob").get_transaction_history()[0] == "Opening balance from snapshot: 40.00"
+    assert recovered.startup_seconds > 0
+    recovered.close()
+
+
+@log_test()
+def test_balances_before_the_snapshot_are_read_from_the_log(tmp_path, monkeypatch):
+    import banking.main as m
+    from fastapi import HTTPException
+    bank = open_bank(tmp_path)
+    alice = bank.create_account("Alice", 10000)
+    alice.withdraw(2500)
+    withdrawn_at = bank.ledger[len(bank.ledger) - 1].timestamp
+    created_at = bank.ledger[0].timestamp
+    bank.save_snapshot()
+    alice.deposit(100)
+    bank.close()
+
+    recovered = open_bank(tmp_path)
+    taken_at = read_snapshot(recovered.snapshot_path).taken_at
+    assert recovered.history_starts_at == taken_at
+    monkeypatch.setattr(m, "bank", recovered)
+    assert m.apply_get_balance_at("Alice", withdrawn_at)["balance"] == 75.0
+    assert m.apply_get_balance_at("Alice", created_at)["balance"] == 100.0
+    assert m.apply_get_balance_at("Alice", taken_at)["balance"] == 75.0
+    with pytest.raises(HTTPException) as error:
+        m.apply_get_balance_at("Alice", created_at - 1)
+    assert error.value.status_code == 404
+    page = m.apply_list_transactions("Alice", 0, 10, None, None, None, None)
+    assert page["history_starts_at"] == taken_at
+    assert recovered.archived_balance_at("Nobody", withdrawn_at) is None
+    recovered.close()
+
+    # without a snapshot there is nothing archived: history is complete
+    assert Bank().archived_balance_at("Alice", withdrawn_at) is None
+
+
+@log_test()
+def test_unusable_snapshot_falls_back_to_full_replay(tmp_path):
+    bank = open_bank(tmp_path)
+    bank.create_account("Alice", 1000)
+    bank.save_snapshot()
+    bank.close()
+    with open(str(tmp_path / "bank.snapshot"), "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"!")
+    recovered = open_bank(tmp_path)
+    assert recovered.get_account("Alice").get_transaction_history() == ["Account created with balance: 10.00"]
+    recovered.close()
+
+    # a snapshot taken past the end of the log (log lost its tail) is ignored too
+    write_snapshot(str(tmp_path / "bank.snapshot"), ["Ghost"], array("q", [100]), 10 ** 9, 0.0)
+    recovered = open_bank(tmp_path)
+    assert list(recovered.accounts) == ["Alice"]
+    recovered.close()
+
+
+@log_test()
+def test_periodic_snapshots(tmp_path, monkeypatch):
+    import banking.main as m
+    bank = open_bank(tmp_path)
+    bank.create_account("Alice", 1000)
+    monkeypatch.setattr(m, "bank", bank)
+
+    async def run():
+        task = asyncio.create_task(m.snapshot_periodically(0.01))
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if os.path.exists(bank.snapshot_path):
+                break
+        task.cancel()
+
+    asyncio.run(run())
+    assert read_snapshot(bank.snapshot_path).wal_offset == bank.wal.size
+    bank.close()
+
+
+@log_test()
+def test_periodic_settling_of_hot_accounts():
+    import banking.main as m
+    from banking.models import Bank
+    bank = Bank(hot_accounts=["Shop"])
+    shop = bank.create_account("Shop", 0)
+    shop.deposit(100)
+
+    async def run():
+        task = asyncio.create_task(m.settle_periodically(0.01))
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if not shop.pending:
+                break
+        task.cancel()
+
+    async def serve():
+        # the app's lifespan settles periodically and once more on shutdown
+        async with m.lifespan(m.app):
+            shop.deposit(100)
+        return shop.pending
+
+    original, m.bank = m.bank, bank
+    try:
+        asyncio.run(run())
+        assert shop.pending == 0
+        assert asyncio.run(serve()) == 0
+    finally:
+        m.bank = original
+    assert shop.balance == 200
@@ -0,0 +1,115 @@
+import random
+import pytest
+from banking.ledger import TransactionKind
+from banking.models import Bank
+from banking.stats import BookStats
+from tests.test_logger import log_test
+
+
+def recomputed(bank: Bank) -> dict:
+    balances = [account.balance for account in bank.accounts.values()]
+    histogram = [0] * (max(balance.bit_length() for balance in balances) + 1)
+    for balance in balances:
+        histogram[balance.bit_length()] += 1
+    return {"accounts": len(balances), "total_balance": sum(balances), "histogram": histogram}
+
+
+def summary(bank: Bank) -> dict:
+    stats = bank.snapshot_stats()
+    return {"accounts": stats.accounts, "total_balance": stats.total_balance, "histogram": stats.histogram}
+
+
+@log_test()
+def test_stats_follow_every_kind_of_change():
+    bank = Bank()
+    alice = bank.create_account("alice", 1000)
+    bob = bank.create_account("bob", 0)
+    alice.deposit(500)
+    alice.withdraw(200)
+    alice.transfer(bob, 300)
+    bank.transfer_batch([("alice", "bob", 100), ("bob", "alice", 50)])
+    stats = bank.snapshot_stats()
+    assert stats.version == len(bank.ledger)
+    assert (stats.accounts, stats.total_balance) == (2, 1300)
+    assert (stats.deposited, stats.withdrawn, stats.transferred) == (500, 200, 450)
+    # alice has 950 (10 bits), bob 350 (9 bits)
+    assert stats.histogram == [0] * 9 + [1, 1]
+    assert summary(bank) == recomputed(bank)
+
+
+@log_test()
+def test_snapshots_are_copies():
+    bank = Bank()
+    bank.create_account("alice", 1)
+    before = bank.snapshot_stats()
+    bank.get_account("alice").deposit(1)
+    assert before.histogram == [0, 1]
+    assert bank.snapshot_stats().histogram == [0, 0, 1]
+    assert bank.snapshot_stats().version == before.version + 1
+
+
+@log_test()
+def test_stats_match_a_full_recount_under_random_traffic():
+    rng = random.Random(7)
+    bank = Bank(hot_accounts=["h0", "h1"])
+    names = [f"h{i}" for i in range(2)] + [f"a{i}" for i in range(30)]
+    bank.create_accounts((name, rng.randrange(0, 10 ** 6)) for name in names)
+    for _ in range(2000):
+        account = bank.get_account(rng.choice(names))
+        amount = rng.randrange(1, 10 ** 5)
+        op = rng.random()
+        if op < 0.4:
+            account.deposit(amount)
+        elif op < 0.6 and account.balance >= amount:
+            account.withdraw(amount)
+        elif account.balance >= amount:
+            target = bank.get_account(rng.choice(names))
+            if target is not account:
+                account.transfer(target, amount)
+    # pending hot credits are folded in before the stats are read
+    assert bank.snapshot_stats().version == len(bank.ledger)
+    assert summary(bank) == recomputed(bank)
+    assert bank.snapshot_stats().total_balance == bank.total_balance()
+
+
+@log_test()
+def test_stats_are_rebuilt_from_snapshot_and_log(tmp_path):
+    from banking.wal import WriteAheadLog
+    wal_path, snapshot_path = str(tmp_path / "bank.wal"), str(tmp_path / "bank.snap")
+    bank = Bank.open(WriteAheadLog(wal_path), snapshot_path)
+    bank.create_account("alice", 700)
+    bank.save_snapshot()
+    bank.get_account("alice").transfer(bank.create_account("bob", 0), 200)
+    expected = bank.snapshot_stats()
+    bank.close()
+    reopened = Bank.open(WriteAheadLog(wal_path), snapshot_path)
+    # balances and account count survive; flow totals only cover the replayed log
+    stats = reopened.snapshot_stats()
+    assert (stats.accounts, stats.total_balance, stats.histogram, stats.transferred) == \
+        (expected.accounts, expected.total_balance, expected.histogram, 200)
+    reopened.close()
+
+
+@log_test()
+def test_stats_follow_columnar_bulk_jobs():
+    pytest.importorskip("numpy")
+    from banking.columnar import ColumnarBank
+    bank = ColumnarBank()
+    bank.create_accounts([("a", 100), ("b", 10000)])
+    bank.apply_interest(100)
+    bank.apply_fee(50)
+    stats = bank.snapshot_stats()
+    assert stats.total_balance == bank.total_balance() == 100 + 1 + 10000 + 100 - 100
+    assert (stats.deposited, stats.withdrawn) == (101, 100)
+    assert summary(bank) == recomputed(bank)
+
+
+@log_test()
+def test_to_dict_renders_major_units():
+    stats = BookStats()
+    stats.record(TransactionKind.CREATED, 250, 250)
+    assert stats.snapshot().to_dict() == {
+        "version": 1, "accounts": 1, "total_balance": 2.5,
+        "total_deposited": 0.0, "total_withdrawn": 0.0, "total_transferred": 0.0,
+        "balance_histogram": [{"below": 0.01 * (1 << k), "count": int(k == 8)} for k in range(9)],
+    }
@@ -0,0 +1,141 @@
+import gzip
+import json
+import httpx
+import pytest
+import banking.main as main
+from banking import traffic
+from banking.feed import ChangeFeed
+from banking.idempotency import IdempotencyCache
+from banking.models import Bank
+from banking.traffic import BalanceDigest, RecordingMiddleware, TrafficRecorder
+from tests.test_logger import log_test
+
+
+@pytest.fixture
+def fresh_bank(monkeypatch):
+    def reset():
+        monkeypatch.setattr(main, "bank", Bank())
+        monkeypatch.setattr(main, "idempotency", IdempotencyCache())
+        monkeypatch.setattr(main, "feed", ChangeFeed())
+    reset()
+    return reset
+
+
+async def record(path: str) -> TrafficRecorder:
+    """Run a little traffic through the app with a recorder in front of it."""
+    main.bank.create_account("founder", 100000)
+    recorder = TrafficRecorder(path)
+    unset = main.recorder
+    main.recorder = recorder
+    try:
+        # the app's lifespan writes the opening balances and, on the way out, the final digest
+        transport = httpx.ASGITransport(app=RecordingMiddleware(main.app, recorder))
+        async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://rec") as client:
+            await client.post("/accounts/", json={"name": "alice", "initial_balance": 50})
+            await client.post("/transfers", json={"sender": "founder", "recipient": "alice", "amount": 25.5},
+                              headers={"Idempotency-Key": "k1"})
+            await client.post("/transfers", json={"sender": "founder", "recipient": "alice", "amount": 25.5},
+                              headers={"Idempotency-Key": "k1"})
+            await client.post("/accounts/alice/withdrawals", json={"amount": 1000})  # refused
+            await client.post("/accounts/alice/deposits", json={"amount": 4}, headers={"Prefer": "return=minimal"})
+            await client.get("/accounts/alice")
+            await client.get("/health")  # not recorded
+            await client.post("/accounts/import", content=b"name,balance\nbob,1\n",
+                              params={"format": "csv"}, headers={"Content-Type": "text/csv"})
+            await client.post("/accounts/import", content=b"\xff")  # not UTF-8
+    finally:
+        main.recorder = unset
+    return recorder
+
+
+@pytest.mark.asyncio
+async def test_recording_holds_opening_balances_requests_and_final_digest(fresh_bank, tmp_path):
+    path = str(tmp_path / "traffic.ndjson.gz")
+    await record(path)
+    with gzip.open(path, "rt") as f:
+        lines = [json.loads(line) for line in f]
+    assert [line["type"] for line in lines] == ["start", "account"] + ["request"] * 8 + ["end"]
+    recording = traffic.load(path)
+    assert recording.accounts == [("founder", 100000)]
+    assert [r.status for r in recording.requests] == [200, 200, 200, 400, 204, 200, 200, 400]
+    assert recording.requests[1].headers == {"content-type": "application/json", "idempotency-key": "k1"}
+    assert recording.requests[6].query == "format=csv"
+    assert recording.requests[7].body == b"\xff"
+    assert all(0 <= r.t < 5 for r in recording.requests)
+    expected = BalanceDigest()
+    expected.update([("alice", 5000 + 2550 + 400), ("bob", 100), ("founder", 100000 - 2550)])
+    assert recording.final == expected.result()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("pacing", [{}, {"concurrency": 4}, {"speed": 50.0}])
+async def test_replay_reproduces_the_final_balances(fresh_bank, tmp_path, pacing):
+    path = str(tmp_path / "traffic.ndjson")
+    await record(path)
+    fresh_bank()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+        report = await traffic.replay(traffic.load(path), client, **pacing)
+    assert report.requests == 8
+    assert report.balances_match is True
+    assert report.p50_ms <= report.p99_ms <= report.max_ms
+    if not pacing:
+        assert report.status_mismatches == 0
+
+
+@pytest.mark.asyncio
+async def test_replay_reports_diverging_balances(fresh_bank, tmp_path):
+    path = str(tmp_path / "traffic.ndjson")
+    await record(path)
+    fresh_bank()
+    main.bank.create_account("intruder", 1)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+        report = await traffic.replay(traffic.load(path), client)
+        with pytest.raises(ValueError):
+            await traffic.replay(traffic.load(path), client, concurrency=0)
+    assert report.balances_match is False
+    assert report.actual["accounts"] == report.expected["accounts"] + 1
+
+
+@log_test()
+def test_load_rejects_unknown_files(tmp_path):
+    path = tmp_path / "bad.ndjson"
+    path.write_text('{"type": "start", "version": 99}\n')
+    with pytest.raises(ValueError, match="version"):
+        traffic.load(str(path))
+    path.write_text('{"type": "mystery"}\n')
+    with pytest.raises(ValueError, match="Line 1"):
+        traffic.load(str(path))
+
+
+@log_test()
+def test_cli_replays_in_process(fresh_bank, tmp_path, capsys):
+    path = tmp_path / "traffic.ndjson"
+    path.write_text("\n".join(json.dumps(line) for line in [
+        {"type": "start", "version": 1, "started_at": 0},
+        {"type": "request", "t": 0.0, "method": "POST", "path": "/accounts/",
+         "headers": {"content-type": "application/json"}, "body": '{"name": "x", "initial_balance": 2}',
+         "status": 200},
+    ]) + "\n")
+    # no final digest: nothing to compare
+    assert traffic.main([str(path)]) == 0
+    assert json.loads(capsys.readouterr().out)["balances_match"] is None
+    with path.open("a") as f:
+        f.write(json.dumps({"type": "end", "accounts": 1, "total_balance": 999, "digest": "0"}) + "\n")
+    fresh_bank()
+    assert traffic.main([str(path), "--speed", "10"]) == 1
+    assert "DIFFER" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        traffic.main([str(path), "--speed", "0"])
+
+
+@log_test()
+def test_cli_replays_against_a_server(fresh_bank, tmp_path, monkeypatch, capsys):
+    path = tmp_path / "traffic.ndjson"
+    path.write_text(json.dumps({"type": "start", "version": 1, "started_at": 0}) + "\n")
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(httpx, "AsyncClient", lambda base_url, timeout: real_client(
+        transport=httpx.ASGITransport(app=main.app), base_url=base_url))
+    assert traffic.main([str(path), "--url", "http://server", "--concurrency", "2"]) == 0
+    assert json.loads(capsys.readouterr().out)["requests"] == 0
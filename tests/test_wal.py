@@ -0,0 +1,269 @@
+import asyncio
+import os
+import pytest
+from banking.ledger import TransactionKind
+from banking.models import Bank
+from banking.wal import WriteAheadLog, decode_entry, encode_entry
+from tests.test_logger import log_test
+
+
+def history(bank):
+    return {
+        name: (account.balance, [(e.timestamp, e.kind, e.amount, e.counterparty, e.balance)
+                                 for e in account.get_transactions(limit=1000)[0]])
+        for name, account in bank.accounts.items()
+    }
+
+
+@log_test()
+def test_entry_round_trip():
+    bank = Bank()
+    alice = bank.create_account("Alice", 1000)
+    bank.create_account("Bob", 0)
+    alice.transfer(bank.get_account("Bob"), 250)
+    entry = bank.ledger[2]
+    decoded = decode_entry(encode_entry(entry)[8:], entry.offset)
+    assert decoded == entry
+
+
+@log_test()
+def test_bank_recovers_from_wal(tmp_path):
+    path = str(tmp_path / "bank.wal")
+    bank = Bank.open(WriteAheadLog(path, fsync="always"))
+    alice = bank.create_account("Alice", 10000)
+    bob = bank.create_account("Bob", 5000)
+    alice.deposit(2500)
+    bob.withdraw(1000)
+    alice.transfer(bob, 6000)
+    expected = history(bank)
+    bank.close()
+
+    recovered = Bank.open(WriteAheadLog(path))
+    assert history(recovered) == expected
+    assert recovered.get_account("Bob").get_transaction_history()[-1] == "Received from: 60.00 Alice"
+
+    # new changes keep appending to the same log
+    recovered.get_account("Bob").deposit(100)
+    recovered.close()
+    again = Bank.open(WriteAheadLog(path))
+    assert again.get_account("Bob").balance == 10100
+    again.close()
+
+
+@log_test()
+def test_torn_tail_is_truncated(tmp_path):
+    path = str(tmp_path / "bank.wal")
+    bank = Bank.open(WriteAheadLog(path, fsync="never"))
+    bank.create_account("Alice", 10000).deposit(500)
+    bank.close()
+    intact = os.path.getsize(path)
+    with open(path, "ab") as log:
+        log.write(b"\x20\x00\x00\x00garbage")
+
+    recovered = Bank.open(WriteAheadLog(path))
+    assert recovered.get_account("Alice").balance == 10500
+    assert os.path.getsize(path) == intact
+    recovered.close()
+
+
+@log_test()
+def test_interrupted_transfer_is_completed(tmp_path):
+    path = str(tmp_path / "bank.wal")
+    bank = Bank.open(WriteAheadLog(path, fsync="always"))
+    alice = bank.create_account("Alice", 10000)
+    bob = bank.create_account("Bob", 0)
+    alice.transfer(bob, 3000)
+    bank.close()
+    # drop the incoming leg, as if the process died between the two writes
+    entries = list(WriteAheadLog(path, fsync="always").replay())
+    os.truncate(path, sum(len(encode_entry(e)) for e in entries[:-1]))
+
+    recovered = Bank.open(WriteAheadLog(path, fsync="always"))
+    assert recovered.get_account("Alice").balance == 7000
+    assert recovered.get_account("Bob").balance == 3000
+    recovered.close()
+    kinds = [e.kind for e in WriteAheadLog(path, fsync="always").replay()]
+    assert kinds[-1] == TransactionKind.TRANSFER_IN
+
+
+@log_test()
+def test_group_commit_batches_fsyncs(tmp_path, monkeypatch):
+    calls = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: calls.append(fd) or real_fsync(fd))
+
+    # a long interval so only the size trigger fires during the loop
+    wal = WriteAheadLog(str(tmp_path / "bank.wal"), fsync="periodic", group_size=10, group_interval=60)
+    bank = Bank.open(wal)
+    account = bank.create_account("Alice", 0)
+    for _ in range(99):
+        account.deposit(100)
+    assert len(calls) == 10
+    bank.close()
+    assert len(calls) == 11
+
+
+@log_test()
+def test_background_flusher_syncs_idle_writes(tmp_path):
+    import time
+    path = str(tmp_path / "bank.wal")
+    bank = Bank.open(WriteAheadLog(path, fsync="periodic", group_size=1000, group_interval=0.001))
+    bank.create_account("Alice", 100)
+    deadline = time.monotonic() + 2
+    while os.path.getsize(path) == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert os.path.getsize(path) > 0
+    bank.close()
+    bank.close()  # closing twice is harmless
+
+
+@log_test()
+def test_unknown_fsync_policy(tmp_path):
+    with pytest.raises(ValueError, match="fsync policy"):
+        WriteAheadLog(str(tmp_path / "bank.wal"), fsync="sometimes")
+
+
+@log_test()
+def test_create_bank_reads_environment(tmp_path, monkeypatch):
+    from banking.main import create_bank
+    monkeypatch.delenv("BANK_WAL_PATH", raising=False)
+    assert create_bank().wal is None
+    monkeypatch.setenv("BANK_HOT_ACCOUNTS", "Shop,Market")
+    assert create_bank().hot_accounts == {"Shop", "Market"}
+    monkeypatch.setenv("BANK_STORAGE", "columnar")
+    assert type(create_bank()).__name__ == "ColumnarBank"
+    assert not create_bank().hot_accounts
+    monkeypatch.delenv("BANK_STORAGE")
+
+    monkeypatch.setenv("BANK_WAL_PATH", str(tmp_path / "bank.wal"))
+    monkeypatch.setenv("BANK_WAL_FSYNC", "always")
+    bank = create_bank()
+    assert bank.wal.fsync == "always"
+    bank.close()
+
+
+@log_test()
+def test_hot_account_credits_survive_a_crash(tmp_path):
+    path = str(tmp_path / "bank.wal")
+    bank = Bank.open(WriteAheadLog(path, fsync="always"), hot_accounts=["Shop"])
+    alice = bank.create_account("Alice", 10000)
+    shop = bank.create_account("Shop", 0)
+    alice.transfer(shop, 1000)
+    shop.deposit(50)
+    alice.transfer(shop, 2000)
+    bank.settle()
+    alice.transfer(shop, 3000)
+    alice.withdraw(100)
+    # the process dies: the last credit was never folded into the log
+    bank.wal.close()
+
+    recovered = Bank.open(WriteAheadLog(path, fsync="always"), hot_accounts=["Shop"])
+    assert recovered.get_account("Alice").balance == 3900
+    assert recovered.get_account("Shop").balance == 6050
+    kinds = [e.kind for e in recovered.get_account("Shop").get_transactions()[0]]
+    assert kinds.count(TransactionKind.TRANSFER_IN) == 3
+    before = history(recovered)
+    recovered.close()
+
+    # the completed credit was logged, so a second restart has nothing to complete
+    again = Bank.open(WriteAheadLog(path, fsync="always"))
+    assert history(again) == before
+    again.close()
+
+
+@log_test()
+def test_hot_accounts_fold_once_into_the_log(tmp_path):
+    writes = []
+    bank = Bank.open(WriteAheadLog(str(tmp_path / "bank.wal"), fsync="never"), hot_accounts=["Shop"])
+    bank.wal._write = lambda records, count: writes.append(count)
+    shop = bank.create_account("Shop", 0)
+    for _ in range(10):
+        shop.deposit(100)
+    bank.close()
+    assert writes == [1, 10]
+
+
+@pytest.mark.asyncio
+async def test_group_commit_answers_concurrent_writers_after_one_fsync(tmp_path, monkeypatch):
+    import banking.main as m
+    from banking.feed import ChangeFeed
+    wal = WriteAheadLog(str(tmp_path / "bank.wal"), fsync="group", group_size=1000, group_interval=0.05)
+    bank = Bank.open(wal)
+    for i in range(20):
+        bank.create_account(f"a{i}", 0)
+    wal.sync()
+    monkeypatch.setattr(m, "bank", bank)
+    monkeypatch.setattr(m, "feed", ChangeFeed())
+    answered = []
+    synced_when_answered = []
+    real_fsync = os.fsync
+    fsyncs = []
+    monkeypatch.setattr(os, "fsync", lambda fd: fsyncs.append(len(answered)) or real_fsync(fd))
+
+    async def deposit(name):
+        await m.execute(m.apply_deposit, name, 100, None, locks=(name,))
+        synced_when_answered.append(wal._synced == wal.size)
+        answered.append(name)
+
+    await asyncio.gather(*(deposit(f"a{i}") for i in range(20)))
+    # one fsync for all twenty, and nobody was answered before it
+    assert fsyncs == [0]
+    assert all(synced_when_answered) and len(answered) == 20
+    # reads and failed writes log nothing and do not wait
+    assert wal.commit(wal.size) is None
+    assert (await m.execute(m.apply_get_balance, "a0"))["balance"] == 1.0
+    assert fsyncs == [0]
+    bank.close()
+    assert Bank.open(WriteAheadLog(str(tmp_path / "bank.wal"), fsync="never")).total_balance() == 2000
+
+
+@pytest.mark.asyncio
+async def test_group_commit_releases_waiters_on_size_and_close(tmp_path):
+    wal = WriteAheadLog(str(tmp_path / "bank.wal"), fsync="group", group_size=2, group_interval=60)
+    bank = Bank.open(wal)
+    logged = wal.size
+    bank.create_account("Alice", 100)
+    waiting = wal.commit(logged)
+    bank.create_account("Bob", 100)
+    # the second entry fills the group: no need to wait out the interval
+    await asyncio.wait_for(waiting, 5)
+
+    logged = wal.size
+    bank.create_account("Carol", 100)
+    waiting = wal.commit(logged)
+    bank.close()
+    await asyncio.wait_for(waiting, 5)
+    # other policies do not hold answers back
+    assert WriteAheadLog(str(tmp_path / "other.wal"), fsync="always").commit(-1) is None
+
+
+@log_test()
+def test_a_batch_cut_short_by_a_crash_is_not_replayed(tmp_path):
+    path = str(tmp_path / "bank.wal")
+    bank = Bank.open(WriteAheadLog(path, fsync="always"))
+    for name in "abcd":
+        bank.create_account(name, 1000)
+    before = bank.wal.size
+    bank.transfer_batch([("a", "b", 100), ("c", "d", 50), ("b", "c", 25)])
+    after = bank.wal.size
+    bank.close()
+
+    # the crash: the log ends after the first leg's two entries of the batch record
+    leg = len(encode_entry(bank.ledger[4]))
+    with open(path, "r+b") as log:
+        log.truncate(before + 8 + 2 * leg)
+    recovered = Bank.open(WriteAheadLog(path, fsync="always"))
+    assert {name: recovered.get_account(name).balance for name in "abcd"} == dict.fromkeys("abcd", 1000)
+    assert recovered.wal.size == before
+    recovered.close()
+
+    # written whole, the batch is replayed whole
+    with open(path, "r+b") as log:
+        log.truncate(before)
+    bank = Bank.open(WriteAheadLog(path, fsync="always"))
+    bank.transfer_batch([("a", "b", 100), ("c", "d", 50), ("b", "c", 25)])
+    assert bank.wal.size == after
+    bank.close()
+    recovered = Bank.open(WriteAheadLog(path, fsync="always"))
+    assert {name: recovered.get_account(name).balance for name in "abcd"} == {"a": 900, "b": 1075, "c": 975, "d": 1050}
+    recovered.close()